@@ -1,2 +1,3 @@
 from binance_f.requestclient import RequestClient
 from binance_f.subscriptionclient import SubscriptionClient
+from binance_f.combinedstreamclient import CombinedStreamClient
@@ -0,0 +1,302 @@
+import threading
+
+from binance_f.constant.system import WebSocketDefine
+from binance_f.impl.websocketrequest import WebsocketRequest
+from binance_f.impl.websocketrequestimpl import WebsocketRequestImpl
+from binance_f.impl.websocketconnection import WebsocketConnection, ConnectionState
+from binance_f.impl.websocketwatchdog import WebSocketWatchDog
+from binance_f.impl.utils.channels import combined_stream_channel
+from binance_f.exception.binanceapiexception import BinanceApiException
+from binance_f.model.constant import *
+
+
+class CombinedStreamConnection(object):
+    """
+    One combined stream socket and the streams it carries. Every (re)connect subscribes all of them with a single
+    SUBSCRIBE frame, streams added or removed while connected are sent as their own SUBSCRIBE/UNSUBSCRIBE frame.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        # Stream name: None, kept in subscription order
+        self.streams = dict()
+        request = WebsocketRequest()
+        request.subscription_handler = self.on_connected
+        request.json_parser = client.parse_message
+        request.update_callback = client.on_update
+        request.error_handler = self.on_error
+        self.connection = client.create_connection(request)
+
+    def is_connected(self):
+        return self.connection.state == ConnectionState.CONNECTED and self.connection.ws is not None
+
+    def on_connected(self, connection):
+        if len(self.streams):
+            connection.send(combined_stream_channel(self.streams))
+
+    def on_error(self, exception):
+        """Errors of the socket go to the error handler of every stream it carries"""
+        for stream in list(self.streams):
+            request = self.client.requests.get(stream)
+            if request is not None and request.error_handler is not None:
+                request.error_handler(exception)
+
+    def add(self, stream):
+        self.streams[stream] = None
+        if self.is_connected():
+            self.connection.send(combined_stream_channel([stream]))
+
+    def remove(self, stream):
+        del self.streams[stream]
+        if self.is_connected():
+            self.connection.send(combined_stream_channel([stream], "UNSUBSCRIBE"))
+
+
+class CombinedStreamClient(object):
+
+    def __init__(self, **kwargs):
+        """
+        Subscribe many streams over a few combined stream connections instead of one connection and one thread per
+        stream. A connection carries up to max_streams_per_connection streams, messages are routed to the callback of
+        their stream name.
+
+        :param kwargs: The option of subscription connection.
+            api_key: The public key applied from Binance.
+            secret_key: The private key applied from Binance.
+            uri: Set the URI of the combined streams.
+            max_streams_per_connection: Streams subscribed on one connection before another one is opened.
+            is_auto_connect: When the connection lost is happening on the subscription line, specify whether the client
+                            reconnect to server automatically, with all its streams.
+            receive_limit_ms: Set the receive limit in millisecond. If no message is received within this limit time,
+                            the connection will be disconnected.
+            connection_delay_failure: If auto reconnect is enabled, specify the delay time before reconnect.
+            is_asyncio: Run every connection as a task on the running asyncio event loop instead of a thread each, the
+                            callbacks are called on that loop. Connections opened before the loop runs are started by
+                            start().
+        """
+        self.__api_key = kwargs.get("api_key")
+        self.__secret_key = kwargs.get("secret_key")
+        self.uri = kwargs.get("uri", WebSocketDefine.CombinedUri)
+        self.max_streams_per_connection = kwargs.get("max_streams_per_connection",
+                                                     WebSocketDefine.MaxStreamsPerConnection)
+        self.websocket_request_impl = WebsocketRequestImpl(self.__api_key)
+        self.connections = list()
+        # Stream name: request with the parser and callbacks of the stream
+        self.requests = dict()
+        self.stream_connections = dict()
+        self.mutex = threading.Lock()
+        self.is_asyncio = kwargs.get("is_asyncio", False)
+        self.__is_auto_connect = kwargs.get("is_auto_connect", True)
+        self.__receive_limit_ms = kwargs.get("receive_limit_ms", 60000)
+        self.__connection_delay_failure = kwargs.get("connection_delay_failure", 1)
+        # Asyncio connections reconnect by themselves
+        self.__watch_dog = None if self.is_asyncio else \
+            WebSocketWatchDog(self.__is_auto_connect, self.__receive_limit_ms, self.__connection_delay_failure)
+
+    def create_connection(self, request):
+        if self.is_asyncio:
+            # websockets is only needed by the asyncio transport
+            from binance_f.impl.asynciowebsocketconnection import AsyncioWebsocketConnection
+            return AsyncioWebsocketConnection(self.__api_key, self.__secret_key, self.uri, request,
+                                              self.__is_auto_connect, self.__receive_limit_ms,
+                                              self.__connection_delay_failure)
+        return WebsocketConnection(self.__api_key, self.__secret_key, self.uri, self.__watch_dog, request)
+
+    def start(self):
+        """Asyncio transport: start the connections opened before the event loop was running, from the loop"""
+        if self.is_asyncio:
+            for connection in self.connections:
+                connection.connection.connect()
+
+    def parse_message(self, json_wrapper):
+        """Combined stream payload: {"stream": <stream name>, "data": <raw stream payload>}"""
+        request = self.requests.get(json_wrapper.get_string("stream"))
+        if request is None:
+            # Message of a stream unsubscribed while in flight
+            return None
+        return request, request.json_parser(json_wrapper.get_object("data"))
+
+    def on_update(self, message_type, result):
+        if message_type == SubscribeMessageType.PAYLOAD and result is not None:
+            request, event = result
+            request.update_callback(SubscribeMessageType.PAYLOAD, event)
+
+    def subscribe(self, stream, request):
+        """
+        Route the stream to the json_parser and callbacks of request, on the first connection with room for it
+        :return: The stream name, to unsubscribe.
+        """
+        with self.mutex:
+            if stream in self.requests:
+                raise BinanceApiException(BinanceApiException.INPUT_ERROR,
+                                          "[Input] " + stream + " is already subscribed")
+            self.requests[stream] = request
+            connection = next((connection for connection in self.connections
+                               if len(connection.streams) < self.max_streams_per_connection), None)
+            is_new_connection = connection is None
+            if is_new_connection:
+                connection = CombinedStreamConnection(self)
+                self.connections.append(connection)
+            self.stream_connections[stream] = connection
+            connection.add(stream)
+        if is_new_connection:
+            connection.connection.connect()
+        return stream
+
+    def unsubscribe(self, stream):
+        """Stop the stream, its connection is closed once it carries no stream"""
+        with self.mutex:
+            connection = self.stream_connections.pop(stream)
+            del self.requests[stream]
+            connection.remove(stream)
+            if len(connection.streams) == 0:
+                self.connections.remove(connection)
+                if connection.is_connected() or self.is_asyncio:
+                    # An asyncio connection also stops its task while waiting to (re)connect
+                    connection.connection.close()
+                elif connection.connection.ws is not None:
+                    connection.connection.ws.close()
+
+    def unsubscribe_all(self):
+        for stream in list(self.requests):
+            self.unsubscribe(stream)
+
+    def subscribe_aggregate_trade_event(self, symbol: 'str', callback, error_handler=None):
+        """
+        Aggregate Trade Streams
+
+        Stream Name: <symbol>@aggTrade
+        """
+        request = self.websocket_request_impl.subscribe_aggregate_trade_event(symbol, callback, error_handler)
+        return self.subscribe(symbol.lower() + "@aggTrade", request)
+
+    def subscribe_mark_price_event(self, symbol: 'str', callback, error_handler=None):
+        """
+        Mark Price Stream
+
+        Stream Name: <symbol>@markPrice
+        """
+        request = self.websocket_request_impl.subscribe_mark_price_event(symbol, callback, error_handler)
+        return self.subscribe(symbol.lower() + "@markPrice", request)
+
+    def subscribe_all_mark_price_event(self, callback, error_handler=None):
+        """
+        Mark Price Stream for All market
+
+        Stream Name: !markPrice@arr
+        """
+        request = self.websocket_request_impl.subscribe_all_mark_price_event(callback, error_handler)
+        return self.subscribe("!markPrice@arr", request)
+
+    def subscribe_candlestick_event(self, symbol: 'str', interval: 'CandlestickInterval', callback,
+                                    error_handler=None):
+        """
+        Kline/Candlestick Streams
+
+        Stream Name: <symbol>@kline_<interval>
+        """
+        request = self.websocket_request_impl.subscribe_candlestick_event(symbol, interval, callback, error_handler)
+        return self.subscribe(symbol.lower() + "@kline_" + interval, request)
+
+    def subscribe_symbol_miniticker_event(self, symbol: 'str', callback, error_handler=None):
+        """
+        Individual Symbol Mini Ticker Stream
+
+        Stream Name: <symbol>@miniTicker
+        """
+        request = self.websocket_request_impl.subscribe_symbol_miniticker_event(symbol, callback, error_handler)
+        return self.subscribe(symbol.lower() + "@miniTicker", request)
+
+    def subscribe_all_miniticker_event(self, callback, error_handler=None):
+        """
+        All Market Mini Tickers Stream
+
+        Stream Name: !miniTicker@arr
+        """
+        request = self.websocket_request_impl.subscribe_all_miniticker_event(callback, error_handler)
+        return self.subscribe("!miniTicker@arr", request)
+
+    def subscribe_symbol_ticker_event(self, symbol: 'str', callback, error_handler=None):
+        """
+        Individual Symbol Ticker Streams
+
+        Stream Name: <symbol>@ticker
+        """
+        request = self.websocket_request_impl.subscribe_symbol_ticker_event(symbol, callback, error_handler)
+        return self.subscribe(symbol.lower() + "@ticker", request)
+
+    def subscribe_all_ticker_event(self, callback, error_handler=None):
+        """
+        All Market Tickers Stream
+
+        Stream Name: !ticker@arr
+        """
+        request = self.websocket_request_impl.subscribe_all_ticker_event(callback, error_handler)
+        return self.subscribe("!ticker@arr", request)
+
+    def subscribe_symbol_bookticker_event(self, symbol: 'str', callback, error_handler=None):
+        """
+        Individual Symbol Book Ticker Streams
+
+        Stream Name: <symbol>@bookTicker
+        """
+        request = self.websocket_request_impl.subscribe_symbol_bookticker_event(symbol, callback, error_handler)
+        return self.subscribe(symbol.lower() + "@bookTicker", request)
+
+    def subscribe_all_bookticker_event(self, callback, error_handler=None):
+        """
+        All Book Tickers Stream
+
+        Stream Name: !bookTicker
+        """
+        request = self.websocket_request_impl.subscribe_all_bookticker_event(callback, error_handler)
+        return self.subscribe("!bookTicker", request)
+
+    def subscribe_symbol_liquidation_event(self, symbol: 'str', callback, error_handler=None):
+        """
+        Liquidation Order Streams
+
+        Stream Name: <symbol>@forceOrder
+        """
+        request = self.websocket_request_impl.subscribe_symbol_liquidation_event(symbol, callback, error_handler)
+        return self.subscribe(symbol.lower() + "@forceOrder", request)
+
+    def subscribe_all_liquidation_event(self, callback, error_handler=None):
+        """
+        All Market Liquidation Order Streams
+
+        Stream Name: !forceOrder@arr
+        """
+        request = self.websocket_request_impl.subscribe_all_liquidation_event(callback, error_handler)
+        return self.subscribe("!forceOrder@arr", request)
+
+    def subscribe_book_depth_event(self, symbol: 'str', limit: 'int', callback, error_handler=None,
+                                   update_time: 'UpdateTime' = UpdateTime.INVALID):
+        """
+        Partial Book Depth Streams
+
+        Stream Names: <symbol>@depth<levels> OR <symbol>@depth<levels>@100ms.
+        """
+        request = self.websocket_request_impl.subscribe_book_depth_event(symbol, limit, update_time, callback,
+                                                                         error_handler)
+        return self.subscribe(symbol.lower() + "@depth" + str(limit) + str(update_time), request)
+
+    def subscribe_diff_depth_event(self, symbol: 'str', callback, error_handler=None,
+                                   update_time: 'UpdateTime' = UpdateTime.INVALID):
+        """
+        Diff. Depth Stream
+
+        Stream Name: <symbol>@depth OR <symbol>@depth@100ms
+        """
+        request = self.websocket_request_impl.subscribe_diff_depth_event(symbol, update_time, callback,
+                                                                         error_handler)
+        return self.subscribe(symbol.lower() + "@depth" + update_time, request)
+
+    def subscribe_user_data_event(self, listenKey: 'str', callback, error_handler=None):
+        """
+        User Data Streams
+
+        Stream Name: <listenKey>
+        """
+        request = self.websocket_request_impl.subscribe_user_data_event(listenKey, callback, error_handler)
+        return self.subscribe(listenKey, request)
@@ -1,6 +1,10 @@
 class WebSocketDefine:
     # Uri = "wss://stream.binancefuture.com/ws"
     Uri = "wss://fstream.binance.com/ws"
+    # CombinedUri = "wss://stream.binancefuture.com/stream"
+    CombinedUri = "wss://fstream.binance.com/stream"
+    # Streams a single connection can subscribe to
+    MaxStreamsPerConnection = 200
 
 
 class RestApiDefine:
@@ -0,0 +1,101 @@
+import asyncio
+
+import websockets
+
+from binance_f.impl.websocketconnection import WebsocketConnection, ConnectionState
+from binance_f.impl.utils.timeservice import get_current_timestamp
+
+
+class AsyncioWebsocketConnection(WebsocketConnection):
+    """
+    WebsocketConnection run as a task on the asyncio event loop of its caller instead of a thread of its own, the
+    messages are parsed and handed to the request callbacks on that loop. The task reconnects by itself, there is no
+    WebSocketWatchDog: a socket without message for receive_limit_ms is reconnected after connection_delay_failure.
+    """
+
+    def __init__(self, api_key, secret_key, uri, request, is_auto_connect=True, receive_limit_ms=60000,
+                 connection_delay_failure=1):
+        super().__init__(api_key, secret_key, uri, None, request)
+        self.is_auto_connect = is_auto_connect
+        self.receive_limit_ms = receive_limit_ms
+        self.connection_delay_failure = connection_delay_failure
+        self.loop = None
+        self.task = None
+        self.send_queue = None
+        self.is_closing = False
+
+    def connect(self):
+        """Start the connection task, only once the event loop runs: call it again from a coroutine on the loop"""
+        if self.task is not None and not self.task.done():
+            self.logger.debug("[Sub][" + str(self.id) + "] Already connected")
+            return
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.logger.debug("[Sub][" + str(self.id) + "] Waiting for a running event loop")
+            return
+        self.is_closing = False
+        self.task = self.loop.create_task(self.run())
+
+    async def run(self):
+        while not self.is_closing:
+            self.logger.debug("[Sub][" + str(self.id) + "] Connecting...")
+            try:
+                async with websockets.connect(self.url) as ws:
+                    # Frames queued for a previous socket are not sent on this one
+                    self.send_queue = asyncio.Queue()
+                    self.on_open(ws)
+                    sender = self.loop.create_task(self.send_queued(ws))
+                    try:
+                        while True:
+                            message = await asyncio.wait_for(ws.recv(), self.receive_limit_ms / 1000)
+                            self.on_message(message)
+                    finally:
+                        sender.cancel()
+            except asyncio.CancelledError:
+                self.state = ConnectionState.IDLE
+                self.ws = None
+                raise
+            except asyncio.TimeoutError:
+                self.logger.warning("[Sub][" + str(self.id) + "] No response from server")
+                self.state = ConnectionState.IDLE
+            except websockets.ConnectionClosedOK:
+                self.logger.debug("[Sub][" + str(self.id) + "] Connection closed by server")
+                self.state = ConnectionState.IDLE
+            except Exception as e:
+                self.on_error("Unexpected error: " + str(e))
+                self.state = ConnectionState.CLOSED_ON_ERROR
+                self.logger.error("[Sub][" + str(self.id) + "] Connection is closing due to error")
+            self.ws = None
+            if not self.is_auto_connect or self.is_closing:
+                break
+            self.logger.debug("[Sub][" + str(self.id) + "] Reconnecting after "
+                              + str(self.connection_delay_failure) + " seconds later")
+            await asyncio.sleep(self.connection_delay_failure)
+        self.logger.debug("[Sub][" + str(self.id) + "] Connection task down")
+
+    async def send_queued(self, ws):
+        while True:
+            await ws.send(await self.send_queue.get())
+
+    def send(self, data):
+        """Queued in order, sent by the connection task; safe to call from another thread"""
+        self.loop.call_soon_threadsafe(self.send_queue.put_nowait, data)
+
+    def close(self):
+        self.is_closing = True
+        if self.task is not None and not self.task.done():
+            self.loop.call_soon_threadsafe(self.task.cancel)
+        self.logger.debug("[Sub][" + str(self.id) + "] Closing normally")
+
+    def close_on_error(self):
+        # The connection task ends the socket itself, reconnecting unless is_auto_connect is off
+        self.state = ConnectionState.CLOSED_ON_ERROR
+
+    def on_open(self, ws):
+        self.logger.debug("[Sub][" + str(self.id) + "] Connected to server")
+        self.ws = ws
+        self.last_receive_time = get_current_timestamp()
+        self.state = ConnectionState.CONNECTED
+        if self.request.subscription_handler is not None:
+            self.request.subscription_handler(self)
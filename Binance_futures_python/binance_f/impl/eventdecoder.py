@@ -0,0 +1,225 @@
+"""
+Websocket event decoders generated from field tables: one function per event assigns every field of a slotted model
+straight from the decoded json in a single pass, with no JsonWrapper per event or nested object.
+"""
+from binance_f.model.candlestickevent import Candlestick, CandlestickEvent
+from binance_f.model.aggregatetradeevent import AggregateTradeEvent
+from binance_f.model.markpriceevent import MarkPriceEvent
+from binance_f.model.symbolbooktickerevent import SymbolBookTickerEvent
+from binance_f.model.orderbookevent import OrderBookEvent, Order as OrderBookOrder
+from binance_f.model.diffdepthevent import DiffDepthEvent, Order as DiffDepthOrder
+from binance_f.model.accountupdate import AccountUpdate, Balance, Position
+from binance_f.model.orderupdate import OrderUpdate
+from binance_f.model.listenkeyexpired import ListenKeyExpired
+
+# Default of an optional field: missing from the json
+MISSING = object()
+
+
+def compile_decoder(model, fields):
+    """
+    Generate the decoder of a raw json object into a model instance, its __init__ is not run.
+
+    :param fields: (attribute, key, converter[, default]) of every field. key is a json key or list index, or a tuple
+        of them into nested objects. converter None keeps the json value as it is: numbers, booleans and strings need
+        no conversion, prices and quantities arrive as strings. With a default the key may be missing.
+    """
+    namespace = {"new": object.__new__, "model": model}
+    lines = ["def decode(data):", "    result = new(model)"]
+    # Nested object path: local variable, looked up once
+    groups = {(): "data"}
+    for idx, field in enumerate(fields):
+        attribute, key, converter = field[:3]
+        path = key if isinstance(key, tuple) else (key,)
+        for depth in range(1, len(path)):
+            if path[:depth] not in groups:
+                groups[path[:depth]] = "group" + str(len(groups))
+                lines.append("    " + groups[path[:depth]] + " = " + groups[path[:depth - 1]] + "[" +
+                             repr(path[depth - 1]) + "]")
+        source = groups[path[:-1]]
+        value = source + "[" + repr(path[-1]) + "]"
+        if converter is not None:
+            namespace["convert" + str(idx)] = converter
+        if len(field) > 3:
+            namespace["default" + str(idx)] = field[3]
+            lines.append("    value = " + source + ".get(" + repr(path[-1]) + ", missing)")
+            converted = "value" if converter is None else "convert" + str(idx) + "(value)"
+            # A list default is copied for every event
+            default = ("list(default" if isinstance(field[3], list) else "(default") + str(idx) + ")"
+            lines.append("    result." + attribute + " = " + default + " if value is missing else " + converted)
+        elif converter is not None:
+            lines.append("    result." + attribute + " = convert" + str(idx) + "(" + value + ")")
+        else:
+            lines.append("    result." + attribute + " = " + value)
+    lines.append("    return result")
+    namespace["missing"] = MISSING
+    exec("\n".join(lines), namespace)
+    decode = namespace["decode"]
+    decode.__qualname__ = decode.__name__ = "decode_" + model.__name__
+    return decode
+
+
+def list_decoder(decoder):
+    def decode(items):
+        return [decoder(item) for item in items]
+    return decode
+
+
+decode_candlestick = compile_decoder(Candlestick, (
+    ("startTime", "t", None),
+    ("closeTime", "T", None),
+    ("symbol", "s", None),
+    ("interval", "i", None),
+    ("firstTradeId", "f", None),
+    ("lastTradeId", "L", None),
+    ("open", "o", float),
+    ("close", "c", float),
+    ("high", "h", float),
+    ("low", "l", float),
+    ("volume", "v", float),
+    ("numTrades", "n", None),
+    ("isClosed", "x", None),
+    ("quoteAssetVolume", "q", float),
+    ("takerBuyBaseAssetVolume", "V", float),
+    ("takerBuyQuoteAssetVolume", "Q", float),
+    ("ignore", "B", int),
+))
+
+decode_candlestick_event = compile_decoder(CandlestickEvent, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+    ("symbol", "s", None),
+    ("data", "k", decode_candlestick),
+))
+
+decode_aggregate_trade_event = compile_decoder(AggregateTradeEvent, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+    ("symbol", "s", None),
+    ("id", "a", None),
+    ("price", "p", float),
+    ("qty", "q", float),
+    ("firstId", "f", None),
+    ("lastId", "l", None),
+    ("time", "T", None),
+    ("isBuyerMaker", "m", None),
+))
+
+decode_mark_price_event = compile_decoder(MarkPriceEvent, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+    ("symbol", "s", None),
+    ("markPrice", "p", float),
+    ("fundingRate", "r", float),
+    ("nextFundingTime", "T", None),
+))
+
+decode_mark_price_event_list = list_decoder(decode_mark_price_event)
+
+decode_symbol_book_ticker_event = compile_decoder(SymbolBookTickerEvent, (
+    ("orderBookUpdateId", "u", None),
+    ("symbol", "s", None),
+    ("bestBidPrice", "b", float),
+    ("bestBidQty", "B", float),
+    ("bestAskPrice", "a", float),
+    ("bestAskQty", "A", float),
+))
+
+# Price and quantity of a level stay strings, like the json_parse of the models
+decode_order_book_levels = list_decoder(compile_decoder(OrderBookOrder, (("price", 0, None), ("qty", 1, None))))
+decode_diff_depth_levels = list_decoder(compile_decoder(DiffDepthOrder, (("price", 0, None), ("qty", 1, None))))
+
+decode_order_book_event = compile_decoder(OrderBookEvent, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+    ("transactionTime", "T", None),
+    ("symbol", "s", None),
+    ("firstUpdateId", "U", None),
+    ("lastUpdateId", "u", None),
+    ("lastUpdateIdInlastStream", "pu", None),
+    ("bids", "b", decode_order_book_levels),
+    ("asks", "a", decode_order_book_levels),
+))
+
+decode_diff_depth_event = compile_decoder(DiffDepthEvent, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+    ("transactionTime", "T", None),
+    ("symbol", "s", None),
+    ("firstUpdateId", "U", None),
+    ("finalUpdateId", "u", None),
+    ("lastUpdateIdInlastStream", "pu", None),
+    ("bids", "b", decode_diff_depth_levels),
+    ("asks", "a", decode_diff_depth_levels),
+))
+
+decode_account_update = compile_decoder(AccountUpdate, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+    ("transactionTime", "T", None),
+    ("balances", ("a", "B"), list_decoder(compile_decoder(Balance, (
+        ("asset", "a", None),
+        ("walletBalance", "wb", float),
+        ("crossWallet", "cw", float),
+    )))),
+    ("positions", ("a", "P"), list_decoder(compile_decoder(Position, (
+        ("symbol", "s", None),
+        ("amount", "pa", float),
+        ("entryPrice", "ep", float),
+        ("preFee", "cr", float),
+        ("unrealizedPnl", "up", float),
+        ("marginType", "mt", None),
+        ("isolatedWallet", "iw", float),
+        ("positionSide", "ps", None),
+    ))), []),
+))
+
+decode_order_update = compile_decoder(OrderUpdate, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+    ("transactionTime", "T", None),
+    ("symbol", ("o", "s"), None),
+    ("clientOrderId", ("o", "c"), None),
+    ("side", ("o", "S"), None),
+    ("type", ("o", "o"), None),
+    ("timeInForce", ("o", "f"), None),
+    ("origQty", ("o", "q"), float),
+    ("price", ("o", "p"), float),
+    ("avgPrice", ("o", "ap"), float),
+    ("stopPrice", ("o", "sp"), float),
+    ("executionType", ("o", "x"), None),
+    ("orderStatus", ("o", "X"), None),
+    ("orderId", ("o", "i"), None),
+    ("lastFilledQty", ("o", "l"), float),
+    ("cumulativeFilledQty", ("o", "z"), float),
+    ("lastFilledPrice", ("o", "L"), float),
+    ("commissionAsset", ("o", "N"), None, None),
+    ("commissionAmount", ("o", "n"), float, None),
+    ("orderTradeTime", ("o", "T"), None),
+    ("tradeID", ("o", "t"), None),
+    ("bidsNotional", ("o", "b"), float),
+    ("asksNotional", ("o", "a"), float),
+    ("isMarkerSide", ("o", "m"), None),
+    ("isReduceOnly", ("o", "R"), None),
+    ("workingType", ("o", "wt"), None),
+    ("isClosePosition", ("o", "cp"), None),
+    ("activationPrice", ("o", "AP"), float, None),
+    ("callbackRate", ("o", "cr"), float, None),
+    ("positionSide", ("o", "ps"), None),
+))
+
+decode_listen_key_expired = compile_decoder(ListenKeyExpired, (
+    ("eventType", "e", None),
+    ("eventTime", "E", None),
+))
+
+# Event type: decoder of the user data stream
+USER_DATA_DECODERS = {
+    "ACCOUNT_UPDATE": decode_account_update,
+    "ORDER_TRADE_UPDATE": decode_order_update,
+    "listenKeyExpired": decode_listen_key_expired,
+}
+
+
+def decode_user_data_event(data):
+    return USER_DATA_DECODERS[data["e"]](data)
@@ -1,3 +1,5 @@
+import json
+
 from binance_f.impl import RestApiRequest
 from binance_f.impl.utils.urlparamsbuilder import UrlParamsBuilder
 from binance_f.impl.utils.apisignature import create_signature
@@ -478,6 +480,26 @@ class RestApiRequestImpl(object):
         request.json_parser = parse
         return request
 
+    def post_batch_orders(self, batchOrders):
+        check_should_not_none(batchOrders, "batchOrders")
+        builder = UrlParamsBuilder()
+        builder.put_url("batchOrders", json.dumps(batchOrders, separators=(',', ':')))
+        request = self.__create_request_by_post_with_signature("/fapi/v1/batchOrders", builder)
+
+        def parse(json_wrapper):
+            result = list()
+            data_list = json_wrapper.convert_2_array()
+            for item in data_list.get_items():
+                if item.contain_key("code"):
+                    element = Msg.json_parse(item)
+                else:
+                    element = Order.json_parse(item)
+                result.append(element)
+            return result
+
+        request.json_parser = parse
+        return request
+
     def cancel_list_orders(self, symbol, orderIdList, origClientOrderIdList):
         check_should_not_none(symbol, "symbol")
         builder = UrlParamsBuilder()
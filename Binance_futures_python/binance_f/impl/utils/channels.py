@@ -154,3 +154,11 @@ def composite_index_channel(symbol):
     channel["id"] = get_current_timestamp()
     channel["method"] = "SUBSCRIBE"
     return json.dumps(channel)
+
+
+def combined_stream_channel(streams, method="SUBSCRIBE"):
+    channel = dict()
+    channel["params"] = list(streams)
+    channel["id"] = get_current_timestamp()
+    channel["method"] = method
+    return json.dumps(channel)
@@ -1,5 +1,8 @@
 import time
 from binance_f.impl.websocketrequest import WebsocketRequest
+from binance_f.impl.eventdecoder import decode_aggregate_trade_event, decode_mark_price_event, \
+    decode_mark_price_event_list, decode_candlestick_event, decode_symbol_book_ticker_event, decode_order_book_event, \
+    decode_diff_depth_event, decode_user_data_event
 from binance_f.impl.utils.channels import *
 from binance_f.impl.utils.channelparser import ChannelParser
 from binance_f.impl.utils.timeservice import *
@@ -23,7 +26,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = AggregateTradeEvent.json_parse(json_wrapper)
+            result = decode_aggregate_trade_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -43,7 +46,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = MarkPriceEvent.json_parse(json_wrapper)
+            result = decode_mark_price_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -64,7 +67,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = CandlestickEvent.json_parse(json_wrapper)
+            result = decode_candlestick_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -170,7 +173,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = SymbolBookTickerEvent.json_parse(json_wrapper)
+            result = decode_symbol_book_ticker_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -189,7 +192,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = SymbolBookTickerEvent.json_parse(json_wrapper)
+            result = decode_symbol_book_ticker_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -249,7 +252,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = OrderBookEvent.json_parse(json_wrapper)
+            result = decode_order_book_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -269,7 +272,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = DiffDepthEvent.json_parse(json_wrapper)
+            result = decode_diff_depth_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -290,14 +293,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            print("event type: ", json_wrapper.get_string("e"))
-            print(json_wrapper)
-            if(json_wrapper.get_string("e") == "ACCOUNT_UPDATE"):
-                result = AccountUpdate.json_parse(json_wrapper)
-            elif(json_wrapper.get_string("e") == "ORDER_TRADE_UPDATE"):
-                result = OrderUpdate.json_parse(json_wrapper)
-            elif(json_wrapper.get_string("e") == "listenKeyExpired"):
-                result = ListenKeyExpired.json_parse(json_wrapper)
+            result = decode_user_data_event(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
@@ -317,11 +313,7 @@ class WebsocketRequestImpl(object):
             time.sleep(0.01)
 
         def json_parse(json_wrapper):
-            result = list()
-            data_list = json_wrapper.convert_2_array()
-            for item in data_list.get_items():
-                element = MarkPriceEvent.json_parse(item)
-            result.append(element)
+            result = decode_mark_price_event_list(json_wrapper.json_object)
             return result
 
         request = WebsocketRequest()
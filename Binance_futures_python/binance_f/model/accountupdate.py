@@ -1,4 +1,5 @@
 class Balance:
+    __slots__ = ("asset", "walletBalance", "crossWallet")
 
     def __init__(self):
         self.asset = ""
@@ -15,6 +16,8 @@ class Balance:
 
 
 class Position:
+    __slots__ = ("symbol", "amount", "entryPrice", "preFee", "unrealizedPnl", "marginType", "isolatedWallet",
+                 "positionSide")
 
     def __init__(self):
         self.symbol = ""
@@ -41,6 +44,8 @@ class Position:
 
 
 class AccountUpdate:
+    __slots__ = ("eventType", "eventTime", "transactionTime", "balances", "positions")
+
     def __init__(self):
         self.eventType = ""
         self.eventTime = 0
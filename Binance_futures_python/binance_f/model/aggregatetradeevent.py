@@ -1,4 +1,5 @@
 class AggregateTradeEvent:
+    __slots__ = ("eventType", "eventTime", "symbol", "id", "price", "qty", "firstId", "lastId", "time", "isBuyerMaker")
 
     def __init__(self):
         self.eventType = ""
@@ -1,4 +1,7 @@
 class Candlestick:
+    __slots__ = ("startTime", "closeTime", "symbol", "interval", "firstTradeId", "lastTradeId", "open", "close", "high",
+                 "low", "volume", "numTrades", "isClosed", "quoteAssetVolume", "takerBuyBaseAssetVolume",
+                 "takerBuyQuoteAssetVolume", "ignore")
 
     def __init__(self):
         self.startTime = 0
@@ -44,6 +47,7 @@ class Candlestick:
 
 
 class CandlestickEvent:
+    __slots__ = ("eventType", "eventTime", "symbol", "data")
 
     def __init__(self):
         self.eventType = ""
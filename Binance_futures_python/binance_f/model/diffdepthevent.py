@@ -1,4 +1,5 @@
 class Order:
+    __slots__ = ("price", "qty")
 
     def __init__(self):
         self.price = 0.0
@@ -6,6 +7,8 @@ class Order:
 
 
 class DiffDepthEvent:
+    __slots__ = ("eventType", "eventTime", "transactionTime", "symbol", "firstUpdateId", "finalUpdateId",
+                 "lastUpdateIdInlastStream", "bids", "asks")
 
     def __init__(self):
         self.eventType = ""
@@ -1,4 +1,6 @@
 class ListenKeyExpired:
+    __slots__ = ("eventType", "eventTime")
+
     def __init__(self):
         self.eventType = ""
         self.eventTime = 0
@@ -1,4 +1,5 @@
 class MarkPriceEvent:
+    __slots__ = ("eventType", "eventTime", "symbol", "markPrice", "fundingRate", "nextFundingTime")
 
     def __init__(self):
         self.eventType = ""
@@ -1,4 +1,10 @@
 class OrderUpdate:
+    __slots__ = ("eventType", "eventTime", "transactionTime", "symbol", "clientOrderId", "side", "type", "timeInForce",
+                 "origQty", "price", "avgPrice", "stopPrice", "executionType", "orderStatus", "orderId",
+                 "lastFilledQty", "cumulativeFilledQty", "lastFilledPrice", "commissionAsset", "commissionAmount",
+                 "orderTradeTime", "tradeID", "bidsNotional", "asksNotional", "isMarkerSide", "isReduceOnly",
+                 "workingType", "isClosePosition", "activationPrice", "callbackRate", "positionSide")
+
     def __init__(self):
         self.eventType = ""
         self.eventTime = 0
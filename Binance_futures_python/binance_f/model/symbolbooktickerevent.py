@@ -1,4 +1,5 @@
 class SymbolBookTickerEvent:
+    __slots__ = ("orderBookUpdateId", "symbol", "bestBidPrice", "bestBidQty", "bestAskPrice", "bestAskQty")
 
     def __init__(self):
         self.orderBookUpdateId = None
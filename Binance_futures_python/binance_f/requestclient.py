@@ -284,6 +284,18 @@ class RequestClient(object):
         return response[0]
 
 
+    def post_batch_orders(self, batchOrders: 'list') -> any:
+        """
+        Place Multiple Orders (TRADE)
+
+        POST /fapi/v1/batchOrders (HMAC SHA256)
+
+        Send in at most 5 new orders, every order is a dict of the post_order parameters with the API names.
+        """
+        response = call_sync(self.request_impl.post_batch_orders(batchOrders))
+        self.refresh_limits(response[1])
+        return response[0]
+
     def cancel_list_orders(self, symbol: 'str', orderIdList: 'list' = None, origClientOrderIdList: 'list' = None) -> any:
         """
         Cancel Multiple Orders (TRADE)
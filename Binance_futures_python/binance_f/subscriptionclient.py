@@ -29,6 +29,9 @@ class SubscriptionClient(object):
             receive_limit_ms: Set the receive limit in millisecond. If no message is received within this limit time,
                             the connection will be disconnected.
             connection_delay_failure: If auto reconnect is enabled, specify the delay time before reconnect.
+            is_asyncio: Run every connection as a task on the running asyncio event loop instead of a thread each, the
+                            callbacks are called on that loop. Connections subscribed before the loop runs are
+                            started by start().
         """
         api_key = None
         secret_key = None
@@ -52,13 +55,32 @@ class SubscriptionClient(object):
             receive_limit_ms = kwargs["receive_limit_ms"]
         if "connection_delay_failure" in kwargs:
             connection_delay_failure = kwargs["connection_delay_failure"]
-        self.__watch_dog = WebSocketWatchDog(is_auto_connect, receive_limit_ms, connection_delay_failure)
+        self.is_asyncio = kwargs.get("is_asyncio", False)
+        self.__is_auto_connect = is_auto_connect
+        self.__receive_limit_ms = receive_limit_ms
+        self.__connection_delay_failure = connection_delay_failure
+        # Asyncio connections reconnect by themselves
+        self.__watch_dog = None if self.is_asyncio else \
+            WebSocketWatchDog(is_auto_connect, receive_limit_ms, connection_delay_failure)
 
     def __create_connection(self, request):
-        connection = WebsocketConnection(self.__api_key, self.__secret_key, self.uri, self.__watch_dog, request)
+        if self.is_asyncio:
+            # websockets is only needed by the asyncio transport
+            from binance_f.impl.asynciowebsocketconnection import AsyncioWebsocketConnection
+            connection = AsyncioWebsocketConnection(self.__api_key, self.__secret_key, self.uri, request,
+                                                    self.__is_auto_connect, self.__receive_limit_ms,
+                                                    self.__connection_delay_failure)
+        else:
+            connection = WebsocketConnection(self.__api_key, self.__secret_key, self.uri, self.__watch_dog, request)
         self.connections.append(connection)
         connection.connect()
 
+    def start(self):
+        """Asyncio transport: start the connections subscribed before the event loop was running, from the loop"""
+        if self.is_asyncio:
+            for conn in self.connections:
+                conn.connect()
+
     def unsubscribe_all(self):
         for conn in self.connections:
             conn.close()
@@ -7,9 +7,11 @@ from operator import itemgetter
 from typing import List
 
 import pandas as pd
+from binance_f.model.constant import CandlestickInterval
 
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import ICandlestick
+from service.candle_aggregator import CandleAggregator
 from service.dca_bot import DcaBot
 from service.logging import setup_logging, controller_logger as logger
 from service.signal_bot import SignalBot
@@ -23,8 +25,7 @@ dateparse = lambda x: datetime.strptime(x, '%d-%m-%y %H:%M')
 class Backtest:
     CANDLESTICK_LIMIT = 499
     BUFFER_TIMEOUT_IN_SEC = 1
-    list_15m: List[ICandlestick] = []
-    list_5m: List[ICandlestick] = []
+    candle_aggregator: CandleAggregator = None
     dca_bots: List[DcaBot] = []
     signal_bot: SignalBot = None
 
@@ -34,6 +35,8 @@ class Backtest:
 
     def __init__(self):
         self.signal_bot = SignalBot(origin="main_controller")
+        self.candle_aggregator = CandleAggregator()
+        self.candle_aggregator.subscribe(CandlestickInterval.MIN5, self.on_aggregated_candle)
         logger.info(f"{SYMBOL=} {INTERVAL=}")
         telegram_bot.send_message(message=f"start {datetime.now():%Y-%m-%d %H:%M:%S}\n"
                                           f"{MODE=}\n"
@@ -49,52 +52,17 @@ class Backtest:
             logger.info(f"{datetime.now():%Y-%m-%d %H:%M:%S} loading data... number of rows: {len(df.index)}")
             for _, row in df.iterrows():
                 candlestick = {'open': row['open'], 'high': row['high'], 'low': row['low'], 'close': row['close'],
-                               'openTime': int(row['date'].timestamp())}
+                               'openTime': int(row['date'].timestamp() * 1000)}
 
                 for dca_bot in self.dca_bots:
                     _id = dca_bot.process_candlestick(candlestick)
                     if _id is not None:
                         self.pop_dca_bot(_id)
 
-                if self.check_safe_resample_5m(candlestick):
-                    self.resample_candle_5m(self.list_5m)
-
-    def check_safe_resample_15m(self, _1m_candlestick_dict: ICandlestick):
-        minute = int(datetime.fromtimestamp(_1m_candlestick_dict['openTime']).strftime("%M"))
-        if minute % 15 == 0:
-            self.list_15m = []
-        self.list_15m.append(_1m_candlestick_dict)
-        return True if len(self.list_15m) == 15 else False
-
-    def resample_candle_15m(self, candles: List[ICandlestick]):
-        ohlc = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'}
-        df = pd.DataFrame(candles)
-        df['openTime'] = pd.to_datetime(df['openTime'], unit='s')
-        df = df.resample(rule='15Min', on='openTime').apply(ohlc)
-        df['openTime'] = df.index
-        row = df.iloc[0]
-        candlestick = {'open': row['open'], 'high': row['high'], 'low': row['low'], 'close': row['close'],
-                       'openTime': int(row['openTime'].timestamp() * 1000)}
-        divergence_result = self.signal_bot.candle_incoming(candlestick)
-        if isinstance(divergence_result, dict):
-            self.on_divergence(divergence_result)
+                self.candle_aggregator.update(candlestick)
 
-    def check_safe_resample_5m(self, _1m_candlestick_dict: ICandlestick):
-        minute = int(datetime.fromtimestamp(_1m_candlestick_dict['openTime']).strftime("%M"))
-        if minute % 5 == 0:
-            self.list_5m = []
-        self.list_5m.append(_1m_candlestick_dict)
-        return True if len(self.list_5m) == 5 else False
-
-    def resample_candle_5m(self, candles: List[ICandlestick]):
-        ohlc = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'}
-        df = pd.DataFrame(candles)
-        df['openTime'] = pd.to_datetime(df['openTime'], unit='s')
-        df = df.resample(rule='5Min', on='openTime').apply(ohlc)
-        df['openTime'] = df.index
-        row = df.iloc[0]
-        candlestick = {'open': row['open'], 'high': row['high'], 'low': row['low'], 'close': row['close'],
-                       'openTime': int(row['openTime'].timestamp() * 1000)}
+    def on_aggregated_candle(self, candlestick: ICandlestick):
+        """Process a higher interval candle from the candle aggregator"""
         divergence_result = self.signal_bot.candle_incoming(candlestick)
         if isinstance(divergence_result, dict):
             self.on_divergence(divergence_result)
@@ -0,0 +1,81 @@
+"""Fixed capacity candle history"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+from classes.ohlc import Ohlc
+
+# Column name: Ohlc attribute
+OHLC_COLUMNS: Dict[str, str] = {
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close',
+    'volume': 'volume_usdt',
+    'quote_asset_volume': 'quoteAssetVolume',
+    'rsi': 'rsi',
+    'ema_fast': 'ema_fast',
+    'ema_slow': 'ema_slow',
+}
+
+
+class CandleRingBuffer:
+    """
+    Preallocated OHLCV and indicator columns of the latest candles.
+    Every value is written twice (at i and i + capacity) so the last n values of a column are always one contiguous
+    slice, window() returns a view without copying.
+    """
+
+    def __init__(self, capacity: int, columns: Tuple[str, ...] = tuple(OHLC_COLUMNS)):
+        self.capacity = capacity
+        self.columns = {name: idx for idx, name in enumerate(columns)}
+        self.values = np.full((len(columns), 2 * capacity), np.nan)
+        self.open_time = np.zeros(2 * capacity, dtype=np.int64)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _end(self) -> int:
+        """Position right after the latest value in the second copy"""
+        return (self.count - 1) % self.capacity + self.capacity + 1
+
+    def append(self, open_time: int, **values: float) -> int:
+        """Append a candle, columns not given are set to NaN. Return the candle count"""
+        pos = self.count % self.capacity
+        self.open_time[pos] = self.open_time[pos + self.capacity] = open_time
+        self.values[:, pos] = np.nan
+        for name, value in values.items():
+            self.values[self.columns[name], pos] = value
+        self.values[:, pos + self.capacity] = self.values[:, pos]
+        self.count += 1
+        return self.count
+
+    def append_ohlc(self, ohlc: Ohlc) -> int:
+        values = {name: getattr(ohlc, attr) for name, attr in OHLC_COLUMNS.items() if name in self.columns}
+        return self.append(ohlc.unix, **{name: value for name, value in values.items() if value is not None})
+
+    def set_latest(self, name: str, value: float):
+        """Set a column of the latest candle, e.g. an indicator computed after the candle was appended"""
+        pos = (self.count - 1) % self.capacity
+        self.values[self.columns[name], pos] = self.values[self.columns[name], pos + self.capacity] = value
+
+    def latest(self, name: str, offset=0) -> float:
+        """Value of a column for the latest candle, offset=1 for the one before"""
+        return self.values[self.columns[name], self._end() - 1 - offset]
+
+    def window(self, name: str, length: int = None) -> np.ndarray:
+        """Contiguous read-only view of the last length values of a column, oldest first"""
+        length = len(self) if length is None else min(length, len(self))
+        end = self._end() if self.count else 0
+        view = self.values[self.columns[name], end - length:end]
+        view.flags.writeable = False
+        return view
+
+    def time_window(self, length: int = None) -> np.ndarray:
+        """Contiguous read-only view of the last length open times, oldest first"""
+        length = len(self) if length is None else min(length, len(self))
+        end = self._end() if self.count else 0
+        view = self.open_time[end - length:end]
+        view.flags.writeable = False
+        return view
@@ -1,22 +1,22 @@
+from datetime import datetime
+
+import pytz
+
 from settings import SYMBOL
 
 
 class Ohlc(object):
-    mavg: float = 0
-    hband: float = 0
-    lband: float = 0
-    rsi8: float = 0
-    ema_fast: float = 0
-    atr: float = 0
-    vwap: float = 0
-    quoteAssetVolume: float = 0
-
-    def __init__(self, unix, date, open: float, high: float, low: float,
-                 close: float, volume_btc: float = None, volume_usdt: float = None, tradecount=None,
+    """Single candle, unix is the open time in epoch ms and date is derived from it on first access"""
+    __slots__ = ('unix', '_date', 'symbol', 'open', 'high', 'low', 'close', 'volume_btc', 'volume_usdt',
+                 'tradecount', 'rsi', 'peak', 'trough', 'valid_pt', 'ema_slow', 'dema', 'tema', 'quoteAssetVolume',
+                 'mavg', 'hband', 'lband', 'rsi8', 'ema_fast', 'atr', 'vwap')
+
+    def __init__(self, unix, date: datetime = None, open: float = 0, high: float = 0, low: float = 0,
+                 close: float = 0, volume_btc: float = None, volume_usdt: float = None, tradecount=None,
                  rsi=0, peak=False, trough=False, valid_pt=False, ema=None, dema=None, tema=None,
                  quoteAssetVolume: float = 0):
-        self.unix = unix
-        self.date = date
+        self.unix = int(unix)
+        self._date = date
         self.symbol = SYMBOL
         self.open = open
         self.high = high
@@ -32,10 +32,32 @@ class Ohlc(object):
         self.ema_slow = ema
         self.dema = dema
         self.tema = tema
-        self.quoteAssetVolume=quoteAssetVolume
+        self.quoteAssetVolume = quoteAssetVolume
+        self.mavg = 0
+        self.hband = 0
+        self.lband = 0
+        self.rsi8 = 0
+        self.ema_fast = 0
+        self.atr = 0
+        self.vwap = 0
+
+    @property
+    def date(self) -> datetime:
+        if self._date is None:
+            self._date = datetime.fromtimestamp(self.unix / 1000, tz=pytz.UTC)
+        return self._date
+
+    @date.setter
+    def date(self, value: datetime):
+        self._date = value
+
+    def to_dict(self) -> dict:
+        result = {name: getattr(self, name) for name in self.__slots__ if name != '_date'}
+        result['date'] = self.date
+        return result
 
     def __str__(self):
-        return str(self.__class__) + ": " + str(self.__dict__)
+        return str(self.__class__) + ": " + str(self.to_dict())
 
     def __repr__(self):
-        return str(self.__class__) + ": " + str(self.__dict__)
+        return str(self.__class__) + ": " + str(self.to_dict())
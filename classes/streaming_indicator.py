@@ -0,0 +1,62 @@
+"""Streaming indicators updated once per closed candle"""
+import math
+from typing import Iterable, Optional
+
+
+class StreamingEma:
+    """EMA with the same result as ta EMAIndicator over the whole history"""
+
+    def __init__(self, window=50):
+        self.window = window
+        self.alpha = 2 / (window + 1)
+        self.ema: Optional[float] = None
+        self.count = 0
+
+    def update(self, close: float) -> float:
+        self.ema = close if self.ema is None else self.ema + self.alpha * (close - self.ema)
+        self.count += 1
+        return self.value
+
+    def seed(self, closes: Iterable[float]) -> float:
+        for close in closes:
+            self.update(close)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.ema if self.count >= self.window else math.nan
+
+
+class StreamingRsi:
+    """Wilder RSI with the same result as ta RSIIndicator over the whole history"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1 / window
+        self.prev_close: Optional[float] = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0
+
+    def update(self, close: float) -> float:
+        if self.prev_close is not None:
+            diff = close - self.prev_close
+            self.avg_gain += self.alpha * ((diff if diff > 0 else 0.0) - self.avg_gain)
+            self.avg_loss += self.alpha * ((-diff if diff < 0 else 0.0) - self.avg_loss)
+        self.prev_close = close
+        self.count += 1
+        return self.value
+
+    def seed(self, closes: Iterable[float]) -> float:
+        for close in closes:
+            self.update(close)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.count < self.window:
+            return math.nan
+        if self.avg_loss == 0:
+            return 100
+        return 100 - (100 / (1 + self.avg_gain / self.avg_loss))
+
@@ -1,4 +1,4 @@
-from typing import TypedDict, Callable, Optional, List
+from typing import TypedDict, Optional, List
 
 from Binance_futures_python.binance_f.model.constant import OrderType, PositionSide, OrderSide, TimeInForce, \
     WorkingType, FuturesMarginType
@@ -9,7 +9,6 @@ class ICandlestick(TypedDict):
     closeTime: int
     high: str  # float
     ignore: str  # int
-    json_parse: Callable
     low: str  # float
     numTrades: int
     open: str  # float
@@ -28,7 +27,6 @@ class IAccountTrade(TypedDict):
     id: int
     isBuyer: bool
     isMaker: bool
-    json_parse: Callable
     orderId: int
     price: float
     qty: float
@@ -40,7 +38,6 @@ class IAccountTrade(TypedDict):
 
 
 class IMarkPrice(TypedDict):
-    json_parse: Callable
     lastFundingRate: float
     markPrice: float
     nextFundingTime: int
@@ -61,7 +58,6 @@ class IPosition(TypedDict):
     isolatedMargin: float
     isAutoAddMargin: bool
     positionSide: str  # BOTH | LONG | SHORT
-    json_parse: Callable
 
 
 class IBalance(TypedDict):
@@ -71,7 +67,6 @@ class IBalance(TypedDict):
     balance: float
     crossUnPnl: float
     crossWalletBalance: float
-    json_parse: Callable
     maxWithdrawAmount: float
 
 
@@ -82,7 +77,6 @@ class IOrder(TypedDict):
     closePosition: bool
     cumQuote: float
     executedQty: float
-    json_parse: Callable
     orderId: int
     origQty: float
     origType: OrderType
@@ -102,7 +96,6 @@ class IOrder(TypedDict):
 
 class ICancelAllOrders(TypedDict):
     code: int  # 200 if OK
-    json_parse: Callable
     msg: str
 
 
@@ -113,7 +106,6 @@ class IPostOrder(TypedDict):
     closePosition: bool
     cumQuote: float
     executedQty: float
-    json_parse: Callable
     orderId: int
     origQty: float
     origType: OrderType
@@ -131,13 +123,22 @@ class IPostOrder(TypedDict):
     workingType: WorkingType
 
 
+class IAggregateTrade(TypedDict):
+    firstId: int
+    id: int
+    isBuyerMaker: bool
+    lastId: int
+    price: float
+    qty: float
+    time: int
+
+
 class IAggregateTradeEvent(TypedDict):
     eventTime: int
     eventType: str
     firstId: int
     id: int
     isBuyerMaker: bool
-    json_parse: Callable
     lastId: int
     price: float
     qty: float
@@ -153,7 +154,6 @@ class ICandlestickEventData(TypedDict):
     ignore: int
     interval: str
     isClosed: bool
-    json_parse: Callable
     lastTradeId: int
     low: float
     numTrades: int
@@ -170,7 +170,6 @@ class ICandlestickEvent(TypedDict):
     data: ICandlestickEventData
     eventTime: int
     eventType: str
-    json_parse: Callable
     symbol: str
 
 
@@ -190,7 +189,6 @@ class IUserDataAccountUpdate(TypedDict):
     isClosePosition: bool
     isMarkerSide: bool
     isReduceOnly: bool
-    json_parse: Callable
     lastFilledPrice: float
     lastFilledQty: float
     orderId: int
@@ -212,7 +210,6 @@ class IUserDataAccountUpdate(TypedDict):
 class IUserDataBalance(TypedDict):
     asset: str
     crossWallet: float
-    json_parse: Callable
     walletBalance: float
 
 
@@ -220,7 +217,6 @@ class IUserDataPosition(TypedDict):
     amount: float
     entryPrice: float
     isolatedWallet: float
-    json_parse: Callable
     marginType: FuturesMarginType
     positionSide: PositionSide
     preFee: float
@@ -232,7 +228,6 @@ class IUserDataOrderTradeUpdate(TypedDict):
     balances: List[IUserDataBalance]
     eventTime: int
     eventType: str  # ACCOUNT_UPDATE
-    json_parse: Callable
     positions: List[IUserDataPosition]
     transactionTime: int
 
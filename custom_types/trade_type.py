@@ -19,3 +19,53 @@ class ICalcFee(TypedDict):
     asset: str
     fee: float
     fee_in_usdt: float
+
+
+class IBatchTrade(TypedDict):
+    symbol: str
+    signal_index: int
+    entry_index: int
+    exit_index: int
+    entry_time: int
+    exit_time: Optional[int]
+    divergence: str
+    entry_price: float
+    exit_price: float
+    pnl: float
+    overall_fund: float
+
+
+class IBacktestMetrics(TypedDict):
+    total_trade: int
+    winning_trade: int
+    win_rate: float
+    cumulative_pnl: float
+    pnl_percentage: float
+    max_drawdown_pct: float
+    sharpe_ratio: float
+    sortino_ratio: float
+    exposure_pct: float
+    max_winning_streak: int
+    max_losing_streak: int
+
+
+class IDistribution(TypedDict):
+    mean: float
+    std: float
+    min: float
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+    max: float
+
+
+class IMonteCarloResult(TypedDict):
+    method: str
+    simulation_count: int
+    trade_count: int
+    final_equity: IDistribution
+    max_drawdown_pct: IDistribution
+    max_losing_streak: IDistribution
+    probability_of_loss: float
@@ -8,8 +8,9 @@ from fastapi import FastAPI
 from api.settings_controller import settings
 from custom_types.controller_type import EMode
 from main_controller import Controller
+from service.exchange import exchange
 from service.logging import setup_logging, controller_logger as logger
-from settings import MODE
+from settings import MODE, IS_BATCH_BACKTEST
 from service.telegram_bot import telegram_bot
 from utils.events import TelegramEventType, ee
 
@@ -25,11 +26,14 @@ async def main():
     telegram_bot.start_bot()
     controller = Controller()
     if MODE == EMode.PRODUCTION:
+        exchange.start_streams()
         with ThreadPoolExecutor(max_workers=1) as executor:
             event_loop = asyncio.get_event_loop()
             await asyncio.gather(controller.run_signal_bot(),
                                  # event_loop.run_in_executor(executor, telegram_bot.run_bot)
                                  )
+    elif MODE == EMode.TEST and IS_BATCH_BACKTEST:
+        controller.read_filepath_or_buffer_batch()
     elif MODE == EMode.TEST:
         controller.read_filepath_or_buffer()
 
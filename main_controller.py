@@ -4,19 +4,29 @@ import time
 from concurrent.futures.thread import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from operator import itemgetter
-from typing import List
+from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import ICandlestick
-from service.dca_bot import DcaBot
+from service.exchange import exchange
+from service.batch_signal_bot import BatchSignalBot
+from service.dca_bot import DcaBot, BACKTEST_PRICE_KEYS
 from service.logging import setup_logging, controller_logger as logger
 from service.signal_bot2 import SignalBot
 from service.telegram_bot import telegram_bot
-from settings import MODE, SYMBOL, INTERVAL, IS_PAPER_TRADING, MAX_CONCURRENT_TRADE, TRADE_LEVERAGE
+from service.wallet import wallet
+from settings import MODE, SYMBOL, INTERVAL, IS_PAPER_TRADING, MAX_CONCURRENT_TRADE, TRADE_LEVERAGE, \
+    IS_BATCH_BACKTEST, IS_RESUME_BACKTEST, BACKTEST_CHECKPOINT_INTERVAL, TARGET_PROFIT_PERCENTAGE, \
+    STOP_LOSS_PERCENTAGE, IS_DECISION_TRACE, IS_PAPER_EXCHANGE, MAX_SAFETY_ORDER_COUNT, PRICE_DEVIATION_TRIGGER_SO, \
+    BASE_ORDER_SIZE
 from utils.events import ESignal, ee, Trade, TelegramEventType
-from utils.general_utils import init_backtest_file
+from utils.candle_store import CandleStore
+from utils.candlestick_utils import interval_in_ms
+from utils.checkpoint_utils import get_checkpoint_path, save_checkpoint, load_checkpoint
+from utils.decision_trace import DecisionTrace
 
 startTime = time.time()
 
@@ -29,7 +39,6 @@ def get_uptime():
     return time.time() - startTime
 
 
-dateparse = lambda x: datetime.strptime(x, '%d-%m-%y %H:%M')
 date = datetime.now()
 
 
@@ -44,8 +53,6 @@ sys.excepthook = exception_handler
 class Controller:
     CANDLESTICK_LIMIT = 499
     BUFFER_TIMEOUT_IN_SEC = 1
-    list_15m: List[ICandlestick] = []
-    list_5m: List[ICandlestick] = []
     dca_bots: List[DcaBot] = []
     signal_bot: SignalBot = None
 
@@ -54,7 +61,6 @@ class Controller:
     active_dca_bot_counter = 0
 
     def __init__(self):
-        init_backtest_file()
         self.signal_bot = SignalBot(origin="main_controller")
         ee.on(ESignal.DIVERGENCE_FOUND, self.on_divergence)
         ee.on(Trade.STOP_TRADE, self.pop_dca_bot)
@@ -67,22 +73,92 @@ class Controller:
                                           f"{IS_PAPER_TRADING=}\n"
                                           f"{TRADE_LEVERAGE=}")
 
-    def read_filepath_or_buffer(self, filepath_or_buffer=None):
-        """Read chart data from a filepath or buffer"""
+    def load_backtest_data(self) -> pd.DataFrame:
+        """Load the backtest chart data of SYMBOL from the candle store, converted from the csv on first use"""
+        candle_store = CandleStore(SYMBOL, INTERVAL)
+        if not candle_store.exists():
+            candle_store.import_csv("assets/maticusdt_01Jan21-00꞉00.csv")
+            # candle_store.import_csv("assets/maticusdt_01Sep21-00꞉00.csv")
+            # candle_store.import_csv("assets/aaveusdt_01Sep21-00꞉00.csv")
+            # candle_store.import_csv("assets/avaxusdt_01Jan21-00꞉00.csv")
+            # candle_store.import_csv("assets/xrpusdt_01Sep21-00꞉00.csv")
+        df = candle_store.load_dataframe(datetime(2021, 5, 1, 0, 00), datetime(2021, 9, 30, 23, 0))
+        # df = candle_store.load_dataframe(datetime(2021, 8, 1, 0, 00), datetime(2021, 8, 30, 23, 0))
+        # df = candle_store.load_dataframe(datetime(2021, 9, 1, 0, 00), datetime(2021, 9, 30, 0, 0))
+        # df = candle_store.load_dataframe(datetime(2021, 4, 1, 0, 00), datetime(2021, 4, 30, 0, 0))
+        return df
+
+    def get_checkpoint_config(self) -> dict:
+        """Settings a checkpoint was made with, it is only resumed with the same ones"""
+        return {'symbol': SYMBOL, 'interval': INTERVAL, 'max_concurrent_trade': MAX_CONCURRENT_TRADE,
+                'trade_leverage': TRADE_LEVERAGE, 'target_profit_percentage': TARGET_PROFIT_PERCENTAGE,
+                'stop_loss_percentage': STOP_LOSS_PERCENTAGE, 'max_safety_order_count': MAX_SAFETY_ORDER_COUNT,
+                'price_deviation_trigger_so': PRICE_DEVIATION_TRIGGER_SO, 'base_order_size': BASE_ORDER_SIZE,
+                'is_paper_exchange': IS_PAPER_EXCHANGE, 'is_decision_trace': IS_DECISION_TRACE}
+
+    def save_checkpoint(self, filepath: str, last_open_time: int):
+        """Save the state of the run after the candle of last_open_time was processed"""
+        decision_trace = self.signal_bot.decision_trace
+        if decision_trace is not None:
+            decision_trace.flush()
+        save_checkpoint({'config': self.get_checkpoint_config(),
+                         'last_open_time': last_open_time,
+                         'dca_bot_counter': self.dca_bot_counter,
+                         'active_dca_bot_counter': self.active_dca_bot_counter,
+                         'dca_bots': [dca_bot.get_state() for dca_bot in self.dca_bots],
+                         'signal_bot': self.signal_bot.get_state(),
+                         'wallet': wallet.get_state(),
+                         'paper_exchange': exchange.req_client.get_state() if IS_PAPER_EXCHANGE else None,
+                         'decision_trace_part_count': decision_trace.part_count if decision_trace else 0}, filepath)
+
+    def load_checkpoint(self, filepath: str) -> Optional[int]:
+        """
+        Restore the state saved by save_checkpoint
+        :returns: open time of the last processed candle, None if there is no usable checkpoint
+        """
+        checkpoint = load_checkpoint(filepath)
+        if checkpoint is None:
+            logger.info(f"no checkpoint at {filepath}, starting from the first candle")
+            return None
+        if checkpoint['config'] != self.get_checkpoint_config():
+            logger.warning(f"checkpoint settings {checkpoint['config']} differ from the current settings, "
+                           f"starting from the first candle")
+            return None
+        for dca_bot in self.dca_bots:
+            dca_bot.remove_all_listeners()
+        self.dca_bots = [DcaBot.from_state(state) for state in checkpoint['dca_bots']]
+        self.dca_bot_counter = checkpoint['dca_bot_counter']
+        self.active_dca_bot_counter = checkpoint['active_dca_bot_counter']
+        self.signal_bot.set_state(checkpoint['signal_bot'])
+        wallet.set_state(checkpoint['wallet'])
+        if IS_PAPER_EXCHANGE:
+            exchange.req_client.set_state(checkpoint['paper_exchange'])
+        if IS_DECISION_TRACE:
+            # Keeps the trace parts of the candles before the checkpoint
+            self.signal_bot.set_decision_trace(DecisionTrace(part_count=checkpoint['decision_trace_part_count']))
+        logger.info(f"resuming after {datetime.utcfromtimestamp(checkpoint['last_open_time'] / 1000)} "
+                    f"with {len(self.dca_bots)} open trades")
+        return checkpoint['last_open_time']
+
+    def read_filepath_or_buffer(self, filepath_or_buffer=None, resume=IS_RESUME_BACKTEST):
+        """
+        Read chart data from a filepath or buffer.
+        With resume, continue after the last candle of the latest checkpoint, after an interrupted run or when new
+        candles were appended to the candle store since the previous run.
+        """
         if filepath_or_buffer is None:
-            df = pd.read_csv("assets/maticusdt_01Jan21-00꞉00.csv", parse_dates=["date"], date_parser=dateparse)
-            # df = pd.read_csv("assets/maticusdt_01Sep21-00꞉00.csv", parse_dates=["date"], date_parser=dateparse)
-            # df = pd.read_csv("assets/aaveusdt_01Sep21-00꞉00.csv", parse_dates=["date"], date_parser=dateparse)
-            # df = pd.read_csv("assets/avaxusdt_01Jan21-00꞉00.csv", parse_dates=["date"], date_parser=dateparse)
-            # df = pd.read_csv("assets/xrpusdt_01Sep21-00꞉00.csv", parse_dates=["date"], date_parser=dateparse)
-            df = df[(df["date"] >= datetime(2021, 5, 1, 0, 00)) & (df["date"] < datetime(2021, 9, 30, 23, 0))]
-            # df = df[(df["date"] >= datetime(2021, 8, 1, 0, 00)) & (df["date"] < datetime(2021, 8, 30, 23, 0))]
-            # df = df[(df["date"] >= datetime(2021, 9, 1, 0, 00)) & (df["date"] < datetime(2021, 9, 30, 0, 0))]
-            # df = df[(df["date"] >= datetime(2021, 4, 1, 0, 00)) & (df["date"] < datetime(2021, 4, 30, 0, 0))]
-
+            df = self.load_backtest_data()
+            checkpoint_path = get_checkpoint_path(SYMBOL, INTERVAL)
+            last_open_time = self.load_checkpoint(checkpoint_path) if resume else None
+            if last_open_time is None and IS_DECISION_TRACE:
+                self.signal_bot.set_decision_trace(DecisionTrace())
+            if last_open_time is not None:
+                open_time = df['date'].values.astype('datetime64[ms]').astype(np.int64)
+                df = df.iloc[int(np.searchsorted(open_time, last_open_time, side='right')):]
             print(f"{date:%Y-%m-%d %H:%M:%S} loading data... number of rows: {len(df.index)}")
             df_dict = df.to_dict('records')
-            for row in df_dict:
+            candle_interval_ms = interval_in_ms(INTERVAL)
+            for count, row in enumerate(df_dict, start=1):
                 candlestick = {'open': row['open'],
                                'high': row['high'],
                                'low': row['low'],
@@ -90,69 +166,69 @@ class Controller:
                                'openTime': int(row['date'].timestamp() * 1000),
                                'volume': row['volume'],
                                'quoteAssetVolume': row['quoteAssetVolume']}
-
                 # Must process price data after candles
-                for dca_bot in self.dca_bots:
-                    _id = dca_bot.process_candlestick(candlestick)
+                self.process_candlestick(candlestick, candlestick['openTime'] + candle_interval_ms)
 
                 divergence_result = self.signal_bot.candle_incoming(candlestick)
                 if isinstance(divergence_result, dict):
                     self.on_divergence(divergence_result)
 
-                # if self.check_safe_resample_5m(candlestick):
-                #     self.resample_candle_5m(self.list_5m)
-
-                # if self.check_safe_resample_15m(candlestick):
-                #     self.resample_candle_15m(self.list_15m)
-
                 # if _id is not None:
                 #     self.pop_dca_bot(_id)
+
+                if count % BACKTEST_CHECKPOINT_INTERVAL == 0 or count == len(df_dict):
+                    self.save_checkpoint(checkpoint_path, candlestick['openTime'])
+            wallet.flush_results()
+            if self.signal_bot.decision_trace is not None:
+                self.signal_bot.decision_trace.flush()
+            td = timedelta(seconds=round(get_uptime()))
+            timeup = f"{(td.seconds // 60) % 60}mins, {td.seconds % 60}secs"
+            logger.info(f"--end-- {timeup}")
+
+    def read_filepath_or_buffer_batch(self, filepath_or_buffer=None):
+        """Backtest with indicators and divergences computed for the whole chart data at once"""
+        if filepath_or_buffer is None:
+            df = self.load_backtest_data()
+            print(f"{date:%Y-%m-%d %H:%M:%S} loading data... number of rows: {len(df.index)}")
+            batch_signal_bot = BatchSignalBot.from_dataframe(df)
+            divergence_results = batch_signal_bot.find_divergences()
+            logger.info(f"divergence found: {len(divergence_results)}")
+
+            open_time = batch_signal_bot.open_time.tolist()
+            _open, high = batch_signal_bot.open.tolist(), batch_signal_bot.high.tolist()
+            low, close = batch_signal_bot.low.tolist(), batch_signal_bot.close.tolist()
+            volume, quote_asset_volume = batch_signal_bot.volume.tolist(), batch_signal_bot.quote_asset_volume.tolist()
+            for idx in range(len(close)):
+                # Only candles with an active dca bot or a divergence need to be replayed
+                if len(self.dca_bots) > 0:
+                    candlestick = {'open': _open[idx], 'high': high[idx], 'low': low[idx], 'close': close[idx],
+                                   'openTime': open_time[idx], 'volume': volume[idx],
+                                   'quoteAssetVolume': quote_asset_volume[idx]}
+                    self.process_candlestick(candlestick, open_time[idx] + interval_in_ms(INTERVAL))
+                    ee.emit(Trade.COMPLETE_CANDLESTICK_EVENT, batch_signal_bot.get_ohlc(idx))
+
+                if idx in divergence_results:
+                    self.on_divergence(divergence_results[idx])
+            wallet.flush_results()
             td = timedelta(seconds=round(get_uptime()))
             timeup = f"{(td.seconds // 60) % 60}mins, {td.seconds % 60}secs"
             logger.info(f"--end-- {timeup}")
 
-    def check_safe_resample_15m(self, _1m_candlestick_dict: ICandlestick):
-        minute = int(datetime.fromtimestamp(_1m_candlestick_dict['openTime'] / 1000).strftime("%M"))
-        if minute % 15 == 0:
-            self.list_15m = []
-        self.list_15m.append(_1m_candlestick_dict)
-        return True if len(self.list_15m) == 15 else False
-
-    def resample_candle_15m(self, candles: List[ICandlestick]):
-        ohlc = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum', 'quoteAssetVolume': 'sum'}
-        df = pd.DataFrame(candles)
-        df['openTime'] = pd.to_datetime(df['openTime'] / 1000, unit='s')
-        df = df.resample(rule='15Min', on='openTime').apply(ohlc)
-        df['openTime'] = df.index
-        row = df.iloc[0]
-        candlestick = {'open': row['open'], 'high': row['high'], 'low': row['low'], 'close': row['close'],
-                       'openTime': int(row['openTime'].timestamp() * 1000), 'volume': row['volume'],
-                       'quoteAssetVolume': row['quoteAssetVolume']}
-        divergence_result = self.signal_bot.candle_incoming(candlestick)
-        if isinstance(divergence_result, dict):
-            self.on_divergence(divergence_result)
-
-    def check_safe_resample_5m(self, _1m_candlestick_dict: ICandlestick):
-        minute = int(datetime.fromtimestamp(_1m_candlestick_dict['openTime'] / 1000).strftime("%M"))
-        if minute % 5 == 0:
-            self.list_5m = []
-        self.list_5m.append(_1m_candlestick_dict)
-        return True if len(self.list_5m) == 5 else False
-
-    def resample_candle_5m(self, candles: List[ICandlestick]):
-        ohlc = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum', 'quoteAssetVolume': 'sum'}
-        df = pd.DataFrame(candles)
-        df['openTime'] = pd.to_datetime(df['openTime'] / 1000, unit='s')
-        df = df.resample(rule='5Min', on='openTime').apply(ohlc)
-        df['openTime'] = df.index
-        row = df.iloc[0]
-        candlestick = {'open': row['open'], 'high': row['high'], 'low': row['low'], 'close': row['close'],
-                       'openTime': int(row['openTime'].timestamp() * 1000), 'volume': row['volume'],
-                       'quoteAssetVolume': row['quoteAssetVolume']}
-        # self.signal_bot.higher_tf_candle_incoming(candlestick)
-        divergence_result = self.signal_bot.candle_incoming(candlestick)
-        if isinstance(divergence_result, dict):
-            self.on_divergence(divergence_result)
+    def process_candlestick(self, candlestick: ICandlestick, close_time: int):
+        """
+        Backtest candle through every dca bot. The paper exchange is fed each price right before the bots act on it,
+        so their market orders fill at that price, and the close once they are done with the candle.
+        """
+        if not IS_PAPER_EXCHANGE:
+            for dca_bot in self.dca_bots:
+                dca_bot.process_candlestick(candlestick)
+            return
+        for price_key in BACKTEST_PRICE_KEYS:
+            exchange.req_client.update_price(candlestick[price_key], candlestick['openTime'])
+            # A bot that ends its trade is popped from the list
+            for dca_bot in list(self.dca_bots):
+                dca_bot.process_candlestick(candlestick, (price_key,))
+        exchange.req_client.update_price(candlestick['close'], close_time)
 
     def on_divergence(self, data):
         if self.active_dca_bot_counter < MAX_CONCURRENT_TRADE:
@@ -210,6 +286,8 @@ async def main():
             await asyncio.gather(
                 event_loop.run_in_executor(executor, telegram_bot.run_bot)
             )
+    elif MODE == EMode.TEST and IS_BATCH_BACKTEST:
+        controller.read_filepath_or_buffer_batch()
     elif MODE == EMode.TEST:
         controller.read_filepath_or_buffer()
 
@@ -0,0 +1,226 @@
+"""Batch dca bot class"""
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from custom_types.trade_type import IBatchTrade, IBacktestMetrics
+from settings import TARGET_PROFIT_PERCENTAGE, STOP_LOSS_PERCENTAGE, TRADE_LEVERAGE, MAX_CONCURRENT_TRADE, SYMBOL, \
+    MAX_SAFETY_ORDER_COUNT, PRICE_DEVIATION_TRIGGER_SO, BASE_ORDER_SIZE
+from utils.metrics_utils import get_performance_metrics
+from utils.safety_order_utils import get_order_size, get_safety_order_prices
+
+
+def find_first_index(values: np.ndarray, start: int, level: float, above: bool, end: int = None) -> Optional[int]:
+    """
+    First index in [start, end) where values >= level (above) or values <= level, None if there is none.
+    Windows double in size so a near hit only compares a few values and a far one is still O(n) vectorized.
+    """
+    end = len(values) if end is None else end
+    size = 16
+    while start < end:
+        window = values[start:min(start + size, end)]
+        hits = np.flatnonzero(window >= level if above else window <= level)
+        if hits.size:
+            return start + int(hits[0])
+        start += size
+        size *= 2
+    return None
+
+
+class BatchDcaBot:
+    """Simulate the TEST mode trades of DcaBot and Wallet for a list of signals, for backtests only"""
+    overall_wallet_fund = 1000
+    target_profit_percentage = TARGET_PROFIT_PERCENTAGE
+    stop_loss_percentage = STOP_LOSS_PERCENTAGE
+    leverage = TRADE_LEVERAGE
+    max_concurrent_trade = MAX_CONCURRENT_TRADE
+    fee_rate = 0.00016 + 0.00036
+    max_safety_order_count = MAX_SAFETY_ORDER_COUNT
+    price_deviation_trigger_so = PRICE_DEVIATION_TRIGGER_SO
+    base_order_size = BASE_ORDER_SIZE
+    param_names = ('overall_wallet_fund', 'target_profit_percentage', 'stop_loss_percentage', 'leverage',
+                   'max_concurrent_trade', 'fee_rate', 'max_safety_order_count', 'price_deviation_trigger_so',
+                   'base_order_size')
+
+    def __init__(self, open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 open_time: np.ndarray = None, symbol: str = SYMBOL, **params):
+        for name, value in params.items():
+            if name not in self.param_names:
+                raise ValueError(f"Unknown BatchDcaBot parameter {name}")
+            setattr(self, name, value)
+        self.symbol = symbol
+        self.open_time = np.arange(len(open), dtype=np.int64) if open_time is None \
+            else np.asarray(open_time, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+
+    def resolve_exit(self, entry_index: int, divergence: str) -> Optional[Tuple[int, float]]:
+        """
+        Same exit as DcaBot: take profit on open/high/low first, then stop loss on the candle close
+        :returns: exit index and exit price, None if the trade is still open at the end of the data
+        """
+        entry_price = self.open[entry_index]
+        if divergence == 'bullish':
+            take_profit_price = entry_price * (1 + self.target_profit_percentage)
+            stop_loss_price = entry_price * (1 - self.stop_loss_percentage)
+            # open <= high so the high is the first price to reach the take profit
+            take_profit_index = find_first_index(self.high, entry_index, take_profit_price, above=True)
+            stop_loss_index = find_first_index(self.close, entry_index, stop_loss_price, above=False,
+                                               end=take_profit_index)
+        else:
+            take_profit_price = entry_price * (1 - self.target_profit_percentage)
+            stop_loss_price = entry_price * (1 + self.stop_loss_percentage)
+            take_profit_index = find_first_index(self.low, entry_index, take_profit_price, above=False)
+            stop_loss_index = find_first_index(self.close, entry_index, stop_loss_price, above=True,
+                                               end=take_profit_index)
+        if stop_loss_index is not None:
+            return stop_loss_index, self.close[stop_loss_index]
+        if take_profit_index is not None:
+            return take_profit_index, take_profit_price
+        return None
+
+    def resolve_ladder_exit(self, entry_index: int, divergence: str,
+                            order_size: float) -> Optional[Tuple[int, float, float]]:
+        """
+        Same exit as DcaBot with the safety order ladder. The fill candle of every level comes from one searchsorted
+        on the running low (high for a short), then the take profit of every candle from the fills before it, over
+        windows that double in size until the trade exits.
+        :returns: exit index, exit price and pnl before leverage and fees, None if the trade is still open at the end
+        of the data
+        """
+        is_long = divergence == 'bullish'
+        direction = 1 if is_long else -1
+        entry_price = self.open[entry_index]
+        order_prices = np.concatenate(([entry_price], get_safety_order_prices(
+            entry_price, divergence, self.max_safety_order_count, self.price_deviation_trigger_so)))
+        coin_amounts = np.floor(order_size / order_prices)
+        # Take profit after the base order and k safety orders, from the average buy in price
+        take_profit_prices = np.cumsum(coin_amounts * order_prices) / np.cumsum(coin_amounts) * \
+            (1 + direction * self.target_profit_percentage)
+        stop_loss_price = entry_price * (1 - direction * self.stop_loss_percentage)
+        fill_side, take_profit_side = (self.low, self.high) if is_long else (self.high, self.low)
+        size = 64
+        while True:
+            end = min(entry_index + size, len(self.open))
+            window = fill_side[entry_index:end]
+            if is_long:
+                fill_indexes = np.searchsorted(-np.minimum.accumulate(window), -order_prices[1:], side='left')
+            else:
+                fill_indexes = np.searchsorted(np.maximum.accumulate(window), order_prices[1:], side='left')
+            fill_indexes += entry_index
+            # DcaBot checks the take profit on the high before a long fills on the low, unless the candle opened
+            # through the level. A short fills on the high, before its take profit check on the low.
+            effective_indexes = fill_indexes
+            if is_long:
+                opened_through = self.open[np.minimum(fill_indexes, len(self.open) - 1)] <= order_prices[1:]
+                effective_indexes = np.where(opened_through, fill_indexes, fill_indexes + 1)
+            filled_counts = np.searchsorted(effective_indexes, np.arange(entry_index, end), side='right')
+            take_profit_window = take_profit_side[entry_index:end]
+            take_profit_hits = np.flatnonzero(take_profit_window >= take_profit_prices[filled_counts] if is_long
+                                              else take_profit_window <= take_profit_prices[filled_counts])
+            close_window = self.close[entry_index:end]
+            stop_loss_hits = np.flatnonzero(close_window <= stop_loss_price if is_long
+                                            else close_window >= stop_loss_price)
+            if len(stop_loss_hits) and (len(take_profit_hits) == 0 or stop_loss_hits[0] < take_profit_hits[0]):
+                exit_index = entry_index + int(stop_loss_hits[0])
+                exit_price = self.close[exit_index]
+                filled_count = int(np.count_nonzero(fill_indexes <= exit_index))
+            elif len(take_profit_hits):
+                exit_index = entry_index + int(take_profit_hits[0])
+                filled_count = int(filled_counts[take_profit_hits[0]])
+                exit_price = take_profit_prices[filled_count]
+            elif end == len(self.open):
+                return None
+            else:
+                size *= 2
+                continue
+            pnl = direction * float(np.sum(coin_amounts[:filled_count + 1] *
+                                           (exit_price - order_prices[:filled_count + 1])))
+            return exit_index, exit_price, pnl
+
+    def open_trade(self, signal: dict, tradeable_amount: float) -> Optional[IBatchTrade]:
+        """
+        Enter on the open of the candle after the signal and resolve the exit right away
+        :returns: trade with the pnl before leverage and fees, None when there is no candle left to enter on
+        """
+        entry_index = signal['index'] + 1
+        if entry_index >= len(self.open):
+            return None
+        entry_price = float(self.open[entry_index])
+        trade: IBatchTrade = {'symbol': self.symbol, 'signal_index': signal['index'], 'entry_index': entry_index,
+                              'exit_index': len(self.open), 'entry_time': int(self.open_time[entry_index]),
+                              'exit_time': None, 'divergence': signal['divergence'], 'entry_price': entry_price,
+                              'exit_price': math.nan, 'pnl': 0, 'overall_fund': 0}
+        if self.max_safety_order_count:
+            order_size = get_order_size(tradeable_amount, self.base_order_size, self.max_safety_order_count)
+            exit_result = self.resolve_ladder_exit(entry_index, signal['divergence'], order_size)
+        else:
+            exit_result = self.resolve_exit(entry_index, signal['divergence'])
+        if exit_result is None:
+            # Never closed, it holds its slot until the end like an active DcaBot
+            return trade
+        exit_index, exit_price = exit_result[:2]
+        direction = 1 if signal['divergence'] == 'bullish' else -1
+        trade['exit_index'], trade['exit_time'] = exit_index, int(self.open_time[exit_index])
+        trade['exit_price'] = float(exit_price)
+        if self.max_safety_order_count:
+            trade['pnl'] = exit_result[2]
+        else:
+            trade['pnl'] = direction * math.floor(tradeable_amount / entry_price) * (exit_price - entry_price)
+        return trade
+
+    def close_trade(self, trade: IBatchTrade, overall_wallet_fund: float) -> float:
+        """Same as Wallet.end_trade in TEST mode, return the overall fund after the trade"""
+        trade['pnl'] = self.leverage * trade['pnl'] - overall_wallet_fund * self.fee_rate
+        trade['overall_fund'] = overall_wallet_fund + trade['pnl']
+        return trade['overall_fund']
+
+    def run(self, signals: List[dict]) -> List[IBatchTrade]:
+        """
+        Trade every signal from BatchSignalBot.find_divergence_indexes in order, a signal is skipped while
+        max_concurrent_trade trades are active like Controller.on_divergence
+        :returns: completed trades in the order they were closed
+        """
+        overall_wallet_fund = self.overall_wallet_fund
+        tradeable_amount = overall_wallet_fund / self.max_concurrent_trade
+        open_trades: List[IBatchTrade] = []
+        trades: List[IBatchTrade] = []
+
+        def end_trades(until_index):
+            nonlocal overall_wallet_fund
+            for trade in sorted(open_trades, key=lambda item: item['exit_index']):
+                if trade['exit_index'] > until_index:
+                    break
+                open_trades.remove(trade)
+                overall_wallet_fund = self.close_trade(trade, overall_wallet_fund)
+                trades.append(trade)
+
+        for signal in signals:
+            end_trades(signal['index'])
+            if len(open_trades) >= self.max_concurrent_trade:
+                continue
+            if len(open_trades) == 0:
+                tradeable_amount = overall_wallet_fund / self.max_concurrent_trade
+            trade = self.open_trade(signal, tradeable_amount)
+            if trade is not None:
+                open_trades.append(trade)
+        end_trades(len(self.open) - 1)
+        return trades
+
+    def get_metrics(self, trades: List[IBatchTrade]) -> IBacktestMetrics:
+        """Summary of completed trades"""
+        if len(self.open_time) == 0:
+            return get_trade_metrics(trades, self.overall_wallet_fund)
+        return get_trade_metrics(trades, self.overall_wallet_fund, int(self.open_time[0]), int(self.open_time[-1]))
+
+
+def get_trade_metrics(trades: List[IBatchTrade], starting_fund: float, start_time: int = None,
+                      end_time: int = None) -> IBacktestMetrics:
+    """Summary of completed trades in the order they were closed"""
+    return get_performance_metrics(np.array([trade['pnl'] for trade in trades], dtype=np.float64),
+                                   np.array([trade['entry_time'] for trade in trades], dtype=np.int64),
+                                   np.array([trade['exit_time'] for trade in trades], dtype=np.int64),
+                                   starting_fund, start_time, end_time)
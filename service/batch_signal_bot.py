@@ -0,0 +1,150 @@
+"""Batch signal bot class"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from classes.ohlc import Ohlc
+from service.logging import signal_bot_logger as logger
+from settings import RSI_WINDOW, EMA_FAST_WINDOW, EMA_SLOW_WINDOW, RSI_OVERBOUGHT, RSI_OVERSOLD, PEAK_EXPIRY_MINUTES
+from utils.indicator_utils import get_rsi_array, get_ema_array
+
+PEAK = 1
+TROUGH = -1
+
+
+class BatchSignalBot:
+    """Run the SignalBot5 strategy over a whole dataset at once, for backtests only"""
+    data_len = 350
+    # Defaults of the live SignalBot
+    rsi_window = RSI_WINDOW
+    ema_fast_window = EMA_FAST_WINDOW
+    ema_slow_window = EMA_SLOW_WINDOW
+    rsi_overbought = RSI_OVERBOUGHT
+    rsi_oversold = RSI_OVERSOLD
+    peak_expiry_in_ms = PEAK_EXPIRY_MINUTES * 60 * 1000
+    param_names = ('rsi_window', 'ema_fast_window', 'ema_slow_window', 'rsi_overbought', 'rsi_oversold',
+                   'peak_expiry_in_ms')
+
+    def __init__(self, open_time: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray = None, quote_asset_volume: np.ndarray = None, **params):
+        for name, value in params.items():
+            if name not in self.param_names:
+                raise ValueError(f"Unknown BatchSignalBot parameter {name}")
+            setattr(self, name, value)
+        self.open_time = np.asarray(open_time, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.zeros(len(self.close)) if volume is None else np.asarray(volume, dtype=np.float64)
+        self.quote_asset_volume = np.zeros(len(self.close)) if quote_asset_volume is None \
+            else np.asarray(quote_asset_volume, dtype=np.float64)
+        self.rsi = get_rsi_array(self.close, window=self.rsi_window)
+        self.ema_fast = get_ema_array(self.close, window=self.ema_fast_window)
+        self.ema_slow = get_ema_array(self.close, window=self.ema_slow_window)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, **params):
+        """Build from a backtest dataframe with a parsed 'date' column"""
+        open_time = df['date'].values.astype('datetime64[ms]').astype(np.int64)
+        return cls(open_time, df['open'].values, df['high'].values, df['low'].values, df['close'].values,
+                   df['volume'].values, df['quoteAssetVolume'].values, **params)
+
+    def get_zigzag_array(self) -> np.ndarray:
+        """Mark the candle before each RSI peak/trough, same as check_zigzag_pattern on the last 3 candles"""
+        zigzag = np.zeros(len(self.rsi), dtype=np.int8)
+        left, middle, right = self.rsi[:-2], self.rsi[1:-1], self.rsi[2:]
+        zigzag[2:][(middle > left) & (middle > right)] = PEAK
+        zigzag[2:][(middle < left) & (middle < right)] = TROUGH
+        return zigzag
+
+    def get_valid_rsi_target_array(self, zigzag: np.ndarray) -> np.ndarray:
+        """Same as check_rsi_target for every candle"""
+        prev_rsi = np.roll(self.rsi, 1)
+        return ((zigzag == PEAK) & (prev_rsi >= self.rsi_overbought)) | \
+               ((zigzag == TROUGH) & (prev_rsi <= self.rsi_oversold))
+
+    def get_ohlc(self, index: int) -> Ohlc:
+        """Build the Ohlc of a single candle with its indicators"""
+        ohlc = Ohlc(unix=int(self.open_time[index]),
+                    open=float(self.open[index]), high=float(self.high[index]), low=float(self.low[index]),
+                    close=float(self.close[index]), volume_usdt=float(self.volume[index]),
+                    quoteAssetVolume=float(self.quote_asset_volume[index]))
+        ohlc.rsi = float(self.rsi[index])
+        ohlc.ema_fast = float(self.ema_fast[index])
+        ohlc.ema_slow = float(self.ema_slow[index])
+        return ohlc
+
+    def find_divergence_indexes(self) -> List[dict]:
+        """
+        Scan the peak/trough/divergence state machine of SignalBot5 over every candle
+        :returns: list of dict with index=candle the signal fired on; divergence; price=point0 price
+        """
+        zigzag = self.get_zigzag_array()
+        valid_rsi_target = self.get_valid_rsi_target_array(zigzag)
+        valid_rsi_target[:self.data_len - 1] = False
+
+        open_time, rsi = self.open_time.tolist(), self.rsi.tolist()
+        _open, high, low, close = self.open.tolist(), self.high.tolist(), self.low.tolist(), self.close.tolist()
+        ema_fast, ema_slow = self.ema_fast.tolist(), self.ema_slow.tolist()
+        valid_rsi_target, zigzag = valid_rsi_target.tolist(), zigzag.tolist()
+
+        results = []
+        last_peak: Optional[int] = None
+        last_trough: Optional[int] = None
+        divergence = None
+        point0_price = 0
+        for i in range(self.data_len - 1, len(close)):
+            if divergence is None and not valid_rsi_target[i]:
+                # Nothing can change until the next valid peak/trough, expiry is checked when it is needed
+                continue
+            prev = i - 1
+            if valid_rsi_target[i]:
+                # invalidate_expired_peaktrough
+                if last_peak is not None and open_time[prev] - self.peak_expiry_in_ms > open_time[last_peak]:
+                    last_peak = None
+                if last_trough is not None and open_time[prev] - self.peak_expiry_in_ms > open_time[last_trough]:
+                    last_trough = None
+
+                # check_divergence
+                if zigzag[i] == PEAK and last_peak is not None and rsi[prev] < rsi[last_peak] \
+                        and high[prev] >= high[last_peak]:
+                    divergence, point0_price = 'bearish', high[prev]
+                elif zigzag[i] == TROUGH and last_trough is not None and rsi[prev] > rsi[last_trough] \
+                        and low[prev] <= low[last_trough]:
+                    divergence, point0_price = 'bullish', low[prev]
+
+            # adjust_p0 and safety_check
+            if divergence == 'bearish':
+                if high[i] > point0_price:
+                    point0_price = high[i]
+                if ema_fast[i] < ema_slow[i]:
+                    if close[i] <= _open[i]:
+                        results.append({'index': i, 'divergence': divergence, 'price': point0_price})
+                    divergence, point0_price = None, 0
+            elif divergence == 'bullish':
+                if low[i] < point0_price:
+                    point0_price = low[i]
+                if ema_fast[i] > ema_slow[i]:
+                    if _open[i] <= close[i]:
+                        results.append({'index': i, 'divergence': divergence, 'price': point0_price})
+                    divergence, point0_price = None, 0
+
+            if valid_rsi_target[i]:
+                if zigzag[i] == PEAK:
+                    last_peak = prev
+                else:
+                    last_trough = prev
+        return results
+
+    def find_divergences(self) -> Dict[int, dict]:
+        """Return the divergence results of SignalBot5.candle_incoming keyed by candle index"""
+        divergence_results = {}
+        for item in self.find_divergence_indexes():
+            ohlc = self.get_ohlc(item['index'])
+            logger.info(f"{ohlc.date:%Y-%m-%d %H:%M:%S} {item['divergence']} divergence found, "
+                        f"close: {ohlc.close:.4f} p0: {item['price']:.4f}")
+            divergence_results[item['index']] = {'divergence': item['divergence'], 'rsi2': ohlc,
+                                                 'price': item['price']}
+        return divergence_results
@@ -0,0 +1,82 @@
+"""Candle aggregator class"""
+from typing import Callable, Dict, Iterable, List, Optional
+
+from binance_f.model.constant import CandlestickInterval
+
+from custom_types.exchange_type import ICandlestick
+from utils.candlestick_utils import interval_in_ms
+
+
+class CandleBucket:
+    """Higher interval candle being built from base interval candles"""
+
+    def __init__(self, interval: str, base_interval: str):
+        self.interval = interval
+        self.interval_in_ms = interval_in_ms(interval)
+        self.candle_count = self.interval_in_ms // interval_in_ms(base_interval)
+        self.callbacks: List[Callable[[ICandlestick], None]] = []
+        self.open_time: Optional[int] = None
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = self.quote_asset_volume = 0.0
+        self.count = 0
+
+    def update(self, open_time: int, candle: ICandlestick) -> Optional[ICandlestick]:
+        """Add a candle, return the higher interval candle once all its base candles are in"""
+        bucket_open_time = open_time - open_time % self.interval_in_ms
+        high, low = float(candle['high']), float(candle['low'])
+        if bucket_open_time != self.open_time:
+            self.open_time = bucket_open_time
+            self.open, self.high, self.low = float(candle['open']), high, low
+            self.volume = self.quote_asset_volume = 0.0
+            self.count = 0
+        else:
+            if high > self.high:
+                self.high = high
+            if low < self.low:
+                self.low = low
+        self.close = float(candle['close'])
+        self.volume += float(candle.get('volume', 0))
+        self.quote_asset_volume += float(candle.get('quoteAssetVolume', 0))
+        self.count += 1
+        if self.count != self.candle_count:
+            return None
+        return {'open': self.open, 'high': self.high, 'low': self.low, 'close': self.close,
+                'openTime': self.open_time, 'volume': self.volume, 'quoteAssetVolume': self.quote_asset_volume}
+
+
+class CandleAggregator:
+    """
+    Build higher interval candles from base interval candles with integer arithmetic on openTime.
+    A higher interval candle is emitted only when every base candle of its bucket arrived, like the pandas resample
+    it replaces.
+    """
+
+    def __init__(self, intervals: Iterable[str] = (), base_interval: str = CandlestickInterval.MIN1):
+        self.base_interval = base_interval
+        self.buckets: Dict[str, CandleBucket] = {}
+        for interval in intervals:
+            self.add_interval(interval)
+
+    def add_interval(self, interval: str) -> CandleBucket:
+        if interval not in self.buckets:
+            self.buckets[interval] = CandleBucket(interval, self.base_interval)
+        return self.buckets[interval]
+
+    def subscribe(self, interval: str, callback: Callable[[ICandlestick], None]):
+        """Call callback with every completed candle of interval"""
+        self.add_interval(interval).callbacks.append(callback)
+
+    def update(self, candle: ICandlestick) -> Dict[str, ICandlestick]:
+        """
+        Add a complete base interval candle
+        :returns: completed candles keyed by interval
+        """
+        open_time = int(candle['openTime'])
+        completed = {}
+        for interval, bucket in self.buckets.items():
+            result = bucket.update(open_time, candle)
+            if result is not None:
+                completed[interval] = result
+                for callback in bucket.callbacks:
+                    callback(result)
+        return completed
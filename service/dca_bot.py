@@ -8,9 +8,10 @@ import os
 
 from time import sleep
 from datetime import datetime
-from typing import Literal, Union, List, Optional
+from typing import Literal, Union, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from classes.candle_ring_buffer import CandleRingBuffer
 from classes.ohlc import Ohlc
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import ICandlestick, ICandlestickEvent, ICandlestickEventData, IAccountTrade
@@ -20,15 +21,17 @@ from service.exchange import exchange
 from service.logging import dca_bot_logger as logger
 from service.telegram_bot import telegram_bot
 from service.wallet import wallet
-from settings import IS_PAPER_TRADING, SYMBOL, INTERVAL, MODE
+from settings import IS_PAPER_TRADING, SYMBOL, INTERVAL, MODE, TARGET_PROFIT_PERCENTAGE, STOP_LOSS_PERCENTAGE, \
+    MAX_SAFETY_ORDER_COUNT, PRICE_DEVIATION_TRIGGER_SO, BASE_ORDER_SIZE
 from utils.events import ee, Trade, TelegramEventType, EExchange
 from utils.candlestick_utils import time_now_in_ms
+from utils.general_utils import txn_to_row
+from utils.safety_order_utils import get_order_size, get_safety_order_prices
 
 load_dotenv()
 DEFAULT_TELEGRAM_NOTIFICATION_ID = os.getenv('DEFAULT_TELEGRAM_NOTIFICATION_ID')
-
-TARGET_PROFIT_PERCENTAGE = 0.0025
-STOP_LOSS_PERCENTAGE = 0.005
+# Prices of a backtest candle, in the order they are processed
+BACKTEST_PRICE_KEYS = ('open', 'high', 'low')
 
 
 class DcaBot:
@@ -40,10 +43,19 @@ class DcaBot:
     avg_buyin_price = 0
     stop_loss_price = 0
     take_profit_price = 0
+    target_profit_percentage = TARGET_PROFIT_PERCENTAGE
+    stop_loss_percentage = STOP_LOSS_PERCENTAGE
+    max_safety_order_count = MAX_SAFETY_ORDER_COUNT
+    price_deviation_trigger_so = PRICE_DEVIATION_TRIGGER_SO
 
     base_order_complete = False
+    # USDT of the base order and of every safety order
+    order_size = 0
+    safety_order_prices: List[float] = []
+    safety_order_ids: List[str] = []
+    safety_order_filled_count = 0
     current_ohlc: Ohlc = None
-    candlestick_list: List[Ohlc] = []
+    candles: CandleRingBuffer
 
     fee_items: IFeeItems = {'trade_start_time': None, 'order_ids': None}
 
@@ -68,13 +80,26 @@ class DcaBot:
     reverse_ema_counter = 0
     current_position_on_ema: Literal['above', 'below'] = None
 
+    # Everything a backtest checkpoint needs to continue an open position
+    state_attributes = ('_id', 'date', 'divergence', 'entry_price', 'avg_buyin_price', 'stop_loss_price',
+                        'take_profit_price', 'target_profit_percentage', 'stop_loss_percentage',
+                        'max_safety_order_count', 'price_deviation_trigger_so', 'base_order_complete', 'order_size',
+                        'safety_order_prices', 'safety_order_ids', 'safety_order_filled_count',
+                        'current_ohlc', 'candles', 'fee_items', 'trade_bot_balance', 'coin_amount', 'owed_coin_amount',
+                        'stables_amt_in_short', 'stables_amt_in_long', 'full_stables_amt_in_short',
+                        'full_stables_amt_in_long', 'full_coin_amount', 'full_owed_coin_amount', 'cumulative_pnl',
+                        'cummulative_pnl_pct', 'end_counter', 'candles_count_passed_entry', 'reverse_ema_counter',
+                        'current_position_on_ema')
+
     def __init__(self, _id, divergence, date, ohlc: Ohlc, stop_loss_price):
         self._id = _id
         self.date = date
         self.divergence = divergence
         self.current_ohlc = ohlc
         self.stop_loss_price = stop_loss_price
+        self.candles = CandleRingBuffer(capacity=4)
         self.trade_bot_balance = wallet.get_start_amount()
+        self.order_size = get_order_size(self.trade_bot_balance, BASE_ORDER_SIZE, self.max_safety_order_count)
         self.fee_items = {'trade_start_time': time_now_in_ms(), 'order_ids': []}
         if self.trade_bot_balance == 0:
             self.divergence = None
@@ -88,11 +113,30 @@ class DcaBot:
                     f"{'start_price':<15}: {self.entry_price} usd\n"
                     f"{'trade_bot_balance':<15}: {self.trade_bot_balance:.4f} usd\n")
         self.end_counter = 0
+        self.add_listeners()
+        self.dora_trade_transaction = DoraTradeTransaction(_id=self._id, symbol=SYMBOL, start_time=self.date,
+                                                           txn_type="", txn_interval=INTERVAL)
+
+    def add_listeners(self):
         ee.on(TelegramEventType.STATS, self.stats_requested)
         ee.on(EExchange.CANDLESTICK_EVENT, self.on_candlestick_event)
         ee.on(Trade.COMPLETE_CANDLESTICK_EVENT, self.on_complete_candlestick_event)
-        self.dora_trade_transaction = DoraTradeTransaction(_id=self._id, symbol=SYMBOL, start_time=self.date,
-                                                           txn_type="", txn_interval=INTERVAL)
+
+    def get_state(self) -> dict:
+        state = {name: getattr(self, name) for name in self.state_attributes}
+        state['dora_trade_transaction'] = txn_to_row(self.dora_trade_transaction)
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'DcaBot':
+        """Restore a bot saved with get_state, its trade is already counted in the restored wallet"""
+        dca_bot = cls.__new__(cls)
+        for name in cls.state_attributes:
+            setattr(dca_bot, name, state[name])
+        dca_bot.dora_trade_transaction = DoraTradeTransaction(
+            **{name: value for name, value in state['dora_trade_transaction'].items() if value is not None})
+        dca_bot.add_listeners()
+        return dca_bot
 
     def on_candlestick_event(self, i_candlestick_event: ICandlestickEvent):
         candlestick = i_candlestick_event['data']
@@ -101,11 +145,12 @@ class DcaBot:
     def on_complete_candlestick_event(self, ohlc: Ohlc):
         self.date = ohlc.date
         self.current_ohlc = ohlc
-        self.candlestick_list.append(ohlc)
+        self.candles.append_ohlc(ohlc)
         self.check_hit_stop_loss(self.current_ohlc)
-        self.candlestick_list = self.candlestick_list[-4:]
 
-    def process_candlestick(self, candlestick: Union[ICandlestick, ICandlestickEventData]):
+    def process_candlestick(self, candlestick: Union[ICandlestick, ICandlestickEventData],
+                            price_keys: Tuple[str, ...] = BACKTEST_PRICE_KEYS):
+        """:param price_keys: prices of the backtest candle to process, a subset to step through it with others"""
         if self.divergence is None:
             if self.end_counter < 1:
                 msg = (f"⛔ Divergence not exist for dca bot, popping instances\n"
@@ -118,15 +163,15 @@ class DcaBot:
 
         if MODE == EMode.TEST:
             self.date = datetime.utcfromtimestamp(candlestick['openTime'] / 1000)
-            self.process_current_price(candlestick['open'])
-            self.process_current_price(candlestick['high'])
-            self.process_current_price(candlestick['low'])
+            for price_key in price_keys:
+                self.process_current_price(candlestick[price_key])
         else:
             self.date = datetime.fromtimestamp(candlestick['startTime'] / 1000)
             self.process_current_price(float(candlestick['close']))
 
     def process_current_price(self, current_price):
         self.trigger_base_order(current_price)
+        self.check_safety_orders(current_price)
         self.check_price_hit_target_profit(current_price)
 
     def trigger_base_order(self, current_price):
@@ -136,19 +181,56 @@ class DcaBot:
         self.entry_price = current_price
 
         if self.divergence == "bullish":
-            self.take_profit_price = current_price * (1 + TARGET_PROFIT_PERCENTAGE)
-            self.stop_loss_price = current_price * (1 - STOP_LOSS_PERCENTAGE)
-            self.open_long_position(current_price, self.trade_bot_balance)
+            self.take_profit_price = current_price * (1 + self.target_profit_percentage)
+            self.stop_loss_price = current_price * (1 - self.stop_loss_percentage)
+            self.open_long_position(current_price, self.order_size)
         elif self.divergence == "bearish":
-            self.take_profit_price = current_price * (1 - TARGET_PROFIT_PERCENTAGE)
-            self.stop_loss_price = current_price * (1 + STOP_LOSS_PERCENTAGE)
-            self.open_short_position(current_price, self.trade_bot_balance)
+            self.take_profit_price = current_price * (1 - self.target_profit_percentage)
+            self.stop_loss_price = current_price * (1 + self.stop_loss_percentage)
+            self.open_short_position(current_price, self.order_size)
+        self.place_safety_orders(current_price)
 
         logger.info(f"INITIATE ORDER {self.date:%Y-%m-%d %H:%M:%S}\n"
                     f"{'Current Price':<15}: {current_price:.04f}\n"
                     f"{'Take Profit':<15}: {self.take_profit_price:.04f}\n"
                     f"{'Stop Loss':<15}: {self.stop_loss_price:.04f}")
 
+    def place_safety_orders(self, entry_price):
+        """The whole ladder is laid out with the base order, live it rests on the exchange as limit orders"""
+        self.safety_order_prices = get_safety_order_prices(entry_price, self.divergence, self.max_safety_order_count,
+                                                           self.price_deviation_trigger_so).tolist()
+        self.safety_order_filled_count = 0
+        if IS_PAPER_TRADING or len(self.safety_order_prices) == 0:
+            return
+        self.safety_order_ids = [str(uuid4()) for _ in self.safety_order_prices]
+        self.fee_items['order_ids'] += self.safety_order_ids
+        wallet.place_safety_orders(self.divergence, self.safety_order_prices,
+                                   [math.floor(self.order_size / price) for price in self.safety_order_prices],
+                                   self.safety_order_ids)
+
+    def check_safety_orders(self, current_price):
+        """Book every safety order the price went through at its limit price and move the take profit"""
+        if self.divergence is None:
+            return
+        is_long = self.divergence == "bullish"
+        while self.safety_order_filled_count < len(self.safety_order_prices):
+            price = self.safety_order_prices[self.safety_order_filled_count]
+            if (current_price > price) if is_long else (current_price < price):
+                break
+            self.safety_order_filled_count += 1
+            # The limit order is already on the exchange, only the position is updated
+            if is_long:
+                self.open_long_position(price, self.order_size, is_resting_order=True)
+                self.take_profit_price = self.avg_buyin_price * (1 + self.target_profit_percentage)
+            else:
+                self.open_short_position(price, self.order_size, is_resting_order=True)
+                self.take_profit_price = self.avg_buyin_price * (1 - self.target_profit_percentage)
+
+    def cancel_safety_orders(self):
+        unfilled_order_ids = self.safety_order_ids[self.safety_order_filled_count:]
+        if not IS_PAPER_TRADING and len(unfilled_order_ids):
+            wallet.cancel_safety_orders(unfilled_order_ids)
+
     def check_price_hit_target_profit(self, current_price):
         if self.divergence is None:
             return
@@ -176,6 +258,7 @@ class DcaBot:
 
     def reset_all(self):
         self.divergence = None
+        self.cancel_safety_orders()
         asset, fee, fee_in_usdt = itemgetter('asset', 'fee', 'fee_in_usdt')(self.calc_fee())
         pnl = self.cumulative_pnl - fee_in_usdt
         pnl_percentage = pnl / self.trade_bot_balance * 100
@@ -207,7 +290,7 @@ class DcaBot:
                f"=======================\n")
         telegram_bot.send_message(chat_id=chat_id, message=msg)
 
-    def open_short_position(self, current_price, collateral_amount):
+    def open_short_position(self, current_price, collateral_amount, is_resting_order=False):
         borrowed_coin_amount = math.floor(collateral_amount / current_price)
         collateral_amount = borrowed_coin_amount * current_price
 
@@ -220,7 +303,7 @@ class DcaBot:
         self.full_owed_coin_amount = self.owed_coin_amount
         self.full_stables_amt_in_short += collateral_amount
 
-        if not IS_PAPER_TRADING:
+        if not IS_PAPER_TRADING and not is_resting_order:
             order_id = str(uuid4())
             self.fee_items['order_ids'].append(order_id)
             wallet.open_short_position(quantity_in_coin=borrowed_coin_amount, order_id=order_id)
@@ -237,7 +320,7 @@ class DcaBot:
         logger.info(msg)
         telegram_bot.send_message(message=msg)
 
-    def open_long_position(self, current_price, collateral_amount):
+    def open_long_position(self, current_price, collateral_amount, is_resting_order=False):
         coin_amount = math.floor(collateral_amount / current_price)
         collateral_amount = coin_amount * current_price
         self.avg_buyin_price = (self.stables_amt_in_long + collateral_amount) / (self.coin_amount + coin_amount)
@@ -247,7 +330,7 @@ class DcaBot:
         self.full_coin_amount = self.coin_amount
         self.full_stables_amt_in_long = self.stables_amt_in_long
 
-        if not IS_PAPER_TRADING:
+        if not IS_PAPER_TRADING and not is_resting_order:
             order_id = str(uuid4())
             self.fee_items['order_ids'].append(order_id)
             wallet.open_long_position(quantity_in_coin=coin_amount, order_id=order_id)
@@ -360,7 +443,7 @@ class DcaBot:
         asset = trades[0]['commissionAsset'] if len(trades) else 'None'
         fee: float = reduce(sum_fees, filter(get_by_order_id, trades), .0)
         fee_in_usdt = fee
-        if asset and 'usdt' not in asset.lower():
+        if len(trades) and asset and 'usdt' not in asset.lower():
             mark_price_obj = exchange.get_mark_price(f'{asset}usdt')
             fee_in_usdt = mark_price_obj['markPrice'] * fee
         return {'asset': asset, 'fee': fee, 'fee_in_usdt': fee_in_usdt}
@@ -1,6 +1,7 @@
 """Signal bot class"""
 import os
-from typing import List
+from decimal import Decimal
+from typing import Dict, List
 
 from binance_f.model import IncomeType
 from dotenv import load_dotenv
@@ -9,15 +10,21 @@ from Binance_futures_python.binance_f import RequestClient
 from Binance_futures_python.binance_f.exception.binanceapiexception import BinanceApiException
 from Binance_futures_python.binance_f.model.constant import SubscribeMessageType, CandlestickInterval, OrderType, \
     OrderSide, PositionSide, WorkingType
-from Binance_futures_python.binance_f.subscriptionclient import SubscriptionClient
+from Binance_futures_python.binance_f.combinedstreamclient import CombinedStreamClient
 from classes.singleton import Singleton
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import ICandlestick, IPostOrder, IAggregateTradeEvent, IPosition, \
-    IBalance, ICandlestickEvent, ICancelAllOrders, IOrder, IMarkPrice, IAccountTrade
-from settings import SYMBOL, INTERVAL, EXCHANGE_MODE
+    IBalance, ICandlestickEvent, ICancelAllOrders, IOrder, IMarkPrice, IAccountTrade, IAggregateTrade
+from service.paper_exchange import PaperRequestClient
+from settings import SYMBOL, INTERVAL, EXCHANGE_MODE, IS_PAPER_EXCHANGE, PAPER_EXCHANGE_BALANCE, \
+    PAPER_EXCHANGE_LATENCY_MS, PAPER_EXCHANGE_REQUEST_LATENCY_MS, PAPER_EXCHANGE_SLIPPAGE, IS_ASYNCIO_WEBSOCKET
 from utils.events import ee, EExchange
+from utils.json_utils import parse_obj_to_dict, parse_obj_list_to_dict_list
 
 load_dotenv()
+# Binance limits of /fapi/v1/batchOrders
+MAX_BATCH_ORDER_COUNT = 5
+MAX_BATCH_CANCEL_COUNT = 10
 API_KEY = os.getenv('API_KEY')
 SECRET_KEY = os.getenv('SECRET_KEY')
 
@@ -27,13 +34,27 @@ class Exchange(metaclass=Singleton):
 
     def __init__(self, api_key, secret_key):
         self.req_client = RequestClient(api_key=api_key, secret_key=secret_key)
+        if IS_PAPER_EXCHANGE:
+            # Orders and account requests are simulated, market data still comes from Binance
+            self.req_client = PaperRequestClient(balance=PAPER_EXCHANGE_BALANCE, latency_ms=PAPER_EXCHANGE_LATENCY_MS,
+                                                 request_latency_ms=PAPER_EXCHANGE_REQUEST_LATENCY_MS,
+                                                 slippage=PAPER_EXCHANGE_SLIPPAGE, market_client=self.req_client)
+        # symbol: price step of its PRICE_FILTER
+        self.tick_sizes: Dict[str, float] = {}
         if EXCHANGE_MODE == EMode.PRODUCTION:
-            self.sub_client = SubscriptionClient(api_key=api_key, secret_key=secret_key)
+            # Every stream shares one combined stream socket and its thread, or its task with IS_ASYNCIO_WEBSOCKET
+            self.sub_client = CombinedStreamClient(api_key=api_key, secret_key=secret_key,
+                                                   is_asyncio=IS_ASYNCIO_WEBSOCKET)
             self.sub_client.subscribe_aggregate_trade_event(SYMBOL, Exchange.on_aggregate_trade_event,
                                                             Exchange.error)
             self.sub_client.subscribe_candlestick_event(SYMBOL, INTERVAL,
                                                         Exchange.on_candlestick_event, Exchange.error)
 
+    def start_streams(self):
+        """Connect the asyncio streams, from a coroutine on the event loop they run on"""
+        if EXCHANGE_MODE == EMode.PRODUCTION:
+            self.sub_client.start()
+
     def get_candlestick(self, interval=CandlestickInterval.MIN1,
                         start_time=None,
                         end_time=None,
@@ -44,6 +65,17 @@ class Exchange(metaclass=Singleton):
                                                       endTime=end_time, limit=limit)
         return Exchange.parse_obj_list_to_dict_list(result)
 
+    def get_aggregate_trades(self, from_id: int = None, start_time: int = None, end_time: int = None,
+                             limit: int = 1000, symbol=SYMBOL) -> List[IAggregateTrade]:
+        """
+        Return a list of dictionary of type IAggregateTrade, oldest first
+        :param from_id: first aggregate trade id, not sent with start_time/end_time
+        :param start_time: with end_time, at most 1 hour apart
+        """
+        result = self.req_client.get_aggregate_trades_list(symbol=symbol, fromId=from_id, startTime=start_time,
+                                                           endTime=end_time, limit=limit)
+        return Exchange.parse_obj_list_to_dict_list(result)
+
     def get_position(self) -> List[IPosition]:
         """Return a list of dictionary of type IPosition"""
         result = self.req_client.get_position_v2()
@@ -98,6 +130,28 @@ class Exchange(metaclass=Singleton):
                                             newClientOrderId=order_id)
         return Exchange.parse_obj_to_dict(result)
 
+    def post_batch_orders(self, orders: List[dict]) -> List[IPostOrder]:
+        """
+        Return a list of dictionary of type IPostOrder, or with code and msg for a rejected order
+        :param orders: post_order parameters with the API names (side, positionSide, type, quantity, price, ...), the
+        symbol is added. Sent MAX_BATCH_ORDER_COUNT orders per request.
+        """
+        orders = [{'symbol': SYMBOL.upper(), **order} for order in orders]
+        results = []
+        for start in range(0, len(orders), MAX_BATCH_ORDER_COUNT):
+            result = self.req_client.post_batch_orders(batchOrders=orders[start:start + MAX_BATCH_ORDER_COUNT])
+            results += Exchange.parse_obj_list_to_dict_list(result)
+        return results
+
+    def cancel_orders(self, client_order_ids: List[str]) -> List[IOrder]:
+        """Return a list of dictionary of type IOrder, or with code and msg for an order that is not open"""
+        results = []
+        for start in range(0, len(client_order_ids), MAX_BATCH_CANCEL_COUNT):
+            result = self.req_client.cancel_list_orders(
+                symbol=SYMBOL, origClientOrderIdList=client_order_ids[start:start + MAX_BATCH_CANCEL_COUNT])
+            results += Exchange.parse_obj_list_to_dict_list(result)
+        return results
+
     def get_income_history(self,
                            incomeType: IncomeType = None,
                            startTime: int = None,
@@ -112,6 +166,22 @@ class Exchange(metaclass=Singleton):
         result = self.req_client.get_account_trades(symbol=SYMBOL, startTime=start_time, endTime=end_time)
         return Exchange.parse_obj_list_to_dict_list(result)
 
+    def get_tick_size(self, symbol: str = SYMBOL) -> float:
+        """Price step of symbol, the exchange information of every symbol is fetched once"""
+        symbol = symbol.upper()
+        if symbol not in self.tick_sizes:
+            for item in self.req_client.get_exchange_information().symbols:
+                for symbol_filter in item.filters:
+                    if symbol_filter['filterType'] == 'PRICE_FILTER':
+                        self.tick_sizes[item.symbol] = float(symbol_filter['tickSize'])
+        return self.tick_sizes[symbol]
+
+    def format_price(self, price: float, symbol: str = SYMBOL) -> str:
+        """Order price rounded to the tick size of symbol, with as many decimals as the tick size"""
+        tick_size = self.get_tick_size(symbol)
+        decimals = max(0, -Decimal(str(tick_size)).normalize().as_tuple().exponent)
+        return f"{round(price / tick_size) * tick_size:.{decimals}f}"
+
     def get_mark_price(self, symbol) -> IMarkPrice:
         result = self.req_client.get_mark_price(symbol)
         return Exchange.parse_obj_to_dict(result)
@@ -136,25 +206,11 @@ class Exchange(metaclass=Singleton):
 
     @staticmethod
     def parse_obj_list_to_dict_list(obj_list):
-        _list = []
-        for obj in obj_list:
-            _dict = Exchange.parse_obj_to_dict(obj)
-            _list.append(_dict)
-        return _list
+        return parse_obj_list_to_dict_list(obj_list)
 
     @staticmethod
     def parse_obj_to_dict(obj):
-        _dict = {}
-        members = [attr for attr in dir(obj) if not callable(attr) and not attr.startswith("__")]
-        for member in members:
-            val = getattr(obj, member)
-            if isinstance(val, list):
-                _dict[member] = Exchange.parse_obj_list_to_dict_list(val)
-            elif 'binance' in val.__class__.__module__:
-                _dict[member] = Exchange.parse_obj_to_dict(val)
-            else:
-                _dict[member] = val
-        return _dict
+        return parse_obj_to_dict(obj)
 
 
 exchange = Exchange(API_KEY, SECRET_KEY)
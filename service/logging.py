@@ -51,9 +51,14 @@ def get_telegram_bot_logger():
 def get_indicator_logger():
     return logging.getLogger('indicator-util')
 
+
+def get_backtest_logger():
+    return logging.getLogger('backtest')
+
 controller_logger = get_controller_logger()
 signal_bot_logger = get_signal_bot_logger()
 dca_bot_logger = get_dca_bot_logger()
 wallet_logger = get_wallet_logger()
 telegram_bot_logger = get_telegram_bot_logger()
 indicator_util_logger = get_indicator_logger()
+backtest_logger = get_backtest_logger()
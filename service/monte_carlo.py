@@ -0,0 +1,122 @@
+"""Monte Carlo resampling of backtest trade sequences"""
+import time
+from typing import List, Literal, Tuple
+
+import numpy as np
+import pandas as pd
+
+from custom_types.trade_type import IBatchTrade, IDistribution, IMonteCarloResult
+from service.logging import setup_logging, backtest_logger as logger
+from utils.general_utils import get_backtest_file_path
+
+ResampleMethod = Literal['bootstrap', 'permutation']
+
+# Values per resampled chunk, keeps the (simulations, trades) arrays in a few MB
+CHUNK_VALUE_COUNT = 1 << 20
+
+
+def get_trade_returns(pnl: np.ndarray, overall_fund: np.ndarray) -> np.ndarray:
+    """Return of every trade on the fund before it closed, resampled paths then compound like the Wallet"""
+    pnl, overall_fund = np.asarray(pnl, dtype=np.float64), np.asarray(overall_fund, dtype=np.float64)
+    return pnl / (overall_fund - pnl)
+
+
+def get_batch_trade_returns(trades: List[IBatchTrade]) -> np.ndarray:
+    return get_trade_returns(np.array([trade['pnl'] for trade in trades], dtype=np.float64),
+                             np.array([trade['overall_fund'] for trade in trades], dtype=np.float64))
+
+
+def load_backtest_returns(filepath: str = None) -> np.ndarray:
+    """Trade returns of the backtest_result.csv written by the Wallet"""
+    df = pd.read_csv(filepath or get_backtest_file_path(), usecols=['pnl', 'overall_fund'])
+    return get_trade_returns(df['pnl'].values, df['overall_fund'].values)
+
+
+def get_max_streaks(flags: np.ndarray) -> np.ndarray:
+    """Longest run of True of every row"""
+    counts = np.cumsum(flags, axis=1, dtype=np.int32)
+    last_reset = np.maximum.accumulate(np.where(flags, 0, counts), axis=1)
+    return (counts - last_reset).max(axis=1, initial=0)
+
+
+def get_path_stats(returns: np.ndarray, starting_fund: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :param returns: one resampled trade sequence per row
+    :returns: final equity, max drawdown (%) and max losing streak of every row
+    """
+    equity = starting_fund * np.cumprod(1 + returns, axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), starting_fund)
+    max_drawdown_pct = ((peak - equity) / peak).max(axis=1, initial=0) * 100
+    final_equity = equity[:, -1] if returns.shape[1] else np.full(len(returns), float(starting_fund))
+    return final_equity, max_drawdown_pct, get_max_streaks(returns < 0)
+
+
+def simulate_paths(returns: np.ndarray, starting_fund: float = 1000, simulation_count: int = 10000,
+                   method: ResampleMethod = 'bootstrap',
+                   seed: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Resample the trade sequence simulation_count times, in chunks of rows.
+    bootstrap draws trades with replacement; permutation only reorders them, so its final equity is always the
+    same and only the path (drawdown, streaks) changes.
+    :returns: final equity, max drawdown (%) and max losing streak of every simulation
+    """
+    if method not in ('bootstrap', 'permutation'):
+        raise ValueError(f"Unknown resample method {method}")
+    returns = np.asarray(returns, dtype=np.float64)
+    trade_count = len(returns)
+    rng = np.random.default_rng(seed)
+    final_equity = np.empty(simulation_count)
+    max_drawdown_pct = np.empty(simulation_count)
+    max_losing_streak = np.empty(simulation_count, dtype=np.int32)
+    chunk_size = max(1, CHUNK_VALUE_COUNT // max(trade_count, 1))
+    for start in range(0, simulation_count, chunk_size):
+        end = min(start + chunk_size, simulation_count)
+        if method == 'bootstrap':
+            samples = returns[rng.integers(0, trade_count, size=(end - start, trade_count))]
+        else:
+            samples = rng.permuted(np.broadcast_to(returns, (end - start, trade_count)), axis=1)
+        final_equity[start:end], max_drawdown_pct[start:end], max_losing_streak[start:end] = \
+            get_path_stats(samples, starting_fund)
+    return final_equity, max_drawdown_pct, max_losing_streak
+
+
+def get_distribution(values: np.ndarray) -> IDistribution:
+    p5, p25, p50, p75, p95 = np.percentile(values, [5, 25, 50, 75, 95])
+    return {'mean': float(values.mean()), 'std': float(values.std()), 'min': float(values.min()),
+            'p5': float(p5), 'p25': float(p25), 'p50': float(p50), 'p75': float(p75), 'p95': float(p95),
+            'max': float(values.max())}
+
+
+def run_monte_carlo(returns: np.ndarray, starting_fund: float = 1000, simulation_count: int = 10000,
+                    method: ResampleMethod = 'bootstrap', seed: int = None) -> IMonteCarloResult:
+    """Distributions of the final equity, max drawdown and max losing streak over resampled trade sequences"""
+    final_equity, max_drawdown_pct, max_losing_streak = simulate_paths(returns, starting_fund, simulation_count,
+                                                                       method, seed)
+    return {'method': method,
+            'simulation_count': simulation_count,
+            'trade_count': len(returns),
+            'final_equity': get_distribution(final_equity),
+            'max_drawdown_pct': get_distribution(max_drawdown_pct),
+            'max_losing_streak': get_distribution(max_losing_streak),
+            'probability_of_loss': float(np.mean(final_equity < starting_fund))}
+
+
+if __name__ == '__main__':
+    setup_logging()
+    start_time = time.time()
+    backtest_returns = load_backtest_returns()
+    original_equity, original_drawdown_pct, original_losing_streak = get_path_stats(backtest_returns[np.newaxis], 1000)
+    for resample_method in ('bootstrap', 'permutation'):
+        result = run_monte_carlo(backtest_returns, simulation_count=50000, method=resample_method)
+        msg = (f"MONTE CARLO ({resample_method}, {result['simulation_count']} runs of {result['trade_count']} trades)\n"
+               f"===========================\n"
+               f"{'':<18}{'backtest':>10}{'p5':>10}{'p50':>10}{'p95':>10}\n")
+        for name, original in (('final_equity', original_equity[0]), ('max_drawdown_pct', original_drawdown_pct[0]),
+                               ('max_losing_streak', original_losing_streak[0])):
+            distribution = result[name]
+            msg += (f"{name:<18}{original:>10.2f}{distribution['p5']:>10.2f}{distribution['p50']:>10.2f}"
+                    f"{distribution['p95']:>10.2f}\n")
+        msg += (f"{'probability of loss':<18}: {result['probability_of_loss'] * 100:.2f}%\n"
+                f"===========================\n")
+        logger.info(msg)
+    logger.info(f"monte carlo done in {time.time() - start_time:.1f}s")
@@ -0,0 +1,120 @@
+"""Backtest several symbols, each with its own wallet or sharing one"""
+import heapq
+import itertools
+import time
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from custom_types.exchange_type import EToken
+from custom_types.trade_type import IBatchTrade, IBacktestMetrics
+from service.batch_dca_bot import BatchDcaBot, get_trade_metrics
+from service.batch_signal_bot import BatchSignalBot
+from service.logging import setup_logging, backtest_logger as logger
+from settings import INTERVAL
+from utils.candle_store import CandleStore
+
+
+def load_symbol(symbol: str, start_time: Union[int, datetime] = None,
+                end_time: Union[int, datetime] = None) -> Dict[str, np.ndarray]:
+    return CandleStore(symbol, INTERVAL).load_range(start_time, end_time)
+
+
+def find_symbol_signals(symbol: str, start_time, end_time, signal_params: dict) -> List[dict]:
+    candles = load_symbol(symbol, start_time, end_time)
+    signal_bot = BatchSignalBot(candles['open_time'], candles['open'], candles['high'], candles['low'],
+                                candles['close'], candles['volume'], candles['quoteAssetVolume'], **signal_params)
+    return signal_bot.find_divergence_indexes()
+
+
+def get_symbol_dca_bot(symbol: str, start_time, end_time, dca_params: dict) -> BatchDcaBot:
+    candles = load_symbol(symbol, start_time, end_time)
+    return BatchDcaBot(candles['open'], candles['high'], candles['low'], candles['close'], candles['open_time'],
+                       symbol=symbol, **dca_params)
+
+
+def run_symbol(symbol: str, start_time, end_time, signal_params: dict, dca_params: dict) -> List[IBatchTrade]:
+    """Backtest one symbol with its own wallet"""
+    dca_bot = get_symbol_dca_bot(symbol, start_time, end_time, dca_params)
+    return dca_bot.run(find_symbol_signals(symbol, start_time, end_time, signal_params))
+
+
+def run_shared_wallet(signals_by_symbol: Dict[str, List[dict]],
+                      dca_bots: Dict[str, BatchDcaBot]) -> Tuple[List[IBatchTrade], float]:
+    """
+    Trade the signals of every symbol in time order with one wallet and one MAX_CONCURRENT_TRADE budget,
+    like a single Controller receiving the candles of all symbols
+    :returns: completed trades in the order they were closed; starting fund
+    """
+    first_bot = next(iter(dca_bots.values()))
+    overall_wallet_fund = starting_fund = first_bot.overall_wallet_fund
+    max_concurrent_trade = first_bot.max_concurrent_trade
+    tradeable_amount = overall_wallet_fund / max_concurrent_trade
+
+    # k-way merge of the per symbol signals, already sorted by candle
+    streams = []
+    for order, (symbol, signals) in enumerate(signals_by_symbol.items()):
+        open_time = dca_bots[symbol].open_time
+        streams.append([(int(open_time[signal['index']]), order, signal['index'], symbol, signal)
+                        for signal in signals])
+
+    open_trades: List[Tuple[float, int, IBatchTrade]] = []
+    sequence = itertools.count()
+    trades: List[IBatchTrade] = []
+    for signal_time, _, _, symbol, signal in heapq.merge(*streams):
+        while open_trades and open_trades[0][0] <= signal_time:
+            _, _, trade = heapq.heappop(open_trades)
+            overall_wallet_fund = dca_bots[trade['symbol']].close_trade(trade, overall_wallet_fund)
+            trades.append(trade)
+        if len(open_trades) >= max_concurrent_trade:
+            continue
+        if len(open_trades) == 0:
+            tradeable_amount = overall_wallet_fund / max_concurrent_trade
+        trade = dca_bots[symbol].open_trade(signal, tradeable_amount)
+        if trade is not None:
+            exit_time = np.inf if trade['exit_time'] is None else trade['exit_time']
+            heapq.heappush(open_trades, (exit_time, next(sequence), trade))
+    while open_trades and open_trades[0][0] != np.inf:
+        _, _, trade = heapq.heappop(open_trades)
+        overall_wallet_fund = dca_bots[trade['symbol']].close_trade(trade, overall_wallet_fund)
+        trades.append(trade)
+    return trades, starting_fund
+
+
+def run_multi_symbol_backtest(symbols: List[str], start_time: Union[int, datetime] = None,
+                              end_time: Union[int, datetime] = None, shared_wallet=True,
+                              signal_params: dict = None, dca_params: dict = None,
+                              processes: int = None) -> Tuple[List[IBatchTrade], IBacktestMetrics]:
+    """
+    Signals are found per symbol in parallel. With shared_wallet the trades are simulated in one time ordered
+    stream, otherwise every symbol runs its whole backtest in a worker with its own wallet.
+    :returns: portfolio trades ordered by exit time; portfolio metrics
+    """
+    signal_params, dca_params = signal_params or {}, dca_params or {}
+    tasks = [(symbol, start_time, end_time, signal_params) for symbol in symbols]
+    with Pool(processes=processes) as pool:
+        if shared_wallet:
+            signals_by_symbol = dict(zip(symbols, pool.starmap(find_symbol_signals, tasks)))
+        else:
+            trades_by_symbol = pool.starmap(run_symbol, [task + (dca_params,) for task in tasks])
+
+    if shared_wallet:
+        dca_bots = {symbol: get_symbol_dca_bot(symbol, start_time, end_time, dca_params) for symbol in symbols}
+        trades, starting_fund = run_shared_wallet(signals_by_symbol, dca_bots)
+    else:
+        trades = sorted((trade for symbol_trades in trades_by_symbol for trade in symbol_trades),
+                        key=lambda trade: trade['exit_time'])
+        starting_fund = dca_params.get('overall_wallet_fund', BatchDcaBot.overall_wallet_fund) * len(symbols)
+    metrics = get_trade_metrics(trades, starting_fund)
+    logger.info(f"multi symbol backtest {symbols} {shared_wallet=}: {metrics}")
+    return trades, metrics
+
+
+if __name__ == '__main__':
+    setup_logging()
+    start = time.time()
+    run_multi_symbol_backtest([EToken.MATIC_USDT, EToken.AAVE_USDT, EToken.AVAX_USDT, EToken.XRPUSDT],
+                              datetime(2021, 9, 1, 0, 00), datetime(2021, 9, 30, 0, 0))
+    logger.info(f"done in {time.time() - start:.1f}s")
@@ -0,0 +1,330 @@
+"""In-process simulated exchange with the RequestClient interface, for running the real order path without money"""
+import time
+from collections import Counter
+from typing import Dict, List, Tuple, Union
+
+from binance_f.model import Order, Position, BalanceV2, MyTrade, MarkPrice, Msg, CodeMsg
+
+from Binance_futures_python.binance_f.exception.binanceapiexception import BinanceApiException
+from Binance_futures_python.binance_f.model.constant import OrderType, OrderSide, PositionSide, WorkingType, \
+    TimeInForce
+from custom_types.exchange_type import IAggregateTradeEvent
+from settings import SYMBOL, TRADE_LEVERAGE
+from utils.events import ee, EExchange
+
+MAKER_FEE_RATE = 0.00016
+TAKER_FEE_RATE = 0.00036
+# Order type: (side whose order triggers when the price is at or above stopPrice)
+STOP_ORDER_TYPES = {OrderType.STOP_MARKET: OrderSide.BUY, OrderType.TAKE_PROFIT_MARKET: OrderSide.SELL}
+# API name of a batch order parameter: post_order parameter
+BATCH_ORDER_PARAMS = {'type': 'ordertype'}
+
+
+def time_now_in_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class PaperRequestClient:
+    """
+    Hedge mode USDT-M account filled against the prices it is fed, live aggregate trades or the prices of replayed
+    candles.
+    Market orders fill at the first price latency_ms of market time after they are posted, with slippage against
+    them; limit orders rest until the price crosses them. Every request blocks request_latency_ms of wall time, like
+    a round trip to the exchange. Market data requests go to market_client.
+    """
+    # Account and order book of a backtest checkpoint
+    state_attributes = ('balance', 'last_prices', 'positions', 'orders', 'open_orders', 'due_times', 'trades',
+                        'request_counts', 'last_order_id', 'last_trade_id')
+
+    def __init__(self, balance: float = 1000, latency_ms: int = 0, request_latency_ms: int = 0,
+                 slippage: float = 0.0002, maker_fee_rate: float = MAKER_FEE_RATE,
+                 taker_fee_rate: float = TAKER_FEE_RATE, leverage: float = TRADE_LEVERAGE, market_client=None):
+        self.balance = balance
+        self.latency_ms = latency_ms
+        self.request_latency_ms = request_latency_ms
+        self.slippage = slippage
+        self.maker_fee_rate = maker_fee_rate
+        self.taker_fee_rate = taker_fee_rate
+        self.leverage = leverage
+        self.market_client = market_client
+        # symbol: (price, market time in ms)
+        self.last_prices: Dict[str, Tuple[float, int]] = {}
+        # (symbol, position side): [positionAmt, entryPrice], positionAmt < 0 for a short
+        self.positions: Dict[Tuple[str, str], List[float]] = {}
+        self.orders: Dict[int, Order] = {}
+        self.open_orders: Dict[int, Order] = {}
+        # orderId: market time from which a market order can fill
+        self.due_times: Dict[int, int] = {}
+        self.trades: List[MyTrade] = []
+        self.request_counts = Counter()
+        self.last_order_id = 0
+        self.last_trade_id = 0
+        ee.on(EExchange.TRADE_EVENT, self.on_aggregate_trade_event)
+
+    def get_state(self) -> dict:
+        return {name: getattr(self, name) for name in self.state_attributes}
+
+    def set_state(self, state: dict):
+        for name in self.state_attributes:
+            setattr(self, name, state[name])
+
+    def __getattr__(self, name):
+        if name.startswith('_') or self.__dict__.get('market_client') is None:
+            raise AttributeError(name)
+        return getattr(self.market_client, name)
+
+    def simulate_request(self, name: str):
+        self.request_counts[name] += 1
+        if self.request_latency_ms:
+            time.sleep(self.request_latency_ms / 1000)
+
+    # Price feed
+
+    def on_aggregate_trade_event(self, event: IAggregateTradeEvent):
+        self.update_price(event['price'], event['time'], event['symbol'])
+
+    def update_price(self, price: float, timestamp: int, symbol: str = SYMBOL):
+        """Move the market of symbol and fill every order the new price reaches"""
+        symbol = symbol.upper()
+        self.last_prices[symbol] = (price, timestamp)
+        for order in list(self.open_orders.values()):
+            if order.symbol != symbol:
+                continue
+            if order.type == OrderType.MARKET:
+                if timestamp >= self.due_times[order.orderId]:
+                    self.fill(order, self.apply_slippage(price, order.side), self.taker_fee_rate)
+            elif order.type == OrderType.LIMIT:
+                if (price <= order.price) if order.side == OrderSide.BUY else (price >= order.price):
+                    self.fill(order, order.price, self.maker_fee_rate)
+            elif (price >= order.stopPrice) == (STOP_ORDER_TYPES[order.type] == order.side):
+                self.fill(order, self.apply_slippage(price, order.side), self.taker_fee_rate)
+
+    def apply_slippage(self, price: float, side: str) -> float:
+        return price * (1 + self.slippage) if side == OrderSide.BUY else price * (1 - self.slippage)
+
+    # Matching
+
+    def get_position_entry(self, symbol: str, position_side: str) -> List[float]:
+        return self.positions.setdefault((symbol, position_side), [0.0, 0.0])
+
+    def fill(self, order: Order, price: float, fee_rate: float):
+        del self.open_orders[order.orderId]
+        position = self.get_position_entry(order.symbol, order.positionSide)
+        quantity = abs(position[0]) if order.closePosition else order.origQty
+        signed_quantity = quantity if order.side == OrderSide.BUY else -quantity
+        if order.positionSide == PositionSide.LONG and position[0] + signed_quantity < -1e-9 or \
+                order.positionSide == PositionSide.SHORT and position[0] + signed_quantity > 1e-9:
+            order.status = 'REJECTED'
+            return
+
+        realized_pnl = 0.0
+        if position[0] == 0 or (position[0] > 0) == (signed_quantity > 0):
+            position[1] = (position[1] * abs(position[0]) + price * quantity) / (abs(position[0]) + quantity)
+            position[0] += signed_quantity
+        else:
+            closed_quantity = min(quantity, abs(position[0]))
+            realized_pnl = (price - position[1]) * closed_quantity * (1 if position[0] > 0 else -1)
+            position[0] += signed_quantity
+            if abs(position[0]) < 1e-9:
+                position[:] = [0.0, 0.0]
+            elif (position[0] > 0) == (signed_quantity > 0):
+                # One-way mode position flipped by the order
+                position[1] = price
+        commission = price * quantity * fee_rate
+        self.balance += realized_pnl - commission
+
+        now = time_now_in_ms()
+        order.status = 'FILLED'
+        order.executedQty = quantity
+        order.avgPrice = price
+        order.cumQuote = price * quantity
+        order.updateTime = now
+        trade = MyTrade()
+        self.last_trade_id += 1
+        trade.id = self.last_trade_id
+        trade.orderId = order.orderId
+        trade.symbol = order.symbol
+        trade.side = order.side
+        trade.isBuyer = order.side == OrderSide.BUY
+        trade.isMaker = order.type == OrderType.LIMIT
+        trade.price = price
+        trade.qty = quantity
+        trade.quoteQty = price * quantity
+        trade.realizedPnl = realized_pnl
+        trade.commission = commission
+        trade.commissionAsset = 'USDT'
+        # Stamped with the wall clock like the exchange, so trade lists filtered by time_now_in_ms() work in replays
+        trade.time = now
+        self.trades.append(trade)
+
+    def get_unrealized_pnl(self) -> float:
+        return sum((self.last_prices[symbol][0] - entry_price) * amount
+                   for (symbol, _), (amount, entry_price) in self.positions.items() if amount and symbol in
+                   self.last_prices)
+
+    def get_position_margin(self) -> float:
+        return sum(abs(amount) * entry_price for amount, entry_price in self.positions.values()) / self.leverage
+
+    # RequestClient interface
+
+    def post_order(self, symbol: str, side: str, ordertype: str, timeInForce: str = TimeInForce.INVALID,
+                   quantity: float = None, reduceOnly: bool = None, price: float = None, newClientOrderId: str = None,
+                   stopPrice: float = None, workingType: str = WorkingType.INVALID, closePosition: bool = None,
+                   positionSide: str = PositionSide.INVALID, callbackRate: float = None,
+                   activationPrice: float = None, newOrderRespType: str = None) -> Order:
+        self.simulate_request('post_order')
+        return self.create_order(symbol, side, ordertype, timeInForce, quantity, reduceOnly, price, newClientOrderId,
+                                 stopPrice, workingType, closePosition, positionSide)
+
+    def create_order(self, symbol: str, side: str, ordertype: str, timeInForce: str = TimeInForce.INVALID,
+                     quantity: float = None, reduceOnly: bool = None, price: float = None,
+                     newClientOrderId: str = None, stopPrice: float = None, workingType: str = WorkingType.INVALID,
+                     closePosition: bool = None, positionSide: str = PositionSide.INVALID) -> Order:
+        if ordertype not in (OrderType.MARKET, OrderType.LIMIT) and ordertype not in STOP_ORDER_TYPES:
+            raise BinanceApiException(BinanceApiException.INPUT_ERROR, f"Order type {ordertype} is not simulated")
+        if ordertype == OrderType.LIMIT and price is None or ordertype in STOP_ORDER_TYPES and stopPrice is None:
+            raise BinanceApiException(BinanceApiException.INPUT_ERROR, f"{ordertype} order without a price")
+        if quantity is None and not closePosition:
+            raise BinanceApiException(BinanceApiException.INPUT_ERROR, "Order without quantity")
+        symbol = symbol.upper()
+        quantity = 0.0 if quantity is None else float(quantity)
+        position_side = positionSide or PositionSide.BOTH
+        opens_position = (side == OrderSide.BUY) == (position_side != PositionSide.SHORT) and not closePosition
+        last_price = self.last_prices.get(symbol, (price or stopPrice, 0))[0]
+        if opens_position and last_price and quantity * last_price / self.leverage > self.get_available_balance():
+            raise BinanceApiException(BinanceApiException.EXEC_ERROR, "Margin is insufficient.")
+
+        order = Order()
+        self.last_order_id += 1
+        order.orderId = self.last_order_id
+        order.clientOrderId = newClientOrderId or f'paper-{order.orderId}'
+        order.symbol = symbol
+        order.side = side
+        order.positionSide = position_side
+        order.type = order.origType = ordertype
+        order.timeInForce = timeInForce
+        order.origQty = quantity
+        order.executedQty = 0.0
+        order.price = price or 0.0
+        order.stopPrice = stopPrice or 0.0
+        order.closePosition = bool(closePosition)
+        order.reduceOnly = bool(reduceOnly)
+        order.workingType = workingType
+        order.status = 'NEW'
+        order.updateTime = time_now_in_ms()
+        self.orders[order.orderId] = order
+        self.open_orders[order.orderId] = order
+        if ordertype == OrderType.MARKET:
+            self.due_times[order.orderId] = self.last_prices.get(symbol, (0, 0))[1] + self.latency_ms
+            if self.latency_ms == 0 and symbol in self.last_prices:
+                self.fill(order, self.apply_slippage(last_price, side), self.taker_fee_rate)
+        return order
+
+    def post_batch_orders(self, batchOrders: List[dict]) -> List[Union[Order, Msg]]:
+        """One request for every order, a rejected order is a Msg in its place like on Binance"""
+        self.simulate_request('post_batch_orders')
+        results = []
+        for batch_order in batchOrders:
+            params = {BATCH_ORDER_PARAMS.get(name, name): value for name, value in batch_order.items()}
+            for name in ('price', 'stopPrice'):
+                if params.get(name) is not None:
+                    params[name] = float(params[name])
+            try:
+                results.append(self.create_order(**params))
+            except BinanceApiException as e:
+                msg = Msg()
+                msg.code, msg.msg = -1, e.error_message
+                results.append(msg)
+        return results
+
+    def get_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None) -> Order:
+        self.simulate_request('get_order')
+        for order in ([self.orders.get(orderId)] if orderId is not None else self.orders.values()):
+            if order is not None and (orderId is not None or order.clientOrderId == origClientOrderId):
+                return order
+        raise BinanceApiException(BinanceApiException.EXEC_ERROR, "Order does not exist.")
+
+    def get_open_orders(self, symbol: str = None) -> List[Order]:
+        self.simulate_request('get_open_orders')
+        return [order for order in self.open_orders.values() if symbol is None or order.symbol == symbol.upper()]
+
+    def cancel_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None) -> Order:
+        order = self.get_order(symbol, orderId, origClientOrderId)
+        self.simulate_request('cancel_order')
+        if order.orderId not in self.open_orders:
+            raise BinanceApiException(BinanceApiException.EXEC_ERROR, "Unknown order sent.")
+        del self.open_orders[order.orderId]
+        order.status = 'CANCELED'
+        return order
+
+    def cancel_list_orders(self, symbol: str, orderIdList: List[int] = None,
+                           origClientOrderIdList: List[str] = None) -> List[Union[Order, Msg]]:
+        self.simulate_request('cancel_list_orders')
+        client_order_ids = set(origClientOrderIdList or [])
+        results = []
+        for order in list(self.orders.values()):
+            if order.orderId in (orderIdList or []) or order.clientOrderId in client_order_ids:
+                if self.open_orders.pop(order.orderId, None) is None:
+                    msg = Msg()
+                    msg.code, msg.msg = -2011, 'Unknown order sent.'
+                    results.append(msg)
+                    continue
+                order.status = 'CANCELED'
+                results.append(order)
+        return results
+
+    def cancel_all_orders(self, symbol: str) -> CodeMsg:
+        self.simulate_request('cancel_all_orders')
+        for order in self.get_open_orders(symbol):
+            del self.open_orders[order.orderId]
+            order.status = 'CANCELED'
+        result = CodeMsg()
+        result.code = 200
+        result.msg = 'The operation of cancel all open order is done.'
+        return result
+
+    def get_available_balance(self) -> float:
+        return self.balance + self.get_unrealized_pnl() - self.get_position_margin()
+
+    def get_balance_v2(self) -> List[BalanceV2]:
+        self.simulate_request('get_balance_v2')
+        balance = BalanceV2()
+        balance.accountAlias = 'paper'
+        balance.asset = 'USDT'
+        balance.balance = balance.crossWalletBalance = self.balance
+        balance.crossUnPnl = self.get_unrealized_pnl()
+        balance.availableBalance = balance.maxWithdrawAmount = self.get_available_balance()
+        return [balance]
+
+    def get_position_v2(self) -> List[Position]:
+        self.simulate_request('get_position_v2')
+        positions = []
+        for (symbol, position_side), (amount, entry_price) in self.positions.items():
+            position = Position()
+            position.symbol = symbol
+            position.positionSide = position_side
+            position.positionAmt = amount
+            position.entryPrice = entry_price
+            position.markPrice = self.last_prices.get(symbol, (entry_price, 0))[0]
+            position.unrealizedProfit = (position.markPrice - entry_price) * amount
+            position.leverage = self.leverage
+            position.marginType = 'cross'
+            positions.append(position)
+        return positions
+
+    def get_account_trades(self, symbol: str, startTime: int = None, endTime: int = None, fromId: int = None,
+                           limit: int = None) -> List[MyTrade]:
+        self.simulate_request('get_account_trades')
+        trades = [trade for trade in self.trades if trade.symbol == symbol.upper() and
+                  (startTime is None or trade.time >= startTime) and (endTime is None or trade.time <= endTime) and
+                  (fromId is None or trade.id >= fromId)]
+        return trades[:limit or 500]
+
+    def get_mark_price(self, symbol: str) -> MarkPrice:
+        if symbol.upper() not in self.last_prices and self.market_client is not None:
+            return self.market_client.get_mark_price(symbol)
+        self.simulate_request('get_mark_price')
+        mark_price = MarkPrice()
+        mark_price.symbol = symbol.upper()
+        mark_price.markPrice, mark_price.time = self.last_prices.get(symbol.upper(), (0.0, 0))
+        return mark_price
@@ -0,0 +1,42 @@
+"""
+Offline backtest through the real order path, DcaBot -> Wallet -> Exchange, with the orders filled by the paper
+exchange instead of Binance. Run it as a script: the modes are read from settings when the bots are imported.
+"""
+import settings
+
+settings.IS_PAPER_TRADING = False
+settings.IS_PAPER_EXCHANGE = True
+
+import time  # noqa: E402
+from datetime import datetime  # noqa: E402
+
+import pandas as pd  # noqa: E402
+
+from main_controller import Controller  # noqa: E402
+from service.exchange import exchange  # noqa: E402
+from service.logging import setup_logging, backtest_logger as logger  # noqa: E402
+from service.wallet import wallet  # noqa: E402
+from settings import SYMBOL, INTERVAL  # noqa: E402
+from utils.candle_store import CandleStore  # noqa: E402
+
+
+def run_paper_exchange_backtest(chart_df: pd.DataFrame = None) -> dict:
+    """
+    :param chart_df: candles with a 'date' column, the ones of Controller.load_backtest_data when None
+    :returns: completed trade count, wallet fund, paper account balance and request count of every endpoint
+    """
+    controller = Controller()
+    if chart_df is not None:
+        controller.load_backtest_data = lambda: chart_df
+    controller.read_filepath_or_buffer(resume=False)
+    return {'trade_count': wallet.total_completed_trade, 'overall_wallet_fund': wallet.overall_wallet_fund,
+            'paper_balance': exchange.req_client.balance,
+            'request_counts': dict(exchange.req_client.request_counts)}
+
+
+if __name__ == '__main__':
+    setup_logging()
+    start_time = time.time()
+    report = run_paper_exchange_backtest(
+        CandleStore(SYMBOL, INTERVAL).load_dataframe(datetime(2021, 9, 1, 0, 00), datetime(2021, 9, 30, 23, 0)))
+    logger.info(f"paper exchange backtest done in {time.time() - start_time:.1f}s\n{report}")
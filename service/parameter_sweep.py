@@ -0,0 +1,171 @@
+"""Parameter sweep over BatchSignalBot and BatchDcaBot settings"""
+import itertools
+import os
+import tempfile
+import time
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from custom_types.trade_type import IBatchTrade, IBacktestMetrics
+from service.batch_dca_bot import BatchDcaBot
+from service.batch_signal_bot import BatchSignalBot
+from service.logging import setup_logging, backtest_logger as logger
+from settings import SYMBOL, INTERVAL
+from utils.candle_store import CandleStore
+from utils.result_cache import ResultCache, get_array_checksum
+
+# Column order of the shared candle array, open time in epoch ms is exact in float64
+CANDLE_COLUMNS = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'quote_asset_volume')
+
+_candles: Optional[np.ndarray] = None
+
+
+def expand_grid(grid: Dict[str, list]) -> List[dict]:
+    """Every combination of the grid values, e.g. {'rsi_oversold': [25, 30]}"""
+    for name in grid:
+        if name not in BatchSignalBot.param_names and name not in BatchDcaBot.param_names:
+            raise ValueError(f"Unknown sweep parameter {name}")
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def split_params(params: dict) -> Tuple[dict, dict]:
+    """:returns: BatchSignalBot params; BatchDcaBot params"""
+    signal_params = {name: value for name, value in params.items() if name in BatchSignalBot.param_names}
+    dca_params = {name: value for name, value in params.items() if name in BatchDcaBot.param_names}
+    return signal_params, dca_params
+
+
+def get_resolved_params(params: dict) -> dict:
+    """Every BatchSignalBot and BatchDcaBot parameter a setting runs with, the ones it leaves out from settings"""
+    return {**{name: getattr(BatchSignalBot, name) for name in BatchSignalBot.param_names},
+            **{name: getattr(BatchDcaBot, name) for name in BatchDcaBot.param_names}, **params}
+
+
+def get_candle_array(df: pd.DataFrame) -> np.ndarray:
+    """The backtest dataframe as one float64 array, rows in CANDLE_COLUMNS order"""
+    candles = np.empty((len(CANDLE_COLUMNS), len(df.index)), dtype=np.float64)
+    candles[0] = df['date'].values.astype('datetime64[ms]').astype(np.int64)
+    for row, name in enumerate(('open', 'high', 'low', 'close', 'volume', 'quoteAssetVolume'), start=1):
+        candles[row] = df[name].values
+    return candles
+
+
+def save_candles(candles: np.ndarray, filepath: str) -> str:
+    """Write the candle array for the workers to memory map"""
+    np.save(filepath, candles)
+    return filepath
+
+
+def init_worker(filepath: str):
+    global _candles
+    _candles = np.load(filepath, mmap_mode='r')
+
+
+def get_candles() -> np.ndarray:
+    """Memory mapped candles of the current worker, rows in CANDLE_COLUMNS order"""
+    return _candles
+
+
+def group_by_signal_params(grid: Dict[str, list]) -> Dict[tuple, List[dict]]:
+    """Settings of the grid grouped by their BatchSignalBot params, so signals are found once per group"""
+    configs: Dict[tuple, List[dict]] = {}
+    for params in expand_grid(grid):
+        signal_params, dca_params = split_params(params)
+        configs.setdefault(tuple(signal_params.items()), []).append(dca_params)
+    return configs
+
+
+def run_signal_params(signal_params: dict, dca_params_list: List[dict]) -> List[dict]:
+    """Find the signals once, then trade them with every dca setting"""
+    open_time, _open, high, low, close, volume, quote_asset_volume = _candles
+    signal_bot = BatchSignalBot(open_time, _open, high, low, close, volume, quote_asset_volume, **signal_params)
+    signals = signal_bot.find_divergence_indexes()
+    results = []
+    for dca_params in dca_params_list:
+        dca_bot = BatchDcaBot(_open, high, low, close, open_time, **dca_params)
+        trades = dca_bot.run(signals)
+        results.append({**signal_params, **dca_params, 'signal': len(signals), **dca_bot.get_metrics(trades)})
+    return results
+
+
+def run_backtest(df: pd.DataFrame, params: dict = None,
+                 result_cache: ResultCache = None) -> Tuple[List[IBatchTrade], IBacktestMetrics]:
+    """Backtest a single setting in this process, returned from result_cache when it was already run"""
+    candles = get_candle_array(df)
+    key = None
+    if result_cache is not None:
+        key = result_cache.make_key(kind='backtest', dataset=get_array_checksum(candles),
+                                    params=get_resolved_params(params or {}))
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached['trades'], cached['metrics']
+    signal_params, dca_params = split_params(params or {})
+    open_time, _open, high, low, close, volume, quote_asset_volume = candles
+    signal_bot = BatchSignalBot(open_time, _open, high, low, close, volume, quote_asset_volume, **signal_params)
+    dca_bot = BatchDcaBot(_open, high, low, close, open_time, **dca_params)
+    trades = dca_bot.run(signal_bot.find_divergence_indexes())
+    metrics = dca_bot.get_metrics(trades)
+    if result_cache is not None:
+        result_cache.put(key, {'trades': trades, 'metrics': metrics})
+    return trades, metrics
+
+
+def run_parameter_sweep(df: pd.DataFrame, grid: Dict[str, list], processes: int = None,
+                        result_cache: ResultCache = None) -> pd.DataFrame:
+    """
+    Backtest every combination of the grid across a process pool, settings found in result_cache are not run again
+    :returns: one row per setting with the pnl, win rate and drawdown, best pnl first
+    """
+    candles = get_candle_array(df)
+    configs = group_by_signal_params(grid)
+    results = []
+    if result_cache is not None:
+        dataset = get_array_checksum(candles)
+        get_key = lambda params: result_cache.make_key(kind='sweep', dataset=dataset,
+                                                       params=get_resolved_params(params))
+        for signal_params_items, dca_params_list in configs.items():
+            uncached = []
+            for dca_params in dca_params_list:
+                cached = result_cache.get(get_key({**dict(signal_params_items), **dca_params}))
+                if cached is None:
+                    uncached.append(dca_params)
+                else:
+                    results.append(cached)
+            configs[signal_params_items] = uncached
+        configs = {signal_params_items: item for signal_params_items, item in configs.items() if item}
+    logger.info(f"parameter sweep: {sum(len(item) for item in configs.values())} settings to run, "
+                f"{len(results)} cached, {len(configs)} signal settings, {len(df.index)} candles")
+
+    if configs:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = save_candles(candles, os.path.join(tmp_dir, 'candles.npy'))
+            with Pool(processes=processes, initializer=init_worker, initargs=(filepath,)) as pool:
+                tasks = [(dict(signal_params), dca_params_list) for signal_params, dca_params_list in configs.items()]
+                new_results = list(itertools.chain.from_iterable(pool.starmap(run_signal_params, tasks)))
+        if result_cache is not None:
+            for row in new_results:
+                signal_params, dca_params = split_params(row)
+                result_cache.put(get_key({**signal_params, **dca_params}), row)
+        results += new_results
+    return pd.DataFrame(results).sort_values('cumulative_pnl', ascending=False, ignore_index=True)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    start_time = time.time()
+    chart_df = CandleStore(SYMBOL, INTERVAL).load_dataframe(datetime(2021, 5, 1, 0, 00), datetime(2021, 9, 30, 23, 0))
+    sweep_grid = {'ema_slow_window': [20, 50],
+                  'rsi_overbought': [70, 75],
+                  'rsi_oversold': [25, 30],
+                  'target_profit_percentage': [0.0025, 0.005],
+                  'stop_loss_percentage': [0.005, 0.01]}
+    sweep_df = run_parameter_sweep(chart_df, sweep_grid, result_cache=ResultCache())
+    logger.info(f"parameter sweep done in {time.time() - start_time:.1f}s\n{sweep_df.to_string()}")
+    best_params = {name: sweep_df[name].iloc[0].item() for name in sweep_grid}
+    best_trades, best_metrics = run_backtest(chart_df, best_params, result_cache=ResultCache())
+    logger.info(f"best setting {best_params}: {len(best_trades)} trades")
@@ -0,0 +1,226 @@
+"""Portfolio simulator class"""
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from custom_types.trade_type import IBatchTrade, IBacktestMetrics
+from service.batch_dca_bot import BatchDcaBot, get_trade_metrics
+from settings import SYMBOL
+from utils.safety_order_utils import get_order_size, get_safety_order_prices
+
+
+class PortfolioSimulator:
+    """
+    Hold every open DcaBot position as one slot of parallel arrays and step them all per candle, for backtests with a
+    high MAX_CONCURRENT_TRADE. Same rules and parameters as BatchDcaBot, with a safety order ladder the exit of a
+    position comes from BatchDcaBot.resolve_ladder_exit and its safety orders are added as they fill.
+    """
+    overall_wallet_fund = BatchDcaBot.overall_wallet_fund
+    target_profit_percentage = BatchDcaBot.target_profit_percentage
+    stop_loss_percentage = BatchDcaBot.stop_loss_percentage
+    leverage = BatchDcaBot.leverage
+    max_concurrent_trade = BatchDcaBot.max_concurrent_trade
+    fee_rate = BatchDcaBot.fee_rate
+    max_safety_order_count = BatchDcaBot.max_safety_order_count
+    price_deviation_trigger_so = BatchDcaBot.price_deviation_trigger_so
+    base_order_size = BatchDcaBot.base_order_size
+    param_names = BatchDcaBot.param_names
+
+    def __init__(self, open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 open_time: np.ndarray = None, symbol: str = SYMBOL, **params):
+        for name, value in params.items():
+            if name not in self.param_names:
+                raise ValueError(f"Unknown PortfolioSimulator parameter {name}")
+            setattr(self, name, value)
+        self.symbol = symbol
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.open_time = np.arange(len(open), dtype=np.int64) if open_time is None \
+            else np.asarray(open_time, dtype=np.int64)
+
+        self.exit_resolver = BatchDcaBot(open, high, low, close, open_time, symbol, **params)
+
+        slot_count = self.max_concurrent_trade
+        self.active = np.zeros(slot_count, dtype=bool)
+        self.direction = np.zeros(slot_count, dtype=np.int8)
+        self.entry_price = np.zeros(slot_count)
+        self.size = np.zeros(slot_count)
+        self.cost = np.zeros(slot_count)
+        self.take_profit_price = np.zeros(slot_count)
+        self.stop_loss_price = np.zeros(slot_count)
+        self.entry_index = np.zeros(slot_count, dtype=np.int64)
+        self.signal_index = np.zeros(slot_count, dtype=np.int64)
+        self.sequence = np.zeros(slot_count, dtype=np.int64)
+        self.exit_index = np.zeros(slot_count, dtype=np.int64)
+        self.exit_price = np.zeros(slot_count)
+        self.exit_pnl = np.zeros(slot_count)
+        # Fill index, coin amount and price of the safety orders of every slot that fill before its exit
+        self.safety_orders: List[List[Tuple[int, float, float]]] = [[] for _ in range(slot_count)]
+        self.next_fill_index = np.zeros(slot_count, dtype=np.int64)
+        self.equity: Optional[np.ndarray] = None
+
+    def open_position(self, slot: int, signal: dict, entry_index: int, tradeable_amount: float, sequence: int):
+        entry_price = self.open[entry_index]
+        direction = 1 if signal['divergence'] == 'bullish' else -1
+        self.active[slot] = True
+        self.direction[slot] = direction
+        self.entry_price[slot] = entry_price
+        order_size = get_order_size(tradeable_amount, self.base_order_size, self.max_safety_order_count) \
+            if self.max_safety_order_count else tradeable_amount
+        self.size[slot] = math.floor(order_size / entry_price)
+        self.cost[slot] = self.size[slot] * entry_price
+        self.take_profit_price[slot] = entry_price * (1 + direction * self.target_profit_percentage)
+        self.stop_loss_price[slot] = entry_price * (1 - direction * self.stop_loss_percentage)
+        self.entry_index[slot] = entry_index
+        self.signal_index[slot] = signal['index']
+        self.sequence[slot] = sequence
+        if self.max_safety_order_count:
+            exit_result = self.exit_resolver.resolve_ladder_exit(entry_index, signal['divergence'], order_size)
+        else:
+            exit_result = self.exit_resolver.resolve_exit(entry_index, signal['divergence'])
+        self.exit_index[slot] = len(self.close) if exit_result is None else exit_result[0]
+        if self.max_safety_order_count and exit_result is not None:
+            self.exit_price[slot], self.exit_pnl[slot] = exit_result[1:]
+        self.next_fill_index[slot] = len(self.close)
+        if self.max_safety_order_count:
+            self.schedule_safety_orders(slot, signal['divergence'], order_size)
+
+    def schedule_safety_orders(self, slot: int, divergence: str, order_size: float):
+        """Fill candle of every safety order of the slot before its exit, the first low through it, high for a short"""
+        entry_index, exit_index = self.entry_index[slot], self.exit_index[slot]
+        order_prices = get_safety_order_prices(self.entry_price[slot], divergence, self.max_safety_order_count,
+                                               self.price_deviation_trigger_so)
+        if divergence == 'bullish':
+            fill_offsets = np.searchsorted(-np.minimum.accumulate(self.low[entry_index:exit_index]), -order_prices,
+                                           side='left')
+        else:
+            fill_offsets = np.searchsorted(np.maximum.accumulate(self.high[entry_index:exit_index]), order_prices,
+                                           side='left')
+        is_filled = fill_offsets < exit_index - entry_index
+        self.safety_orders[slot] = list(zip((entry_index + fill_offsets[is_filled]).tolist(),
+                                            np.floor(order_size / order_prices[is_filled]).tolist(),
+                                            order_prices[is_filled].tolist()))
+        if self.safety_orders[slot]:
+            self.next_fill_index[slot] = self.safety_orders[slot][0][0]
+
+    def fill_safety_orders(self, idx: int):
+        """Add the safety orders filled up to candle idx to the size and cost of their position"""
+        for slot in np.flatnonzero(self.active & (self.next_fill_index <= idx)):
+            orders = self.safety_orders[slot]
+            while orders and orders[0][0] <= idx:
+                _, coin_amount, order_price = orders.pop(0)
+                self.size[slot] += coin_amount
+                self.cost[slot] += coin_amount * order_price
+            self.next_fill_index[slot] = orders[0][0] if orders else len(self.close)
+
+    def mark_to_market(self, start: int, end: int, overall_wallet_fund: float):
+        """Equity of candles start to end - 1 while no position opens or closes, vectorized over time and slots"""
+        if start >= end:
+            return
+        exposure = np.sum(self.direction * self.size, where=self.active)
+        cost = np.sum(self.direction * self.cost, where=self.active)
+        self.equity[start:end] = overall_wallet_fund + self.leverage * (self.close[start:end] * exposure - cost)
+
+    def run(self, signals: List[dict]) -> List[IBatchTrade]:
+        """
+        Trade every signal in order, a signal is skipped while every slot is taken
+        :returns: completed trades in the order they were closed; the equity is marked to market in self.equity
+        """
+        candle_count = len(self.close)
+        overall_wallet_fund = self.overall_wallet_fund
+        tradeable_amount = overall_wallet_fund / self.max_concurrent_trade
+        self.equity = np.full(candle_count, np.nan)
+        trades: List[IBatchTrade] = []
+        signal_position = 0
+        sequence = 0
+        pending: List[dict] = []
+
+        idx = 0
+        while idx < candle_count:
+            if not self.active.any() and not pending:
+                if signal_position >= len(signals):
+                    self.equity[idx:] = overall_wallet_fund
+                    break
+                # Nothing open, jump to the next signal
+                self.equity[idx:signals[signal_position]['index']] = overall_wallet_fund
+                idx = max(idx, signals[signal_position]['index'])
+
+            # Entries of the signals from the previous candle, at this candle open
+            for signal in pending:
+                slot = int(np.flatnonzero(~self.active)[0])
+                self.open_position(slot, signal, idx, tradeable_amount, sequence)
+                sequence += 1
+            pending = []
+
+            if self.max_safety_order_count:
+                # Exits resolved with the ladder on entry
+                exit_hit = self.active & (self.exit_index == idx)
+                exit_prices = self.exit_price
+            else:
+                # Take profit on open/high/low, then stop loss on close for every open position at once
+                is_long = self.direction == 1
+                take_profit_hit = self.active & np.where(is_long, self.high[idx] >= self.take_profit_price,
+                                                         self.low[idx] <= self.take_profit_price)
+                stop_loss_hit = self.active & ~take_profit_hit & \
+                    np.where(is_long, self.close[idx] <= self.stop_loss_price, self.close[idx] >= self.stop_loss_price)
+                exit_hit = take_profit_hit | stop_loss_hit
+                exit_prices = np.where(take_profit_hit, self.take_profit_price, self.close[idx])
+            if exit_hit.any():
+                # Booked in entry order like DcaBot, the fee depends on the fund after the trades before
+                slots = np.flatnonzero(exit_hit)
+                for slot in slots[np.argsort(self.sequence[slots])]:
+                    exit_price = float(exit_prices[slot])
+                    if self.max_safety_order_count:
+                        pnl = self.exit_pnl[slot]
+                    else:
+                        pnl = self.direction[slot] * self.size[slot] * (exit_price - self.entry_price[slot])
+                    pnl = self.leverage * pnl - overall_wallet_fund * self.fee_rate
+                    overall_wallet_fund += pnl
+                    trades.append({'symbol': self.symbol, 'signal_index': int(self.signal_index[slot]),
+                                   'entry_index': int(self.entry_index[slot]), 'exit_index': int(idx),
+                                   'entry_time': int(self.open_time[self.entry_index[slot]]),
+                                   'exit_time': int(self.open_time[idx]),
+                                   'divergence': 'bullish' if self.direction[slot] == 1 else 'bearish',
+                                   'entry_price': float(self.entry_price[slot]), 'exit_price': exit_price,
+                                   'pnl': float(pnl), 'overall_fund': float(overall_wallet_fund)})
+                self.active[slots] = False
+
+            self.fill_safety_orders(idx)
+            self.mark_to_market(idx, idx + 1, overall_wallet_fund)
+
+            # New signals of this candle take the free slots, entered on the next candle
+            while signal_position < len(signals) and signals[signal_position]['index'] <= idx:
+                signal = signals[signal_position]
+                signal_position += 1
+                if signal['index'] < idx or idx + 1 >= candle_count:
+                    continue
+                active_count = int(self.active.sum()) + len(pending)
+                if active_count >= self.max_concurrent_trade:
+                    continue
+                if active_count == 0:
+                    tradeable_amount = overall_wallet_fund / self.max_concurrent_trade
+                pending.append(signal)
+
+            # Skip to the next candle where a position opens, fills a safety order or closes or a signal comes in
+            next_idx = idx + 1
+            if not pending:
+                next_idx = min(self.exit_index.min(initial=candle_count, where=self.active),
+                               self.next_fill_index.min(initial=candle_count, where=self.active),
+                               signals[signal_position]['index'] if signal_position < len(signals) else candle_count)
+                next_idx = max(next_idx, idx + 1)
+            self.mark_to_market(idx + 1, next_idx, overall_wallet_fund)
+            idx = next_idx
+        return trades
+
+    def get_metrics(self, trades: List[IBatchTrade]) -> IBacktestMetrics:
+        """Trade metrics, with the max drawdown taken from the marked to market equity"""
+        metrics = get_trade_metrics(trades, self.overall_wallet_fund, int(self.open_time[0]),
+                                    int(self.open_time[-1]))
+        if self.equity is not None and len(self.equity):
+            equity = np.concatenate(([self.overall_wallet_fund], self.equity))
+            peak = np.maximum.accumulate(equity)
+            metrics['max_drawdown_pct'] = float(((peak - equity) / peak).max() * 100)
+        return metrics
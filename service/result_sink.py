@@ -0,0 +1,71 @@
+"""Backtest result sinks, completed trades are buffered and written once"""
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from custom_types.trade_type import IBacktestMetrics
+from utils.general_utils import init_backtest_file, write_rows_to_csv
+from utils.metrics_utils import get_performance_metrics
+
+
+def to_epoch_ms(values: list) -> np.ndarray:
+    """Naive datetimes are read as UTC, like the candle open times"""
+    return np.array([pd.Timestamp(value).value // 10 ** 6 for value in values], dtype=np.int64)
+
+
+class ResultSink:
+    """Keep the completed trades in memory, rows use the BACKTEST_RESULT_COLUMNS of general_utils"""
+
+    def __init__(self):
+        self.rows: List[dict] = []
+
+    def add(self, row: dict):
+        self.rows.append(row)
+
+    def flush(self):
+        pass
+
+    def get_state(self) -> dict:
+        return {'rows': list(self.rows)}
+
+    def set_state(self, state: dict):
+        """Restored rows are written again on the next flush"""
+        self.rows = list(state['rows'])
+
+    def get_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.rows)
+
+    def get_metrics(self, starting_fund: float) -> IBacktestMetrics:
+        return get_performance_metrics(np.array([float(row['pnl']) for row in self.rows], dtype=np.float64),
+                                       to_epoch_ms([row['start_time'] for row in self.rows]),
+                                       to_epoch_ms([row['end_time'] for row in self.rows]),
+                                       starting_fund)
+
+
+class CsvResultSink(ResultSink):
+    """Write assets/backtest_result.csv once per flush, or every chunk_size trades for very long runs"""
+
+    def __init__(self, chunk_size: Optional[int] = None):
+        super().__init__()
+        self.chunk_size = chunk_size
+        self.flushed_count = 0
+        self.is_file_initialized = False
+
+    def add(self, row: dict):
+        super().add(row)
+        if self.chunk_size is not None and len(self.rows) - self.flushed_count >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.is_file_initialized:
+            init_backtest_file()
+            self.is_file_initialized = True
+        if self.flushed_count < len(self.rows):
+            write_rows_to_csv(self.rows[self.flushed_count:])
+            self.flushed_count = len(self.rows)
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self.flushed_count = 0
+        self.is_file_initialized = False
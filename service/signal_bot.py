@@ -2,16 +2,17 @@
 import asyncio
 from datetime import datetime, timedelta
 from operator import itemgetter
-from typing import Literal, Optional, List, Any, Union
+from collections import deque
+from typing import Literal, Optional, List, Any, Union, Deque
 
 import pandas as pd
 import pytz
 from scipy.signal import find_peaks
-from ta.momentum import RSIIndicator
-from ta.trend import EMAIndicator
 
+from classes.candle_ring_buffer import CandleRingBuffer
 from classes.ohlc import Ohlc
 from classes.singleton import Singleton
+from classes.streaming_indicator import StreamingRsi, StreamingEma
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import ICandlestick, ICandlestickEvent
 from service.exchange import exchange
@@ -21,7 +22,7 @@ from settings import MODE, INTERVAL
 from utils.chart_utils import CANDLESTICK_INTERVAL_MAP
 from utils.events import ee, ESignal, TelegramEventType, Trade, EExchange
 from utils.candlestick_utils import time_now_in_ms
-from utils.indicator_utils import get_bollinger_band, get_avg_true_range, get_vwap, get_latest_rsi, get_latest_ema
+from utils.indicator_utils import get_bollinger_band, get_avg_true_range, get_vwap
 
 ZigzagIndicator = Optional[Literal['peak', 'trough']]
 Divergence = Optional[Literal['bullish', 'bearish']]
@@ -32,7 +33,8 @@ BUFFER_TIMEOUT_IN_SEC = 1
 
 class SignalBot(metaclass=Singleton):
     """Read chart data and indicate trade signals"""
-    candlestick_list: List[Ohlc] = []
+    candlestick_list: Deque[Ohlc]  # Latest complete candles
+    candles: CandleRingBuffer
     candlestick_htf_list: List[Ohlc] = []  # Higher time frame candles
     last_peak: Ohlc = None
     last_trough: Ohlc = None
@@ -49,6 +51,11 @@ class SignalBot(metaclass=Singleton):
 
     def __init__(self, origin):
         logger.info(f'START SIGNAL_BOT5 from {origin} interval: {INTERVAL}')
+        self.candlestick_list = deque(maxlen=2)
+        self.candles = CandleRingBuffer(capacity=700)
+        self.rsi_indicator = StreamingRsi(window=14)
+        self.ema_fast_indicator = StreamingEma(window=10)
+        self.ema_slow_indicator = StreamingEma(window=20)
         ee.on(TelegramEventType.STATS, self.stats_requested)
         ee.on(EExchange.CANDLESTICK_EVENT, self.on_candlestick_event)
         self.run()
@@ -66,7 +73,6 @@ class SignalBot(metaclass=Singleton):
         if self.last_start_date != start_time and self.last_candlestick is not None:
             # logger.info(f"{self.last_start_date:%Y-%m-%d %H:%M:%S}: {self.last_candlestick['close']}")
             ohlc = Ohlc(unix=self.last_candlestick['startTime'],
-                        date=datetime.fromtimestamp(self.last_candlestick['startTime'] / 1000, tz=pytz.UTC),
                         open=float(self.last_candlestick['open']),
                         high=float(self.last_candlestick['high']),
                         low=float(self.last_candlestick['low']),
@@ -90,24 +96,23 @@ class SignalBot(metaclass=Singleton):
         """Process trade data by bigger row"""
         if ohlc is None:
             ohlc = Ohlc(unix=candle['openTime'],
-                        date=datetime.fromtimestamp(candle['openTime'] / 1000, tz=pytz.UTC),
                         open=float(candle['open']), high=float(candle['high']), low=float(candle['low']),
                         close=float(candle['close']),
                         volume_usdt=float(candle['volume']),
                         quoteAssetVolume=float(candle['quoteAssetVolume']))
 
+        ohlc.rsi = self.rsi_indicator.update(ohlc.close)
+        ohlc.ema_fast = self.ema_fast_indicator.update(ohlc.close)
+        ohlc.ema_slow = self.ema_slow_indicator.update(ohlc.close)
         self.candlestick_list.append(ohlc)
-        self.candlestick_list = self.candlestick_list[-700:]
+        self.candles.append_ohlc(ohlc)
         data_len = 350
         window = 14
         result = None
-        if len(self.candlestick_list) < window:
+        if len(self.candles) < window:
             return result
 
         prev_ohlc: Ohlc = self.candlestick_list[-2]
-        ohlc.rsi = get_latest_rsi(self.candlestick_list, data_len, window=14)
-        ohlc.ema_fast = get_latest_ema(self.candlestick_list, data_len, window=10)
-        ohlc.ema_slow = get_latest_ema(self.candlestick_list, data_len, window=20)
         ee.emit(Trade.COMPLETE_CANDLESTICK_EVENT, ohlc)
 
         if MODE == EMode.PRODUCTION:
@@ -116,8 +121,7 @@ class SignalBot(metaclass=Singleton):
         # logger.info(f"{ohlc.date:%Y-%m-%d %H:%M:%S} candlestick: {ohlc.close} RSI: {ohlc.rsi:.4f} "
         #             f"EMA 60: {ohlc.ema:.5f} ema9 {ohlc.ema9:.5f}")
 
-        self.candlestick_list[-1] = ohlc
-        if len(self.candlestick_list) < data_len:
+        if len(self.candles) < data_len:
             return result
 
         self.check_rsi_oversold_overbought(ohlc)
@@ -168,6 +172,15 @@ class SignalBot(metaclass=Singleton):
         self.divergence = None
         self.point0_price = 0
 
+    def seed_indicators(self, chart_data: List[Ohlc]):
+        """Warm up the streaming indicators with prefetched candles"""
+        for ohlc in chart_data:
+            ohlc.rsi = self.rsi_indicator.update(ohlc.close)
+            ohlc.ema_fast = self.ema_fast_indicator.update(ohlc.close)
+            ohlc.ema_slow = self.ema_slow_indicator.update(ohlc.close)
+            self.candlestick_list.append(ohlc)
+            self.candles.append_ohlc(ohlc)
+
     def stream_candles(self, timestamp, timeout_in_sec=0):
         retry_limit = 3
         while True:
@@ -179,15 +192,14 @@ class SignalBot(metaclass=Singleton):
             asyncio.sleep(5)
 
         chart_data: List[Ohlc] = []
-        if len(self.candlestick_list) <= 0:
+        if len(self.candles) <= 0:
             for candle in candlesticks[:-2]:
                 ohlc = Ohlc(unix=candle['openTime'],
-                            date=datetime.fromtimestamp(candle['openTime'] / 1000, tz=pytz.UTC),
                             open=float(candle['open']), high=float(candle['high']), low=float(candle['low']),
                             close=float(candle['close']))
                 chart_data.append(ohlc)
-            self.candlestick_list = chart_data
-            logger.info(f"chart data length: {len(self.candlestick_list)}")
+            self.seed_indicators(chart_data)
+            logger.info(f"chart data length: {len(self.candles)}")
 
         latest_incomplete_close_time_in_ms = candlesticks[-1]['closeTime']
         latest_complete_close_time_in_ms = candlesticks[-2]['closeTime']
@@ -2,23 +2,26 @@
 import asyncio
 from datetime import datetime, timedelta
 from time import sleep
-from typing import Literal, Optional, List, Any, Union
+from collections import deque
+from typing import Literal, Optional, List, Any, Union, Deque
 
-import pandas as pd
+import numpy as np
 import pytz
 from scipy.signal import find_peaks
-from ta.momentum import RSIIndicator
-from ta.trend import EMAIndicator
 
+from classes.candle_ring_buffer import CandleRingBuffer
 from classes.ohlc import Ohlc
 from classes.singleton import Singleton
+from classes.streaming_indicator import StreamingRsi, StreamingEma
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import ICandlestick, ICandlestickEvent
 from service.exchange import exchange
 from service.logging import setup_logging, signal_bot_logger as logger
 from service.telegram_bot import telegram_bot
-from settings import MODE, INTERVAL
+from settings import MODE, INTERVAL, RSI_WINDOW, EMA_FAST_WINDOW, EMA_SLOW_WINDOW, RSI_OVERBOUGHT, RSI_OVERSOLD, \
+    PEAK_EXPIRY_MINUTES
 from utils.candlestick_utils import interval_in_ms, get_latest_complete_candlestick_start_time, time_now_in_ms
+from utils.decision_trace import DecisionTrace
 from utils.events import ee, ESignal, TelegramEventType, Trade, EExchange
 
 ZigzagIndicator = Optional[Literal['peak', 'trough']]
@@ -32,7 +35,8 @@ IGNORE_SIGNAL_PERCENTAGE = 50
 
 class SignalBot(metaclass=Singleton):
     """Read chart data and indicate trade signals"""
-    candlestick_list: List[Ohlc] = []
+    candlestick_list: Deque[Ohlc]  # Latest complete candles
+    candles: CandleRingBuffer
 
     last_peak: Ohlc = None
     last_trough: Ohlc = None
@@ -48,8 +52,22 @@ class SignalBot(metaclass=Singleton):
     last_start_date = None
     last_candlestick = None
 
+    # Optional per candle record of the decisions below, see set_decision_trace
+    decision_trace: Optional[DecisionTrace] = None
+    safety_outcome: Optional[str] = None
+
+    # Everything a backtest checkpoint needs to continue from the latest candle
+    state_attributes = ('candlestick_list', 'candles', 'rsi_indicator', 'ema_fast_indicator', 'ema_slow_indicator',
+                        'last_peak', 'last_trough', 'is_safe_last_peak', 'is_safe_last_trough', 'divergence',
+                        'point0_price', 'hit_opposite_rsi', 'divergence_counter')
+
     def __init__(self, origin):
         logger.info(f'START SIGNAL_BOT5 from {origin} interval: {INTERVAL}')
+        self.candlestick_list = deque(maxlen=2)
+        self.candles = CandleRingBuffer(capacity=700)
+        self.rsi_indicator = StreamingRsi(window=RSI_WINDOW)
+        self.ema_fast_indicator = StreamingEma(window=EMA_FAST_WINDOW)
+        self.ema_slow_indicator = StreamingEma(window=EMA_SLOW_WINDOW)
         ee.on(TelegramEventType.STATS, self.stats_requested)
         if MODE == EMode.PRODUCTION:
             self.prefetch_candlesticks()
@@ -71,15 +89,14 @@ class SignalBot(metaclass=Singleton):
             sleep(5)
 
         chart_data: List[Ohlc] = []
-        if len(self.candlestick_list) <= 0:
+        if len(self.candles) <= 0:
             for candle in candlesticks[:-2]:
                 ohlc = Ohlc(unix=candle['openTime'],
-                            date=datetime.fromtimestamp(candle['openTime'] / 1000, tz=pytz.UTC),
                             open=float(candle['open']), high=float(candle['high']), low=float(candle['low']),
                             close=float(candle['close']))
                 chart_data.append(ohlc)
-            self.candlestick_list = chart_data
-            logger.info(f"chart data length: {len(self.candlestick_list)}")
+            self.seed_indicators(chart_data)
+            logger.info(f"chart data length: {len(self.candles)}")
 
         latest_incomplete_close_time_in_ms = candlesticks[-1]['closeTime']
         latest_complete_close_time_in_ms = candlesticks[-2]['closeTime']
@@ -103,7 +120,6 @@ class SignalBot(metaclass=Singleton):
 
         if self.last_start_date != start_time and self.last_candlestick is not None:
             ohlc = Ohlc(unix=self.last_candlestick['startTime'],
-                        date=datetime.fromtimestamp(self.last_candlestick['startTime'] / 1000, tz=pytz.UTC),
                         open=float(self.last_candlestick['open']),
                         high=float(self.last_candlestick['high']),
                         low=float(self.last_candlestick['low']),
@@ -118,32 +134,35 @@ class SignalBot(metaclass=Singleton):
     def candle_incoming(self, candle: Optional[ICandlestick], ohlc: Ohlc = None):
         """Process trade data by bigger row"""
         if ohlc is None:
-            ohlc = Ohlc(unix=candle['openTime'], date=datetime.fromtimestamp(candle['openTime'] / 1000, tz=pytz.UTC),
+            ohlc = Ohlc(unix=candle['openTime'],
                         open=float(candle['open']), high=float(candle['high']), low=float(candle['low']),
                         close=float(candle['close']), volume_usdt=float(candle['volume']),
                         quoteAssetVolume=float(candle['quoteAssetVolume']))
+        ohlc.rsi = self.rsi_indicator.update(ohlc.close)
+        ohlc.ema_fast = self.ema_fast_indicator.update(ohlc.close)
+        ohlc.ema_slow = self.ema_slow_indicator.update(ohlc.close)
         self.candlestick_list.append(ohlc)
-        self.candlestick_list = self.candlestick_list[-700:]
+        self.candles.append_ohlc(ohlc)
         data_len = 350
         window = 14
         result = None
-        if len(self.candlestick_list) >= window:
+        zigzag_indicator, valid_rsi_target = None, False
+        divergence, point0_price = self.divergence, self.point0_price
+        self.safety_outcome = None
+        if len(self.candles) >= window:
             prev_ohlc: Ohlc = self.candlestick_list[-2]
-            ohlc.rsi = SignalBot.get_latest_rsi(self.candlestick_list, data_len, window=14)
-            ohlc.ema_fast = self.get_latest_ema(self.candlestick_list, data_len, window=10)
-            ohlc.ema_slow = self.get_latest_ema(self.candlestick_list, data_len, window=50)
             ee.emit(Trade.COMPLETE_CANDLESTICK_EVENT, ohlc)
 
             if MODE == EMode.PRODUCTION:
                 logger.info(f"{ohlc.date:%Y-%m-%d %H:%M:%S} candlestick: {ohlc.close:.04f} RSI: {ohlc.rsi:.04f} "
                             f"EMA: {ohlc.ema_slow:.05f}")
-            self.candlestick_list[-1] = ohlc
-            if len(self.candlestick_list) >= data_len:
-                zigzag_indicator = SignalBot.check_zigzag_pattern(self.candlestick_list[-3:])
+            if len(self.candles) >= data_len:
+                zigzag_indicator = SignalBot.check_zigzag_pattern(self.candles.window('rsi', 3))
                 valid_rsi_target = SignalBot.check_rsi_target(zigzag_indicator, prev_ohlc)
                 self.invalidate_expired_peaktrough(prev_ohlc)
                 self.check_divergence(zigzag_indicator, prev_ohlc, self.last_peak, self.last_trough, valid_rsi_target)
                 self.adjust_p0(ohlc)
+                divergence, point0_price = self.divergence, self.point0_price
                 result = self.safety_check(ohlc)
                 # After ending only save the current peak/trough and last peak/trough
                 if valid_rsi_target:
@@ -151,31 +170,40 @@ class SignalBot(metaclass=Singleton):
                         self.last_peak = prev_ohlc
                     elif zigzag_indicator == 'trough':
                         self.last_trough = prev_ohlc
+        if self.decision_trace is not None:
+            self.decision_trace.record(ohlc.unix, ohlc.close, ohlc.rsi, ohlc.ema_fast, ohlc.ema_slow, zigzag_indicator,
+                                       valid_rsi_target, divergence, point0_price, self.safety_outcome)
         return result
 
-    @classmethod
-    def get_latest_rsi(cls, data: List[Ohlc], data_len, window) -> int:
-        """Calculate RSI from a pandas Series and return the latest RSI"""
-        close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
-        rsi_list = RSIIndicator(close=close_price_list, window=window).rsi()
-        return rsi_list.iloc[-1]
-
-    def get_latest_ema(self, data: List[Ohlc], data_len, window=50):
-        """Calculate DEMA from a pandas Series and return the latest EMA"""
-        close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
-        ema_list = EMAIndicator(close=close_price_list, window=window).ema_indicator()
-        return ema_list.iloc[-1]
+    def set_decision_trace(self, decision_trace: Optional[DecisionTrace]):
+        self.decision_trace = decision_trace
+
+    def seed_indicators(self, chart_data: List[Ohlc]):
+        """Warm up the streaming indicators with prefetched candles"""
+        for ohlc in chart_data:
+            ohlc.rsi = self.rsi_indicator.update(ohlc.close)
+            ohlc.ema_fast = self.ema_fast_indicator.update(ohlc.close)
+            ohlc.ema_slow = self.ema_slow_indicator.update(ohlc.close)
+            self.candlestick_list.append(ohlc)
+            self.candles.append_ohlc(ohlc)
+
+    def get_state(self) -> dict:
+        return {name: getattr(self, name) for name in self.state_attributes}
+
+    def set_state(self, state: dict):
+        for name in self.state_attributes:
+            setattr(self, name, state[name])
 
     @classmethod
-    def check_zigzag_pattern(cls, data: List[Ohlc]) -> ZigzagIndicator:
-        """Find peak/trough from a chart data"""
-        assert len(data) >= 3
+    def check_zigzag_pattern(cls, rsi_values: np.ndarray) -> ZigzagIndicator:
+        """Find peak/trough from the RSI of the latest candles"""
+        assert len(rsi_values) >= 3
 
         # Check if peak/trough with last 3 item
-        peaks, _ = find_peaks([obj.rsi for obj in data[-3:]])
+        peaks, _ = find_peaks(rsi_values[-3:])
         if len(peaks) > 0:
             return 'peak'
-        troughs, _ = find_peaks(-pd.Series([obj.rsi for obj in data[-3:]]))
+        troughs, _ = find_peaks(-rsi_values[-3:])
         if len(troughs) > 0:
             return 'trough'
         return None
@@ -184,18 +212,19 @@ class SignalBot(metaclass=Singleton):
     def check_rsi_target(cls, zigzag_indicator: ZigzagIndicator, prev_ohlc: Ohlc):
         """Check if RSI target has been hit"""
         valid_rsi_target = False
-        if zigzag_indicator == 'peak' and prev_ohlc.rsi >= 70:
+        if zigzag_indicator == 'peak' and prev_ohlc.rsi >= RSI_OVERBOUGHT:
             valid_rsi_target = True
-        if zigzag_indicator == 'trough' and prev_ohlc.rsi <= 30:
+        if zigzag_indicator == 'trough' and prev_ohlc.rsi <= RSI_OVERSOLD:
             valid_rsi_target = True
         return valid_rsi_target
 
     def invalidate_expired_peaktrough(self, prev_ohlc: Ohlc):
         """ Invalidate peak and trough after last peak trough is more than 1 hours """
-        if self.last_peak is not None and prev_ohlc.date - timedelta(minutes=12) > self.last_peak.date:
+        expiry_date = prev_ohlc.date - timedelta(minutes=PEAK_EXPIRY_MINUTES)
+        if self.last_peak is not None and expiry_date > self.last_peak.date:
             self.last_peak = None
             self.is_safe_last_peak = False
-        if self.last_trough is not None and prev_ohlc.date - timedelta(minutes=12) > self.last_trough.date:
+        if self.last_trough is not None and expiry_date > self.last_trough.date:
             self.last_trough = None
             self.is_safe_last_trough = False
 
@@ -231,16 +260,16 @@ class SignalBot(metaclass=Singleton):
             telegram_bot.send_message(message=msg)
 
     def check_is_safe_divergence(self, ohlc: Ohlc):
-        if self.last_peak is not None and ohlc.rsi < 70:
+        if self.last_peak is not None and ohlc.rsi < RSI_OVERBOUGHT:
             self.is_safe_last_peak = True
-        if self.last_trough is not None and ohlc.rsi > 30:
+        if self.last_trough is not None and ohlc.rsi > RSI_OVERSOLD:
             self.is_safe_last_trough = True
 
     def check_is_hit_opposite_rsi(self, ohlc: Ohlc):
-        if self.divergence == "bearish" and ohlc.rsi < 30:
+        if self.divergence == "bearish" and ohlc.rsi < RSI_OVERSOLD:
             logger.info("hit opposite, cancel divergence")
             self.reset_all()
-        elif self.divergence == "bullish" and ohlc.rsi > 70:
+        elif self.divergence == "bullish" and ohlc.rsi > RSI_OVERBOUGHT:
             logger.info("hit opposite, cancel divergence")
             self.reset_all()
 
@@ -251,23 +280,27 @@ class SignalBot(metaclass=Singleton):
         if self.divergence == "bearish" and ohlc.ema_fast < ohlc.ema_slow:
             if ohlc.close > ohlc.open:
                 logger.info("CANDLE IS GREEN, CANCEL SIGNAL")
+                self.safety_outcome = 'cancel_green'
                 self.reset_all()
                 return
             if MODE == EMode.PRODUCTION:
                 ee.emit(ESignal.DIVERGENCE_FOUND, divergence_result)
             logger.info(
                 f"{ohlc.date:%Y-%m-%d %H:%M:%S} Price crossed EMA, close: {ohlc.close:.4f} < ema21 {ohlc.ema_slow:.4f}")
+            self.safety_outcome = 'signal'
             self.reset_all()
             return divergence_result
         elif self.divergence == "bullish" and ohlc.ema_fast > ohlc.ema_slow:
             if ohlc.open > ohlc.close:
                 logger.info("CANDLE IS RED, CANCEL SIGNAL")
+                self.safety_outcome = 'cancel_red'
                 self.reset_all()
                 return
             if MODE == EMode.PRODUCTION:
                 ee.emit(ESignal.DIVERGENCE_FOUND, divergence_result)
             logger.info(
                 f"{ohlc.date:%Y-%m-%d %H:%M:%S} Price crossed EMA, close: {ohlc.close:.4f} > ema21 {ohlc.ema_slow:.4f}")
+            self.safety_outcome = 'signal'
             self.reset_all()
             return divergence_result
 
@@ -2,16 +2,17 @@
 import asyncio
 from datetime import datetime, timedelta
 from operator import itemgetter
-from typing import Literal, Optional, List, Any, Union
+from collections import deque
+from typing import Literal, Optional, List, Any, Union, Deque
 
-import pandas as pd
+import numpy as np
 import pytz
 from scipy.signal import find_peaks
-from ta.momentum import RSIIndicator
-from ta.trend import EMAIndicator
 
+from classes.candle_ring_buffer import CandleRingBuffer
 from classes.ohlc import Ohlc
 from classes.singleton import Singleton
+from classes.streaming_indicator import StreamingRsi, StreamingEma
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import ICandlestick, ICandlestickEvent
 from service.exchange import exchange
@@ -34,8 +35,9 @@ IGNORE_SIGNAL_PERCENTAGE = 50
 
 class SignalBot(metaclass=Singleton):
     """Read chart data and indicate trade signals"""
-    candlestick_list: List[Ohlc] = []
-    candlestick_htf_list: List[Ohlc] = []  # Higher time frame candles
+    candlestick_list: Deque[Ohlc]  # Latest complete candles
+    candles: CandleRingBuffer
+    htf_candles: CandleRingBuffer  # Higher time frame candles
     last_peak: Ohlc = None
     last_trough: Ohlc = None
     divergence: Divergence = None
@@ -51,6 +53,13 @@ class SignalBot(metaclass=Singleton):
 
     def __init__(self, origin):
         logger.info(f'START SIGNAL_BOT5 from {origin} interval: {INTERVAL}')
+        self.candlestick_list = deque(maxlen=2)
+        self.candles = CandleRingBuffer(capacity=700)
+        self.htf_candles = CandleRingBuffer(capacity=250)
+        self.rsi_indicator = StreamingRsi(window=14)
+        self.ema_fast_indicator = StreamingEma(window=10)
+        self.ema_slow_indicator = StreamingEma(window=20)
+        self.htf_ema_slow_indicator = StreamingEma(window=30)
         ee.on(TelegramEventType.STATS, self.stats_requested)
         if MODE == EMode.PRODUCTION:
             self.prefetch_candlesticks()
@@ -76,7 +85,6 @@ class SignalBot(metaclass=Singleton):
         if self.last_start_date != start_time and self.last_candlestick is not None:
             # logger.info(f"{self.last_start_date:%Y-%m-%d %H:%M:%S}: {self.last_candlestick['close']}")
             ohlc = Ohlc(unix=self.last_candlestick['startTime'],
-                        date=datetime.fromtimestamp(self.last_candlestick['startTime'] / 1000, tz=pytz.UTC),
                         open=float(self.last_candlestick['open']),
                         high=float(self.last_candlestick['high']),
                         low=float(self.last_candlestick['low']),
@@ -91,25 +99,25 @@ class SignalBot(metaclass=Singleton):
     def candle_incoming(self, candle: Optional[ICandlestick], ohlc: Ohlc = None):
         """Process trade data by bigger row"""
         if ohlc is None:
-            ohlc = Ohlc(unix=candle['openTime'], date=datetime.fromtimestamp(candle['openTime'] / 1000, tz=pytz.UTC),
+            ohlc = Ohlc(unix=candle['openTime'],
                         open=float(candle['open']), high=float(candle['high']), low=float(candle['low']),
                         close=float(candle['close']), volume_usdt=float(candle['volume']),
                         quoteAssetVolume=float(candle['quoteAssetVolume']))
 
+        ohlc.rsi = self.rsi_indicator.update(ohlc.close)
+        ohlc.ema_fast = self.ema_fast_indicator.update(ohlc.close)
+        ohlc.ema_slow = self.ema_slow_indicator.update(ohlc.close)
         self.candlestick_list.append(ohlc)
-        self.candlestick_list = self.candlestick_list[-700:]
+        self.candles.append_ohlc(ohlc)
         data_len = 350
         window = 14
         result = None
-        if len(self.candlestick_list) >= window:
+        if len(self.candles) >= window:
             prev_ohlc: Ohlc = self.candlestick_list[-2]
-            ohlc.rsi = SignalBot.get_latest_rsi(self.candlestick_list, data_len, window=14)
-            ohlc.ema_fast = self.get_latest_ema(self.candlestick_list, data_len, window=10)
-            ohlc.ema_slow = self.get_latest_ema(self.candlestick_list, data_len, window=20)
-            # bb_result = get_bollinger_band(self.candlestick_list, data_len=28)
+            # bb_result = get_bollinger_band(self.candles, data_len=28)
             # ohlc.mavg, ohlc.hband, ohlc.lband = itemgetter('mavg', 'hband', 'lband')(bb_result)
-            # ohlc.atr = get_avg_true_range(self.candlestick_list, data_len=42)
-            # ohlc.vwap = get_vwap(self.candlestick_list, data_len=14, window=14)
+            # ohlc.atr = get_avg_true_range(self.candles, data_len=42)
+            # ohlc.vwap = get_vwap(self.candles, data_len=14, window=14)
             ee.emit(Trade.COMPLETE_CANDLESTICK_EVENT, ohlc)
 
             if MODE == EMode.PRODUCTION:
@@ -119,9 +127,8 @@ class SignalBot(metaclass=Singleton):
             # logger.info(f"{ohlc.date:%Y-%m-%d %H:%M:%S} candlestick: {ohlc.close} RSI: {ohlc.rsi:.4f} "
             #             f"EMA 60: {ohlc.ema:.5f} ema9 {ohlc.ema9:.5f}")
 
-            self.candlestick_list[-1] = ohlc
-            if len(self.candlestick_list) >= data_len:
-                zigzag_indicator = SignalBot.check_zigzag_pattern(self.candlestick_list[-3:])
+            if len(self.candles) >= data_len:
+                zigzag_indicator = SignalBot.check_zigzag_pattern(self.candles.window('rsi', 3))
                 valid_rsi_target = SignalBot.check_rsi_target(zigzag_indicator, prev_ohlc)
                 self.invalidate_expired_peaktrough(prev_ohlc)
                 self.check_divergence(zigzag_indicator, prev_ohlc, self.last_peak, self.last_trough, valid_rsi_target)
@@ -138,52 +145,43 @@ class SignalBot(metaclass=Singleton):
     def higher_tf_candle_incoming(self, candle: ICandlestick):
         """Process candlestick by higher time frame"""
         ohlc = Ohlc(unix=candle['openTime'],
-                    date=datetime.fromtimestamp(candle['openTime'] / 1000, tz=pytz.UTC),
                     open=float(candle['open']),
                     high=float(candle['high']),
                     low=float(candle['low']),
                     close=float(candle['close']))
-        self.candlestick_htf_list.append(ohlc)
-        self.candlestick_htf_list = self.candlestick_htf_list[-250:]
+        ohlc.ema_slow = self.htf_ema_slow_indicator.update(ohlc.close)
+        self.htf_candles.append_ohlc(ohlc)
         data_len = 250
         window = 14
         result = None
-        if len(self.candlestick_htf_list) >= window:
-            # ohlc.rsi = SignalBot.get_latest_rsi(self.candlestick_htf_list, data_len, window=21)
-            # ohlc.ema20 = self.get_latest_ema(self.candlestick_htf_list, data_len, window=20)
-            ohlc.ema_slow = self.get_latest_ema(self.candlestick_htf_list, data_len, window=30)
-            # bb_result = get_bollinger_band(self.candlestick_htf_list, data_len=28)
+        if len(self.htf_candles) >= window:
+            # bb_result = get_bollinger_band(self.htf_candles, data_len=28)
             # ohlc.mavg, ohlc.hband, ohlc.lband = itemgetter('mavg', 'hband', 'lband')(bb_result)
-            # ohlc.atr = get_avg_true_range(self.candlestick_htf_list, data_len=42)
+            # ohlc.atr = get_avg_true_range(self.htf_candles, data_len=42)
 
-            self.candlestick_htf_list[-1] = ohlc
             if MODE == EMode.PRODUCTION:
                 logger.info(f"{ohlc.date:%Y-%m-%d %H:%M:%S} candlestick htf: {ohlc.close} EMA: {ohlc.ema_slow:.4f}")
             # logger.info(f"{ohlc.date:%Y-%m-%d %H:%M:%S} candlestick htf: {ohlc.close} EMA: {ohlc.ema:.4f}")
 
-    @classmethod
-    def get_latest_rsi(cls, data: List[Ohlc], data_len, window) -> int:
-        """Calculate RSI from a pandas Series and return the latest RSI"""
-        close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
-        rsi_list = RSIIndicator(close=close_price_list, window=window).rsi()
-        return rsi_list.iloc[-1]
-
-    def get_latest_ema(self, data: List[Ohlc], data_len, window=50):
-        """Calculate DEMA from a pandas Series and return the latest EMA"""
-        close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
-        ema_list = EMAIndicator(close=close_price_list, window=window).ema_indicator()
-        return ema_list.iloc[-1]
+    def seed_indicators(self, chart_data: List[Ohlc]):
+        """Warm up the streaming indicators with prefetched candles"""
+        for ohlc in chart_data:
+            ohlc.rsi = self.rsi_indicator.update(ohlc.close)
+            ohlc.ema_fast = self.ema_fast_indicator.update(ohlc.close)
+            ohlc.ema_slow = self.ema_slow_indicator.update(ohlc.close)
+            self.candlestick_list.append(ohlc)
+            self.candles.append_ohlc(ohlc)
 
     @classmethod
-    def check_zigzag_pattern(cls, data: List[Ohlc]) -> ZigzagIndicator:
-        """Find peak/trough from a chart data"""
-        assert len(data) >= 3
+    def check_zigzag_pattern(cls, rsi_values: np.ndarray) -> ZigzagIndicator:
+        """Find peak/trough from the RSI of the latest candles"""
+        assert len(rsi_values) >= 3
 
         # Check if peak/trough with last 3 item
-        peaks, _ = find_peaks([obj.rsi for obj in data[-3:]])
+        peaks, _ = find_peaks(rsi_values[-3:])
         if len(peaks) > 0:
             return 'peak'
-        troughs, _ = find_peaks(-pd.Series([obj.rsi for obj in data[-3:]]))
+        troughs, _ = find_peaks(-rsi_values[-3:])
         if len(troughs) > 0:
             return 'trough'
         return None
@@ -275,7 +273,7 @@ class SignalBot(metaclass=Singleton):
                 logger.info("CANDLE IS GREEN, CANCEL SIGNAL")
                 self.reset_all()
                 return
-            # if self.candlestick_htf_list[-1].close > self.candlestick_htf_list[-1].ema:
+            # if self.htf_candles.latest('close') > self.htf_candles.latest('ema_slow'):
             #     logger.info("HIGHER TIME FRAME NOT VALID, CANCEL SIGNAL")
             #     self.reset_all()
             #     return
@@ -295,7 +293,7 @@ class SignalBot(metaclass=Singleton):
                 logger.info("CANDLE IS RED, CANCEL SIGNAL")
                 self.reset_all()
                 return
-            # if self.candlestick_htf_list[-1].close < self.candlestick_htf_list[-1].ema:
+            # if self.htf_candles.latest('close') < self.htf_candles.latest('ema_slow'):
             #     logger.info("HIGHER TIME FRAME NOT VALID, CANCEL SIGNAL")
             #     self.reset_all()
             #     return
@@ -336,15 +334,14 @@ class SignalBot(metaclass=Singleton):
             asyncio.sleep(5)
 
         chart_data: List[Ohlc] = []
-        if len(self.candlestick_list) <= 0:
+        if len(self.candles) <= 0:
             for candle in candlesticks[:-2]:
                 ohlc = Ohlc(unix=candle['openTime'],
-                            date=datetime.fromtimestamp(candle['openTime'] / 1000, tz=pytz.UTC),
                             open=float(candle['open']), high=float(candle['high']), low=float(candle['low']),
                             close=float(candle['close']))
                 chart_data.append(ohlc)
-            self.candlestick_list = chart_data
-            logger.info(f"chart data length: {len(self.candlestick_list)}")
+            self.seed_indicators(chart_data)
+            logger.info(f"chart data length: {len(self.candles)}")
 
         latest_incomplete_close_time_in_ms = candlesticks[-1]['closeTime']
         latest_complete_close_time_in_ms = candlesticks[-2]['closeTime']
@@ -0,0 +1,130 @@
+"""Backtest with the exits replayed on aggregate trades instead of candles"""
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from custom_types.trade_type import IBatchTrade, IBacktestMetrics
+from service.batch_dca_bot import BatchDcaBot, find_first_index
+from service.exchange import exchange
+from service.logging import setup_logging, backtest_logger as logger
+from service.multi_symbol_backtest import load_symbol, find_symbol_signals
+from settings import SYMBOL, INTERVAL
+from utils.candle_store import to_epoch_ms
+from utils.candlestick_utils import interval_in_ms, time_now_in_ms
+from utils.tick_store import TickStore, TICK_STORE_COLUMNS, DAY_IN_MS
+
+HOUR_IN_MS = 60 * 60 * 1000
+AGGREGATE_TRADE_LIMIT = 1000
+
+
+def get_first_aggregate_trade_id(day_start: int, symbol: str) -> Optional[int]:
+    """The time filter of aggTrades spans at most 1 hour, walk the day hour by hour"""
+    for hour_start in range(day_start, day_start + DAY_IN_MS, HOUR_IN_MS):
+        trades = exchange.get_aggregate_trades(start_time=hour_start, end_time=hour_start + HOUR_IN_MS - 1, limit=1,
+                                               symbol=symbol)
+        if len(trades):
+            return trades[0]['id']
+    return None
+
+
+def download_day(day_start: int, symbol: str) -> Dict[str, np.ndarray]:
+    """Every aggregate trade of one UTC day, paged by trade id"""
+    day_end = day_start + DAY_IN_MS
+    batches: List[Dict[str, np.ndarray]] = []
+    from_id = get_first_aggregate_trade_id(day_start, symbol)
+    while from_id is not None:
+        trades = exchange.get_aggregate_trades(from_id=from_id, limit=AGGREGATE_TRADE_LIMIT, symbol=symbol)
+        trades = [trade for trade in trades if trade['time'] < day_end]
+        if len(trades):
+            batches.append({'id': np.array([trade['id'] for trade in trades], dtype=np.int64),
+                            'time': np.array([trade['time'] for trade in trades], dtype=np.int64),
+                            'price': np.array([trade['price'] for trade in trades], dtype=np.float64),
+                            'qty': np.array([trade['qty'] for trade in trades], dtype=np.float64),
+                            'is_buyer_maker': np.array([trade['isBuyerMaker'] for trade in trades], dtype=np.bool_)})
+        if len(trades) < AGGREGATE_TRADE_LIMIT:
+            break
+        from_id = trades[-1]['id'] + 1
+    if not batches:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in TICK_STORE_COLUMNS.items()}
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in TICK_STORE_COLUMNS}
+
+
+def download_aggregate_trades(tick_store: TickStore, start_time: Union[int, datetime],
+                              end_time: Union[int, datetime]):
+    """Download the missing complete days of start_time <= time < end_time"""
+    start_time, end_time = to_epoch_ms(start_time), to_epoch_ms(end_time)
+    for day_start in tick_store.get_missing_days(start_time, end_time):
+        if day_start + DAY_IN_MS > time_now_in_ms():
+            logger.info(f"{datetime.utcfromtimestamp(day_start / 1000):%Y-%m-%d} is not complete yet, skipped")
+            continue
+        columns = download_day(day_start, tick_store.symbol)
+        tick_store.write_day(day_start, columns)
+        logger.info(f"{tick_store.symbol} {datetime.utcfromtimestamp(day_start / 1000):%Y-%m-%d}: "
+                    f"{len(columns['id'])} aggregate trades")
+
+
+class TickDcaBot(BatchDcaBot):
+    """
+    BatchDcaBot with the exits replayed trade by trade: entry on the open of the candle after the signal, take profit
+    filled at its price and the stop loss acting as a stop order filled at the first trade through it, whichever
+    trade comes first. Candles alone cannot tell the order when both are inside one candle.
+    """
+
+    def __init__(self, open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 open_time: np.ndarray, tick_store: TickStore, symbol: str = SYMBOL, **params):
+        super().__init__(open, high, low, close, open_time, symbol, **params)
+        if self.max_safety_order_count:
+            raise ValueError("TickDcaBot does not replay safety orders")
+        self.tick_store = tick_store
+        self.end_time = int(self.open_time[-1]) + interval_in_ms(INTERVAL) if len(self.open_time) else 0
+
+    def resolve_exit(self, entry_index: int, divergence: str) -> Optional[Tuple[int, float]]:
+        """
+        :returns: index of the candle with the exit trade and exit price, None if the trade is still open at the end
+        of the data
+        """
+        entry_price = self.open[entry_index]
+        is_long = divergence == 'bullish'
+        direction = 1 if is_long else -1
+        take_profit_price = entry_price * (1 + direction * self.target_profit_percentage)
+        stop_loss_price = entry_price * (1 - direction * self.stop_loss_percentage)
+        for ticks in self.tick_store.iter_chunks(int(self.open_time[entry_index]), self.end_time):
+            price = ticks['price']
+            take_profit_index = find_first_index(price, 0, take_profit_price, above=is_long)
+            stop_loss_index = find_first_index(price, 0, stop_loss_price, above=not is_long, end=take_profit_index)
+            if stop_loss_index is not None:
+                exit_time, exit_price = ticks['time'][stop_loss_index], price[stop_loss_index]
+            elif take_profit_index is not None:
+                exit_time, exit_price = ticks['time'][take_profit_index], take_profit_price
+            else:
+                continue
+            return int(np.searchsorted(self.open_time, exit_time, side='right')) - 1, exit_price
+        return None
+
+
+def run_tick_backtest(start_time: Union[int, datetime], end_time: Union[int, datetime], symbol: str = SYMBOL,
+                      signal_params: dict = None, dca_params: dict = None,
+                      download=True) -> Tuple[List[IBatchTrade], IBacktestMetrics]:
+    """Signals from the candle store, exits from the tick store"""
+    tick_store = TickStore(symbol)
+    if download:
+        download_aggregate_trades(tick_store, start_time, end_time)
+    missing_days = tick_store.get_missing_days(to_epoch_ms(start_time), to_epoch_ms(end_time))
+    if missing_days:
+        raise ValueError(f"No aggregate trades of {symbol} for "
+                         f"{[f'{datetime.utcfromtimestamp(day / 1000):%Y-%m-%d}' for day in missing_days]}")
+    candles = load_symbol(symbol, start_time, end_time)
+    signals = find_symbol_signals(symbol, start_time, end_time, signal_params or {})
+    dca_bot = TickDcaBot(candles['open'], candles['high'], candles['low'], candles['close'], candles['open_time'],
+                         tick_store, symbol=symbol, **(dca_params or {}))
+    trades = dca_bot.run(signals)
+    return trades, dca_bot.get_metrics(trades)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    start = time.time()
+    tick_trades, tick_metrics = run_tick_backtest(datetime(2021, 9, 1, 0, 00), datetime(2021, 9, 8, 0, 0))
+    logger.info(f"tick backtest done in {time.time() - start:.1f}s: {tick_metrics}")
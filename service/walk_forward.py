@@ -0,0 +1,136 @@
+"""Walk-forward optimization over rolling in-sample/out-of-sample windows"""
+import itertools
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from service.batch_dca_bot import BatchDcaBot
+from service.batch_signal_bot import BatchSignalBot
+from service.logging import setup_logging, backtest_logger as logger
+from service.parameter_sweep import get_candle_array, save_candles, init_worker, get_candles, group_by_signal_params, \
+    get_resolved_params
+from settings import SYMBOL, INTERVAL
+from utils.candle_store import CandleStore
+from utils.result_cache import ResultCache, get_array_checksum
+
+
+def get_windows(open_time: np.ndarray, in_sample: timedelta, out_of_sample: timedelta) -> List[Tuple[int, int, int]]:
+    """
+    Rolling windows stepping by out_of_sample
+    :returns: list of (in-sample start index, out-of-sample start index, out-of-sample end index)
+    """
+    in_sample_ms, out_of_sample_ms = int(in_sample.total_seconds() * 1000), int(out_of_sample.total_seconds() * 1000)
+    windows = []
+    start_time = int(open_time[0])
+    while start_time + in_sample_ms + out_of_sample_ms <= int(open_time[-1]) + 1:
+        start, middle, end = np.searchsorted(open_time, [start_time, start_time + in_sample_ms,
+                                                         start_time + in_sample_ms + out_of_sample_ms])
+        windows.append((int(start), int(middle), int(end)))
+        start_time += out_of_sample_ms
+    return windows
+
+
+def run_window_signal_params(signal_params: dict, dca_params_list: List[dict],
+                             windows: List[Tuple[int, int, int]]) -> List[dict]:
+    """
+    Find the signals over the whole history once, so the indicators and the peak/trough state are already warm at
+    every window boundary, then trade each window in isolation with every dca setting
+    """
+    open_time, _open, high, low, close, volume, quote_asset_volume = get_candles()
+    signal_bot = BatchSignalBot(open_time, _open, high, low, close, volume, quote_asset_volume, **signal_params)
+    signals = signal_bot.find_divergence_indexes()
+    signal_indexes = np.array([signal['index'] for signal in signals], dtype=np.int64)
+
+    def get_metrics(dca_params, start, end):
+        # Signals and prices of the window only, trades still open at its end are not counted
+        first, last = np.searchsorted(signal_indexes, [start, end])
+        window_signals = [{**signal, 'index': signal['index'] - start} for signal in signals[first:last]]
+        dca_bot = BatchDcaBot(_open[start:end], high[start:end], low[start:end], close[start:end],
+                              open_time[start:end], **dca_params)
+        return dca_bot.get_metrics(dca_bot.run(window_signals))
+
+    results = []
+    for window, (start, middle, end) in enumerate(windows):
+        for dca_params in dca_params_list:
+            in_sample_metrics = get_metrics(dca_params, start, middle)
+            out_of_sample_metrics = get_metrics(dca_params, middle, end)
+            results.append({'window': window, 'params': {**signal_params, **dca_params},
+                            'in_sample': in_sample_metrics, 'out_of_sample': out_of_sample_metrics})
+    return results
+
+
+def run_walk_forward(df: pd.DataFrame, grid: Dict[str, list], in_sample: timedelta = timedelta(days=30),
+                     out_of_sample: timedelta = timedelta(days=7), objective='cumulative_pnl',
+                     processes: int = None, result_cache: ResultCache = None) -> pd.DataFrame:
+    """
+    Pick the best setting of the grid on every in-sample window and report it on the following out-of-sample window.
+    Every signal setting is one pool task covering all windows, settings found in result_cache are not run again.
+    :returns: one row per window with the chosen params, its in-sample and out-of-sample metrics
+    """
+    candles = get_candle_array(df)
+    windows = get_windows(candles[0].astype(np.int64), in_sample, out_of_sample)
+    if len(windows) == 0:
+        raise ValueError(f"Not enough candles for a {in_sample} in-sample and {out_of_sample} out-of-sample window")
+    configs = group_by_signal_params(grid)
+    results = []
+    if result_cache is not None:
+        dataset = get_array_checksum(candles)
+        get_key = lambda params: result_cache.make_key(kind='walk_forward', dataset=dataset, windows=windows,
+                                                       params=get_resolved_params(params))
+        for signal_params_items, dca_params_list in configs.items():
+            uncached = []
+            for dca_params in dca_params_list:
+                cached = result_cache.get(get_key({**dict(signal_params_items), **dca_params}))
+                if cached is None:
+                    uncached.append(dca_params)
+                else:
+                    results += cached
+            configs[signal_params_items] = uncached
+        configs = {signal_params_items: item for signal_params_items, item in configs.items() if item}
+    logger.info(f"walk forward: {len(windows)} windows, {sum(len(item) for item in configs.values())} settings "
+                f"to run")
+
+    if configs:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = save_candles(candles, os.path.join(tmp_dir, 'candles.npy'))
+            with Pool(processes=processes, initializer=init_worker, initargs=(filepath,)) as pool:
+                tasks = [(dict(signal_params), dca_params_list, windows)
+                         for signal_params, dca_params_list in configs.items()]
+                new_results = list(itertools.chain.from_iterable(pool.starmap(run_window_signal_params, tasks)))
+        if result_cache is not None:
+            results_by_params: Dict[str, List[dict]] = {}
+            for item in new_results:
+                results_by_params.setdefault(json.dumps(item['params'], sort_keys=True), []).append(item)
+            for items in results_by_params.values():
+                result_cache.put(get_key(items[0]['params']), items)
+        results += new_results
+
+    rows = []
+    for window, (start, middle, end) in enumerate(windows):
+        best = max((item for item in results if item['window'] == window),
+                   key=lambda item: item['in_sample'][objective])
+        rows.append({'in_sample_start': df['date'].iloc[start], 'out_of_sample_start': df['date'].iloc[middle],
+                     'out_of_sample_end': df['date'].iloc[end - 1], **best['params'],
+                     **{f'in_sample_{name}': value for name, value in best['in_sample'].items()},
+                     **{f'out_of_sample_{name}': value for name, value in best['out_of_sample'].items()}})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    start_time = time.time()
+    chart_df = CandleStore(SYMBOL, INTERVAL).load_dataframe(datetime(2021, 4, 1, 0, 00), datetime(2021, 9, 30, 0, 0))
+    walk_forward_df = run_walk_forward(chart_df, {'rsi_overbought': [70, 75],
+                                                  'rsi_oversold': [25, 30],
+                                                  'target_profit_percentage': [0.0025, 0.005],
+                                                  'stop_loss_percentage': [0.005, 0.01]},
+                                       result_cache=ResultCache())
+    logger.info(f"walk forward done in {time.time() - start_time:.1f}s\n{walk_forward_df.to_string()}\n"
+                f"out of sample pnl: {walk_forward_df['out_of_sample_cumulative_pnl'].sum():.4f} USD")
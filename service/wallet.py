@@ -2,18 +2,19 @@ import time
 from datetime import datetime
 from typing import List
 
-from binance_f.model import OrderSide, PositionSide, OrderType, WorkingType
+from binance_f.model import OrderSide, PositionSide, OrderType, WorkingType, TimeInForce
 
 from classes.singleton import Singleton
 from custom_types.controller_type import EMode
 from custom_types.exchange_type import IPosition, IBalance, EToken, EWalletToken
 from database.dora_trade_transaction import DoraTradeTransaction, DoraTradeTransactionDAL
-from service.exchange import exchange
+from service.exchange import exchange, MAX_BATCH_ORDER_COUNT
 from service.logging import wallet_logger as logger
+from service.result_sink import ResultSink, CsvResultSink
 from service.telegram_bot import telegram_bot
 from settings import IS_PAPER_TRADING, SYMBOL, MODE, MAX_CONCURRENT_TRADE, TRADE_LEVERAGE
 from utils.events import ee, TelegramEventType
-from utils.general_utils import write_to_csv
+from utils.general_utils import txn_to_row
 
 
 def first(iterable, default=None):
@@ -41,7 +42,16 @@ class Wallet(metaclass=Singleton):
     max_continuous_losing = 0
     max_continuous_losing_overall = 0
 
+    result_sink: ResultSink = None
+
+    # Counters a backtest checkpoint needs to continue the run
+    state_attributes = ('overall_wallet_fund', 'starting_amount', 'tradeable_amount', 'cumulative_pnl',
+                        'pnl_percentage', 'total_completed_trade', 'active_trade', 'winning_trade', 'losing_trade',
+                        'total_winning_usdt', 'total_losing_usdt', 'total_losing_pct', 'max_continuous_losing',
+                        'max_continuous_losing_overall')
+
     def __init__(self):
+        self.result_sink = CsvResultSink()
         if not IS_PAPER_TRADING:
             usdt_ibalance_object = self.get_usdt_bal()
             self.overall_wallet_fund = usdt_ibalance_object['availableBalance']
@@ -95,6 +105,13 @@ class Wallet(metaclass=Singleton):
         if dora_trade_transaction.end_time is None:
             dora_trade_transaction.end_time = datetime.now()
 
+        dora_trade_transaction.pnl = final_pnl
+        dora_trade_transaction.overall_fund = self.overall_wallet_fund
+        if MODE == EMode.TEST:
+            # The report is built once in flush_results instead of per trade
+            self.result_sink.add(txn_to_row(dora_trade_transaction))
+            return
+
         if self.losing_trade > 0:
             winning_p_trade = self.total_winning_usdt / self.total_completed_trade
             losing_p_trade = self.total_losing_usdt / self.total_completed_trade
@@ -119,12 +136,43 @@ class Wallet(metaclass=Singleton):
                f"===========================\n")
         logger.info(msg)
         telegram_bot.send_message(message=msg)
-        dora_trade_transaction.pnl = final_pnl
-        dora_trade_transaction.overall_fund = self.overall_wallet_fund
-        if MODE == EMode.TEST:
-            write_to_csv(dora_trade_transaction)
         self.save_txn_to_db(dora_trade_transaction)
 
+    def get_state(self) -> dict:
+        state = {name: getattr(self, name) for name in self.state_attributes}
+        state['result_sink'] = self.result_sink.get_state()
+        return state
+
+    def set_state(self, state: dict):
+        for name in self.state_attributes:
+            setattr(self, name, state[name])
+        self.result_sink.set_state(state['result_sink'])
+
+    def set_result_sink(self, result_sink: ResultSink):
+        self.result_sink = result_sink
+
+    def flush_results(self):
+        """Write the buffered backtest trades and log the performance of the run"""
+        self.result_sink.flush()
+        metrics = self.result_sink.get_metrics(self.starting_amount)
+        msg = (f"BACKTEST REPORT\n"
+               f"===========================\n"
+               f"{'overall fund':<14}: {self.overall_wallet_fund:.4f} USD\n"
+               f"{'cumulative pnl':<14}: {metrics['cumulative_pnl']:.4f} USD\n"
+               f"{'overall pnl(%)':<14}: {metrics['pnl_percentage']:.4f}%\n"
+               f"{'total completed trade':<14}: {metrics['total_trade']}\n"
+               f"{'win rate':<14}: {metrics['win_rate']:.2f}%\n"
+               f"{'max drawdown':<14}: {metrics['max_drawdown_pct']:.4f}%\n"
+               f"{'sharpe':<14}: {metrics['sharpe_ratio']:.4f}\n"
+               f"{'sortino':<14}: {metrics['sortino_ratio']:.4f}\n"
+               f"{'exposure':<14}: {metrics['exposure_pct']:.2f}%\n"
+               f"{'winning streak':<14}: {metrics['max_winning_streak']}\n"
+               f"{'cont. losing streak':<14}: {metrics['max_losing_streak']}\n"
+               f"{'leverage':<14}: {TRADE_LEVERAGE}\n"
+               f"===========================\n")
+        logger.info(msg)
+        return metrics
+
     def get_active_trade(self):
         return self.active_trade
 
@@ -259,6 +307,52 @@ class Wallet(metaclass=Singleton):
                 continue
             break
 
+    def place_safety_orders(self, divergence: str, prices: List[float], quantities_in_coin: List[float],
+                            order_ids: List[str]):
+        """Rest the whole safety order ladder as limit orders, in batch requests instead of one request per level"""
+        is_long = divergence == 'bullish'
+        orders = [{'side': OrderSide.BUY if is_long else OrderSide.SELL,
+                   'positionSide': PositionSide.LONG if is_long else PositionSide.SHORT,
+                   'type': OrderType.LIMIT, 'timeInForce': TimeInForce.GTC,
+                   'quantity': f"{TRADE_LEVERAGE * quantity:.0f}", 'price': exchange.format_price(price),
+                   'newClientOrderId': order_id}
+                  for price, quantity, order_id in zip(prices, quantities_in_coin, order_ids)]
+        logger.info(f"place_safety_orders {len(orders)} {divergence}")
+        # Retried per batch request, a failed one only re-posts its orders that did not go through
+        for start in range(0, len(orders), MAX_BATCH_ORDER_COUNT):
+            batch = orders[start:start + MAX_BATCH_ORDER_COUNT]
+            retry = 0
+            while True and retry <= 3:
+                try:
+                    if retry:
+                        open_order_ids = {order['clientOrderId'] for order in exchange.get_open_orders()}
+                        batch = [order for order in batch if order['newClientOrderId'] not in open_order_ids]
+                    results = exchange.post_batch_orders(batch) if batch else []
+                except Exception as ex:
+                    logger.error(f"place_safety_orders() failed {retry}...\n"
+                                 f"{ex}")
+                    time.sleep(2)
+                    retry += 1
+                    continue
+                for result in results:
+                    if 'code' in result:
+                        logger.error(f"safety order rejected: {result['msg']}")
+                break
+
+    def cancel_safety_orders(self, order_ids: List[str]):
+        """Cancel the safety orders still resting once the position is closed"""
+        retry = 0
+        while True and retry <= 3:
+            try:
+                exchange.cancel_orders(order_ids)
+            except Exception as ex:
+                logger.error(f"cancel_safety_orders() failed {retry}...\n"
+                             f"{ex}")
+                time.sleep(2)
+                retry += 1
+                continue
+            break
+
     def stats_requested(self, chat_id):
         usdt_ibalance_object = self.get_bal_by_symbol()
         bnb_bal = wallet.get_bal_by_symbol(symbol=EWalletToken.BNB)
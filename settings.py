@@ -12,10 +12,39 @@ EXCHANGE_MODE = EMode.TEST
 # EXCHANGE_MODE = EMode.PRODUCTION
 
 IS_PAPER_TRADING = True
+# Send the orders of a non paper trading run to the in-process simulated exchange instead of Binance
+IS_PAPER_EXCHANGE = False
+PAPER_EXCHANGE_BALANCE = 1000
+# Market time between posting a market order and its fill, and wall time every simulated request takes
+PAPER_EXCHANGE_LATENCY_MS = 0
+PAPER_EXCHANGE_REQUEST_LATENCY_MS = 0
+PAPER_EXCHANGE_SLIPPAGE = 0.0002
+# Run the Binance streams as tasks on the event loop of main.py instead of a websocket thread each
+IS_ASYNCIO_WEBSOCKET = False
+IS_BATCH_BACKTEST = False
+# Continue a backtest from its latest checkpoint, saved every BACKTEST_CHECKPOINT_INTERVAL candles
+IS_RESUME_BACKTEST = False
+BACKTEST_CHECKPOINT_INTERVAL = 50000
+# Record the SignalBot decisions of every backtest candle under assets/decision_trace
+IS_DECISION_TRACE = False
 SYMBOL = EToken.MATIC_USDT
 INTERVAL = CandlestickInterval.MIN1
 MAX_CONCURRENT_TRADE = 1
 TRADE_LEVERAGE = 5
+TARGET_PROFIT_PERCENTAGE = 0.0025
+STOP_LOSS_PERCENTAGE = 0.005
+# Safety order ladder: MAX_SAFETY_ORDER_COUNT limit orders every PRICE_DEVIATION_TRIGGER_SO against the entry price,
+# each of BASE_ORDER_SIZE USDT like the base order, 0 splits the trade balance evenly over all orders
+MAX_SAFETY_ORDER_COUNT = 0
+PRICE_DEVIATION_TRIGGER_SO = 0.01
+BASE_ORDER_SIZE = 0
+# SignalBot indicator windows, RSI targets and minutes a peak/trough stays valid, for the live and batch signal bots
+RSI_WINDOW = 14
+EMA_FAST_WINDOW = 10
+EMA_SLOW_WINDOW = 50
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+PEAK_EXPIRY_MINUTES = 12
 
 # MODE = EMode.PRODUCTION
 # TELEGRAM_MODE = EMode.PRODUCTION
@@ -0,0 +1,176 @@
+"""Import Binance public data archives (data.binance.vision) already on disk into the candle and tick stores"""
+import glob
+import os
+import re
+import time
+import zipfile
+from collections import defaultdict
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from service.logging import setup_logging, backtest_logger as logger
+from settings import BASE_DIR
+from utils.candle_store import CandleStore, CANDLE_STORE_COLUMNS
+from utils.candlestick_utils import interval_in_ms
+from utils.tick_store import TickStore, DAY_IN_MS
+
+# e.g. MATICUSDT-1m-2021-09.zip, MATICUSDT-aggTrades-2021-09-01.zip
+ARCHIVE_FILENAME_PATTERN = re.compile(r'^(?P<symbol>[A-Z0-9]+)-(?P<kind>[0-9]+[smhdwM]|aggTrades)-'
+                                      r'(?P<period>\d{4}-\d{2}(?:-\d{2})?)\.zip$')
+# Column position in the archive csv: store column
+KLINE_ARCHIVE_COLUMNS = {0: 'open_time', 1: 'open', 2: 'high', 3: 'low', 4: 'close', 5: 'volume',
+                         7: 'quoteAssetVolume'}
+AGG_TRADE_ARCHIVE_COLUMNS = {0: 'id', 1: 'price', 2: 'qty', 5: 'time', 6: 'is_buyer_maker'}
+AGG_TRADE_CHUNK_SIZE = 1000000
+# Archives from 2025 on are in microseconds
+MICROSECOND_THRESHOLD = 10 ** 14
+
+
+def parse_archive_filename(filepath: str) -> Tuple[str, str]:
+    """:returns: symbol in the store format (lower case); interval or 'aggTrades'"""
+    match = ARCHIVE_FILENAME_PATTERN.match(os.path.basename(filepath))
+    if match is None:
+        raise ValueError(f"Not a Binance public data archive name: {filepath}")
+    return match['symbol'].lower(), match['kind']
+
+
+def to_ms(timestamps: np.ndarray) -> np.ndarray:
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    return timestamps // 1000 if len(timestamps) and timestamps[0] >= MICROSECOND_THRESHOLD else timestamps
+
+
+def read_archive_csv(filepath: str, columns: Dict[int, str], chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """Decompress the csv of an archive while it is parsed, with or without its header line"""
+    with zipfile.ZipFile(filepath) as archive:
+        for name in archive.namelist():
+            if not name.endswith('.csv'):
+                continue
+            with archive.open(name) as f:
+                header = None if f.peek(1)[:1].isdigit() else 0
+                reader = pd.read_csv(f, header=header, usecols=list(columns), chunksize=chunksize)
+                for df in ([reader] if chunksize is None else reader):
+                    # usecols keeps the file order whether the columns are named by the header or by position
+                    df.columns = [columns[position] for position in sorted(columns)]
+                    yield df
+
+
+def read_kline_archive(filepath: str) -> Dict[str, np.ndarray]:
+    df = pd.concat(list(read_archive_csv(filepath, KLINE_ARCHIVE_COLUMNS)), ignore_index=True)
+    columns = {name: df[name].values.astype(dtype) for name, dtype in CANDLE_STORE_COLUMNS.items()
+               if name != 'open_time'}
+    columns['open_time'] = to_ms(df['open_time'].values)
+    return columns
+
+
+def import_agg_trade_archive(filepath: str, directory: str = None) -> dict:
+    """
+    Write the trades of an archive day by day into the tick store, chunk by chunk so a monthly archive is never
+    fully in memory
+    :returns: symbol, trade count and the aggregate trade id gaps
+    """
+    symbol, _ = parse_archive_filename(filepath)
+    tick_store = TickStore(symbol, directory)
+    day_parts: List[Dict[str, np.ndarray]] = []
+    current_day = None
+    trade_count = 0
+    id_gaps: List[Tuple[int, int]] = []
+    last_id = None
+
+    def write_current_day():
+        if day_parts:
+            tick_store.write_day(current_day, {name: np.concatenate([part[name] for part in day_parts])
+                                               for name in day_parts[0]})
+            day_parts.clear()
+
+    for df in read_archive_csv(filepath, AGG_TRADE_ARCHIVE_COLUMNS, chunksize=AGG_TRADE_CHUNK_SIZE):
+        chunk = {'id': df['id'].values.astype(np.int64), 'time': to_ms(df['time'].values),
+                 'price': df['price'].values.astype(np.float64), 'qty': df['qty'].values.astype(np.float64),
+                 'is_buyer_maker': df['is_buyer_maker'].values.astype(np.bool_)}
+        ids = chunk['id'] if last_id is None else np.concatenate(([last_id], chunk['id']))
+        gaps = np.flatnonzero(np.diff(ids) != 1)
+        id_gaps += [(int(ids[gap]), int(ids[gap + 1])) for gap in gaps]
+        last_id = int(chunk['id'][-1])
+        trade_count += len(chunk['id'])
+
+        day_start = chunk['time'] - chunk['time'] % DAY_IN_MS
+        bounds = np.flatnonzero(np.diff(day_start)) + 1
+        for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(day_start)]))):
+            if day_start[start] != current_day:
+                write_current_day()
+                current_day = int(day_start[start])
+            day_parts.append({name: values[start:end] for name, values in chunk.items()})
+    write_current_day()
+    return {'symbol': symbol, 'filepath': filepath, 'trade_count': trade_count, 'id_gaps': id_gaps}
+
+
+def get_candle_gaps(open_time: np.ndarray, interval: str) -> List[Tuple[int, int]]:
+    """(last open time before, first open time after) of every missing stretch of candles"""
+    gaps = np.flatnonzero(np.diff(open_time) != interval_in_ms(interval))
+    return [(int(open_time[gap]), int(open_time[gap + 1])) for gap in gaps]
+
+
+def import_kline_archives(filepaths: List[str], processes: int = None,
+                          directory: str = None) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+    """
+    Parse the archives in worker processes and merge them with the stored candles, one write per symbol/interval
+    :returns: candle gaps of every written symbol/interval
+    """
+    with Pool(processes=processes) as pool:
+        parsed = pool.map(read_kline_archive, filepaths)
+    columns_by_store: Dict[Tuple[str, str], List[Dict[str, np.ndarray]]] = defaultdict(list)
+    for filepath, columns in zip(filepaths, parsed):
+        columns_by_store[parse_archive_filename(filepath)].append(columns)
+
+    gaps_by_store = {}
+    for (symbol, interval), columns_list in columns_by_store.items():
+        candle_store = CandleStore(symbol, interval, None if directory is None else
+                                   os.path.join(directory, symbol, interval))
+        if candle_store.exists():
+            columns_list.append({name: np.array(values) for name, values in candle_store.load_range().items()})
+        candle_store.write({name: np.concatenate([columns[name] for columns in columns_list])
+                            for name in CANDLE_STORE_COLUMNS})
+
+        open_time, _open, close = candle_store.column('open_time'), candle_store.column('open'), \
+            candle_store.column('close')
+        high, low = candle_store.column('high'), candle_store.column('low')
+        invalid_count = int(np.count_nonzero((high < np.maximum(_open, close)) | (low > np.minimum(_open, close))))
+        gaps = get_candle_gaps(open_time, interval)
+        gaps_by_store[(symbol, interval)] = gaps
+        logger.info(f"{symbol} {interval}: {len(open_time)} candles, {len(gaps)} gaps, {invalid_count} invalid")
+        for start, end in gaps[:20]:
+            logger.warning(f"{symbol} {interval} gap: {pd.to_datetime(start, unit='ms')} -> "
+                           f"{pd.to_datetime(end, unit='ms')}")
+        if invalid_count:
+            logger.warning(f"{symbol} {interval}: {invalid_count} candles with high/low outside of open/close")
+    return gaps_by_store
+
+
+def import_agg_trade_archives(filepaths: List[str], processes: int = None, directory: str = None) -> List[dict]:
+    """Every archive in its own worker process, each writes its own days"""
+    with Pool(processes=processes) as pool:
+        reports = pool.starmap(import_agg_trade_archive, [(filepath, directory) for filepath in filepaths])
+    for report in reports:
+        logger.info(f"{report['filepath']}: {report['trade_count']} trades, {len(report['id_gaps'])} id gaps")
+        for start, end in report['id_gaps'][:20]:
+            logger.warning(f"{report['symbol']} aggregate trade id gap: {start} -> {end}")
+    return reports
+
+
+def import_archives(filepaths: List[str], processes: int = None):
+    """Kline and aggTrades archives, told apart by their file name"""
+    kline_filepaths = [path for path in filepaths if parse_archive_filename(path)[1] != 'aggTrades']
+    agg_trade_filepaths = [path for path in filepaths if parse_archive_filename(path)[1] == 'aggTrades']
+    if kline_filepaths:
+        import_kline_archives(kline_filepaths, processes)
+    if agg_trade_filepaths:
+        import_agg_trade_archives(agg_trade_filepaths, processes)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    start_time = time.time()
+    import_archives(sorted(glob.glob(os.path.join(BASE_DIR, 'assets', 'binance_archive', '*.zip'))))
+    logger.info(f"archive import done in {time.time() - start_time:.1f}s")
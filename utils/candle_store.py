@@ -0,0 +1,202 @@
+"""
+Columnar candle store, one .npy file per column under assets/candle_store/<symbol>/<interval>, or one .ticks.npz
+file per column once compressed with the tick codec
+"""
+import os
+from datetime import datetime
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from settings import BASE_DIR
+from utils.path_utils import build_path
+from utils.tick_codec import EncodedSeries, encode, decode, get_tick_grid
+
+# Column: dtype, open_time is the candle open time in epoch ms
+CANDLE_STORE_COLUMNS = {
+    'open_time': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+    'quoteAssetVolume': np.float64,
+}
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+CSV_DATE_FORMAT = '%d-%m-%y %H:%M'
+
+
+def to_epoch_ms(value: Union[int, datetime, None]) -> Union[int, None]:
+    """Naive datetimes are read as UTC, same as the 'date' column of the backtest dataframe"""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    return int(pd.Timestamp(value).value // 10 ** 6)
+
+
+def get_dataframe_columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Store columns of a backtest dataframe with a parsed 'date' column"""
+    columns = {name: df[name].values for name in CANDLE_STORE_COLUMNS if name != 'open_time'}
+    columns['open_time'] = df['date'].values.astype('datetime64[ms]').astype(np.int64)
+    return columns
+
+
+class CandleStore:
+    def __init__(self, symbol: str, interval: str, directory: str = None):
+        self.symbol = symbol
+        self.interval = interval
+        self.directory = directory or build_path([BASE_DIR, 'assets', 'candle_store', symbol, interval],
+                                                 with_filename=False)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._encoded_columns: Dict[str, EncodedSeries] = {}
+
+    def column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.npy')
+
+    def encoded_column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.ticks.npz')
+
+    def is_encoded(self, name: str) -> bool:
+        return not os.path.exists(self.column_path(name)) and os.path.exists(self.encoded_column_path(name))
+
+    def exists(self) -> bool:
+        return all(os.path.exists(self.column_path(name)) or os.path.exists(self.encoded_column_path(name))
+                   for name in CANDLE_STORE_COLUMNS)
+
+    def clear_cache(self):
+        self._columns = {}
+        self._encoded_columns = {}
+
+    def write(self, columns: Dict[str, np.ndarray]):
+        """
+        Replace the stored candles, rows are sorted by open_time and duplicated open times dropped. A compressed store
+        is compressed again.
+        """
+        open_time = np.asarray(columns['open_time'], dtype=np.int64)
+        open_time, index = np.unique(open_time, return_index=True)
+        is_compressed = any(self.is_encoded(name) for name in CANDLE_STORE_COLUMNS)
+        os.makedirs(self.directory, exist_ok=True)
+        for name, dtype in CANDLE_STORE_COLUMNS.items():
+            values = open_time if name == 'open_time' else np.asarray(columns[name], dtype=dtype)[index]
+            # Replace the file instead of truncating it, it may still be memory mapped
+            tmp_path = f'{self.column_path(name)}.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, values)
+            self._columns.pop(name, None)
+            os.replace(tmp_path, self.column_path(name))
+            if os.path.exists(self.encoded_column_path(name)):
+                os.remove(self.encoded_column_path(name))
+        self.clear_cache()
+        if is_compressed:
+            self.compress()
+
+    def write_dataframe(self, df: pd.DataFrame):
+        """Write a backtest dataframe with a parsed 'date' column"""
+        self.write(get_dataframe_columns(df))
+
+    def append(self, columns: Dict[str, np.ndarray]) -> int:
+        """
+        Add the candles newer than the last stored one, e.g. the latest candles from the exchange
+        :returns: number of candles added
+        """
+        if not self.exists():
+            self.write(columns)
+            return len(self)
+        open_time = np.asarray(columns['open_time'], dtype=np.int64)
+        open_time, index = np.unique(open_time, return_index=True)
+        stored_open_time = self.column('open_time')
+        if len(stored_open_time):
+            is_new = open_time > stored_open_time[-1]
+            open_time, index = open_time[is_new], index[is_new]
+        if len(open_time) == 0:
+            return 0
+        is_compressed = any(self.is_encoded(name) for name in CANDLE_STORE_COLUMNS)
+        for name, dtype in CANDLE_STORE_COLUMNS.items():
+            new_values = open_time if name == 'open_time' else np.asarray(columns[name], dtype=dtype)[index]
+            values = np.concatenate((self.column(name), new_values))
+            # Replace the file instead of truncating it, it may still be memory mapped
+            tmp_path = f'{self.column_path(name)}.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, values)
+            os.replace(tmp_path, self.column_path(name))
+        self.clear_cache()
+        if is_compressed:
+            self.compress()
+        return len(open_time)
+
+    def compress(self, tick_size: float = None) -> Dict[str, float]:
+        """
+        Re-encode every column whose values are on a decimal tick grid (prices, open_time, usually volume) with the
+        tick codec, the others stay .npy
+        :param tick_size: tick size of the symbol for the price columns, found from the prices when not given
+        :returns: compression ratio of every encoded column
+        """
+        ratios = {}
+        for name in CANDLE_STORE_COLUMNS:
+            if self.is_encoded(name):
+                continue
+            values = np.asarray(self.column(name))
+            if get_tick_grid(values) is None:
+                continue
+            encoded = encode(values, tick_size if name in PRICE_COLUMNS else None)
+            tmp_path = f'{self.encoded_column_path(name)}.{os.getpid()}.tmp.npz'
+            encoded.save(tmp_path)
+            os.replace(tmp_path, self.encoded_column_path(name))
+            os.remove(self.column_path(name))
+            ratios[name] = values.nbytes / max(encoded.nbytes, 1)
+        self.clear_cache()
+        return ratios
+
+    def append_dataframe(self, df: pd.DataFrame) -> int:
+        return self.append(get_dataframe_columns(df))
+
+    def import_csv(self, filepath: str):
+        """One time conversion of a csv written by gen_candlestick_csv_data"""
+        df = pd.read_csv(filepath)
+        df['date'] = pd.to_datetime(df['date'], format=CSV_DATE_FORMAT)
+        self.write_dataframe(df)
+
+    def encoded_column(self, name: str) -> EncodedSeries:
+        if name not in self._encoded_columns:
+            self._encoded_columns[name] = EncodedSeries.load(self.encoded_column_path(name))
+        return self._encoded_columns[name]
+
+    def column(self, name: str) -> np.ndarray:
+        """Memory mapped column, or the whole decoded column when compressed, loaded once"""
+        if name not in self._columns:
+            if self.is_encoded(name):
+                self._columns[name] = decode(self.encoded_column(name))
+            else:
+                self._columns[name] = np.load(self.column_path(name), mmap_mode='r')
+        return self._columns[name]
+
+    def column_range(self, name: str, start: int, end: int) -> np.ndarray:
+        """Rows start to end - 1 of a column, a compressed column only decodes the blocks of the range"""
+        if name not in self._columns and self.is_encoded(name):
+            return decode(self.encoded_column(name), start, end)
+        return self.column(name)[start:end]
+
+    def __len__(self):
+        if 'open_time' not in self._columns and self.is_encoded('open_time'):
+            return len(self.encoded_column('open_time'))
+        return len(self.column('open_time'))
+
+    def get_index_range(self, start_time: Union[int, datetime] = None, end_time: Union[int, datetime] = None):
+        """:returns: first and last + 1 row with start_time <= open_time < end_time"""
+        open_time = self.column('open_time')
+        start_time, end_time = to_epoch_ms(start_time), to_epoch_ms(end_time)
+        start = 0 if start_time is None else int(np.searchsorted(open_time, start_time, side='left'))
+        end = len(open_time) if end_time is None else int(np.searchsorted(open_time, end_time, side='left'))
+        return start, max(start, end)
+
+    def load_range(self, start_time: Union[int, datetime] = None,
+                   end_time: Union[int, datetime] = None) -> Dict[str, np.ndarray]:
+        """Every column with start_time <= open_time < end_time, read-only views of the .npy columns"""
+        start, end = self.get_index_range(start_time, end_time)
+        return {name: self.column_range(name, start, end) for name in CANDLE_STORE_COLUMNS}
+
+    def load_dataframe(self, start_time: Union[int, datetime] = None,
+                       end_time: Union[int, datetime] = None) -> pd.DataFrame:
+        """Same layout as the backtest csv dataframe"""
+        columns = self.load_range(start_time, end_time)
+        df = pd.DataFrame({name: np.asarray(values) for name, values in columns.items() if name != 'open_time'})
+        df.insert(0, 'date', pd.to_datetime(np.asarray(columns['open_time']), unit='ms'))
+        return df
@@ -0,0 +1,26 @@
+"""Backtest checkpoints, the state of a streaming backtest pickled under assets/checkpoint"""
+import os
+import pickle
+from typing import Optional
+
+from settings import BASE_DIR
+from utils.path_utils import build_path
+
+
+def get_checkpoint_path(symbol: str, interval: str) -> str:
+    return build_path([BASE_DIR, 'assets', 'checkpoint', f'{symbol}_{interval}.pkl'])
+
+
+def save_checkpoint(state: dict, filepath: str):
+    """Written to a temporary file first, a crash while saving keeps the previous checkpoint"""
+    tmp_path = f'{filepath}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, filepath)
+
+
+def load_checkpoint(filepath: str) -> Optional[dict]:
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,88 @@
+"""Per candle record of the SignalBot decisions, kept in columns and written in batches"""
+import glob
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from settings import BASE_DIR
+from utils.path_utils import build_path
+
+# Column: dtype
+DECISION_TRACE_COLUMNS = {
+    'open_time': np.int64,
+    'close': np.float64,
+    'rsi': np.float64,
+    'ema_fast': np.float64,
+    'ema_slow': np.float64,
+    'zigzag': np.int8,
+    'valid_rsi_target': np.bool_,
+    'divergence': np.int8,
+    'point0_price': np.float64,
+    'safety_outcome': np.int8,
+}
+# Categories of the int8 columns, stored as their index
+ZIGZAG_CODES = (None, 'peak', 'trough')
+DIVERGENCE_CODES = (None, 'bullish', 'bearish')
+SAFETY_OUTCOME_CODES = (None, 'signal', 'cancel_green', 'cancel_red')
+
+
+class DecisionTrace:
+    """Values are appended to plain lists and converted to arrays once per batch_size candles, one .npz per batch"""
+
+    def __init__(self, directory: str = None, batch_size: int = 100000, part_count: int = 0):
+        """:param part_count: parts of a previous run to keep, continued after a backtest checkpoint"""
+        self.directory = directory or build_path([BASE_DIR, 'assets', 'decision_trace'], with_filename=False)
+        self.batch_size = batch_size
+        self.columns: Dict[str, list] = {name: [] for name in DECISION_TRACE_COLUMNS}
+        self.zigzag_codes = {value: code for code, value in enumerate(ZIGZAG_CODES)}
+        self.divergence_codes = {value: code for code, value in enumerate(DIVERGENCE_CODES)}
+        self.safety_outcome_codes = {value: code for code, value in enumerate(SAFETY_OUTCOME_CODES)}
+        self.part_count = part_count
+        os.makedirs(self.directory, exist_ok=True)
+        for path in self.get_part_paths()[part_count:]:
+            os.remove(path)
+
+    def get_part_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, 'part-*.npz')))
+
+    def record(self, open_time: int, close: float, rsi: float, ema_fast: float, ema_slow: float,
+               zigzag: Optional[str], valid_rsi_target: bool, divergence: Optional[str], point0_price: float,
+               safety_outcome: Optional[str]):
+        columns = self.columns
+        columns['open_time'].append(open_time)
+        columns['close'].append(close)
+        columns['rsi'].append(rsi)
+        columns['ema_fast'].append(ema_fast)
+        columns['ema_slow'].append(ema_slow)
+        columns['zigzag'].append(self.zigzag_codes[zigzag])
+        columns['valid_rsi_target'].append(valid_rsi_target)
+        columns['divergence'].append(self.divergence_codes[divergence])
+        columns['point0_price'].append(point0_price)
+        columns['safety_outcome'].append(self.safety_outcome_codes[safety_outcome])
+        if len(columns['open_time']) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.columns['open_time']) == 0:
+            return
+        path = os.path.join(self.directory, f'part-{self.part_count:05d}.npz')
+        np.savez(path, **{name: np.asarray(self.columns[name], dtype=dtype)
+                          for name, dtype in DECISION_TRACE_COLUMNS.items()})
+        self.part_count += 1
+        self.columns = {name: [] for name in DECISION_TRACE_COLUMNS}
+
+    def load_dataframe(self) -> pd.DataFrame:
+        """Every flushed candle, with the categories decoded and a 'date' column from open_time"""
+        parts = []
+        for path in self.get_part_paths():
+            with np.load(path) as npz:
+                parts.append({name: npz[name] for name in DECISION_TRACE_COLUMNS})
+        df = pd.DataFrame({name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype)
+                           for name, dtype in DECISION_TRACE_COLUMNS.items()})
+        for name, codes in (('zigzag', ZIGZAG_CODES), ('divergence', DIVERGENCE_CODES),
+                            ('safety_outcome', SAFETY_OUTCOME_CODES)):
+            df[name] = pd.Categorical.from_codes(df[name].values - 1, categories=codes[1:])
+        df.insert(0, 'date', pd.to_datetime(df['open_time'], unit='ms'))
+        return df
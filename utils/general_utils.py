@@ -1,22 +1,34 @@
 import codecs
+from typing import List
 
 from database.dora_trade_transaction import DoraTradeTransaction
 from settings import BASE_DIR
 from utils.path_utils import build_path
 
+BACKTEST_RESULT_COLUMNS = ('dora_txn_seqno', '_id', 'symbol', 'start_time', 'end_time', 'pnl', 'overall_fund',
+                           'txn_type', 'txn_interval')
 
-def init_backtest_file():
+
+def get_backtest_file_path():
     filename = f"backtest_result"
-    write_file_path = build_path([BASE_DIR, 'assets', f'{filename}.csv'])
-    with codecs.open(write_file_path, 'w', 'utf-8') as f:
-        f.write('dora_txn_seqno,_id,symbol,start_time,end_time,pnl,overall_fund,txn_type,txn_interval\n')
+    return build_path([BASE_DIR, 'assets', f'{filename}.csv'])
+
+
+def init_backtest_file():
+    with codecs.open(get_backtest_file_path(), 'w', 'utf-8') as f:
+        f.write(f"{','.join(BACKTEST_RESULT_COLUMNS)}\n")
+
+
+def txn_to_row(txn: DoraTradeTransaction) -> dict:
+    return {name: getattr(txn, name) for name in BACKTEST_RESULT_COLUMNS}
 
 
 def write_to_csv(txn: DoraTradeTransaction):
-    filename = f"backtest_result"
-    write_file_path = build_path([BASE_DIR, 'assets', f'{filename}.csv'])
-    with codecs.open(write_file_path, 'a', 'utf-8') as f:
-        line = f"{txn.dora_txn_seqno},{txn._id},{txn.symbol},{txn.start_time},{txn.end_time},{txn.pnl}," \
-               f"{txn.overall_fund},{txn.txn_type},{txn.txn_interval}"
-        f.write(line)
-        f.write('\n')
+    write_rows_to_csv([txn_to_row(txn)])
+
+
+def write_rows_to_csv(rows: List[dict]):
+    """Append rows to the backtest result file with a single write"""
+    lines = [','.join(f"{row[name]}" for name in BACKTEST_RESULT_COLUMNS) + '\n' for row in rows]
+    with codecs.open(get_backtest_file_path(), 'a', 'utf-8') as f:
+        f.write(''.join(lines))
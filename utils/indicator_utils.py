@@ -1,33 +1,47 @@
-from typing import List
+from typing import List, Optional, Union
 
+import numpy as np
+from scipy.signal import lfilter
 from ta.momentum import RSIIndicator
 from ta.trend import EMAIndicator
 from ta.volatility import BollingerBands, AverageTrueRange
 from ta.volume import volume_weighted_average_price
 
+from classes.candle_ring_buffer import CandleRingBuffer, OHLC_COLUMNS
 from classes.ohlc import Ohlc
 import pandas as pd
 
 from service.logging import indicator_util_logger as logger
 
 
-def get_latest_rsi(data: List[Ohlc], data_len, window) -> int:
+CandleData = Union[List[Ohlc], CandleRingBuffer]
+
+
+def get_column(data: CandleData, name: str, data_len) -> pd.Series:
+    """Return the last data_len values of a column, as a view if data is a CandleRingBuffer"""
+    if isinstance(data, CandleRingBuffer):
+        return pd.Series(data.window(name, data_len), copy=False)
+    attr = OHLC_COLUMNS[name]
+    return pd.Series([getattr(obj, attr) for obj in data[-data_len:]])
+
+
+def get_latest_rsi(data: CandleData, data_len, window) -> int:
     """Calculate RSI from a pandas Series and return the latest RSI"""
-    close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
+    close_price_list = get_column(data, 'close', data_len)
     rsi_list = RSIIndicator(close=close_price_list, window=window).rsi()
     return rsi_list.iloc[-1]
 
 
-def get_latest_ema(data: List[Ohlc], data_len, window=50):
+def get_latest_ema(data: CandleData, data_len, window=50):
     """Calculate DEMA from a pandas Series and return the latest EMA"""
-    close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
+    close_price_list = get_column(data, 'close', data_len)
     ema_list = EMAIndicator(close=close_price_list, window=window).ema_indicator()
     return ema_list.iloc[-1]
 
 
-def get_bollinger_band(data: List[Ohlc], data_len, window=20):
+def get_bollinger_band(data: CandleData, data_len, window=20):
     """Calculate BOLLINGER BAND from a pandas Series"""
-    close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
+    close_price_list = get_column(data, 'close', data_len)
     indicator_bb = BollingerBands(close=close_price_list, window=window, window_dev=2)
 
     # Add Bollinger Bands features
@@ -38,11 +52,11 @@ def get_bollinger_band(data: List[Ohlc], data_len, window=20):
     return bb_result
 
 
-def get_avg_true_range(data: List[Ohlc], data_len, window=14):
+def get_avg_true_range(data: CandleData, data_len, window=14):
     """Calculate ATR from a pandas Series and return the latest ATR"""
-    close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
-    high_price_list = pd.Series([obj.high for obj in data[-data_len:]])
-    low_price_list = pd.Series([obj.low for obj in data[-data_len:]])
+    close_price_list = get_column(data, 'close', data_len)
+    high_price_list = get_column(data, 'high', data_len)
+    low_price_list = get_column(data, 'low', data_len)
     atr = AverageTrueRange(high=high_price_list,
                            low=low_price_list,
                            close=close_price_list,
@@ -51,11 +65,11 @@ def get_avg_true_range(data: List[Ohlc], data_len, window=14):
     return atr_list.iloc[-1]
 
 
-def get_vwap(data: List[Ohlc], data_len, window=14):
-    high_price_list = pd.Series([obj.high for obj in data[-data_len:]])
-    low_price_list = pd.Series([obj.low for obj in data[-data_len:]])
-    close_price_list = pd.Series([obj.close for obj in data[-data_len:]])
-    quoteAssetVolume_list = pd.Series([obj.quoteAssetVolume for obj in data[-data_len:]])
+def get_vwap(data: CandleData, data_len, window=14):
+    high_price_list = get_column(data, 'high', data_len)
+    low_price_list = get_column(data, 'low', data_len)
+    close_price_list = get_column(data, 'close', data_len)
+    quoteAssetVolume_list = get_column(data, 'quote_asset_volume', data_len)
     # volume_list = pd.Series([obj.volume_usdt for obj in data[-data_len:]])
     # vol = volume_list * close_price_list
     vwap_list = volume_weighted_average_price(high=high_price_list, low=low_price_list, close=close_price_list,
@@ -63,3 +77,41 @@ def get_vwap(data: List[Ohlc], data_len, window=14):
                                               window=window, fillna=True)
     # logger.info(f"quote: {quoteAssetVolume_list.iloc[-1]:.5f} vol:{volume_list.iloc[-1]:.5f} q*vol:{vol.iloc[-1]:.5f}")
     return vwap_list.iloc[-1]
+
+
+def _ewm_array(values: np.ndarray, alpha: float, data_len: Optional[int] = None,
+               window_start_values: np.ndarray = None) -> np.ndarray:
+    """Recursive EWM (adjust=False) over a whole series, each value restarted at the first of its last data_len"""
+    decay = 1 - alpha
+    result = lfilter([alpha], [1, -decay], values, zi=[decay * values[0]])[0]
+    if data_len is not None and len(values) > data_len:
+        # A window starting at s sees window_start_values[s] as its first value instead of the full history value,
+        # the difference decays by (1 - alpha) for each of the remaining data_len - 1 candles
+        start_values = values if window_start_values is None else window_start_values
+        num_windows = len(values) - data_len + 1
+        offset = result[:num_windows] - start_values[:num_windows]
+        result[data_len - 1:] -= decay ** (data_len - 1) * offset
+    return result
+
+
+def get_rsi_array(close: np.ndarray, window=14, data_len: Optional[int] = None) -> np.ndarray:
+    """Calculate RSI for every candle, same as StreamingRsi, or get_latest_rsi when data_len is given"""
+    close = np.asarray(close, dtype=np.float64)
+    diff = np.diff(close, prepend=np.nan)
+    up_direction = np.where(diff > 0, diff, 0.0)
+    down_direction = np.where(diff < 0, -diff, 0.0)
+    zeros = np.zeros(len(close))
+    emaup = _ewm_array(up_direction, 1 / window, data_len, zeros)
+    emadn = _ewm_array(down_direction, 1 / window, data_len, zeros)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(emadn == 0, 100, 100 - (100 / (1 + emaup / emadn)))
+    rsi[:window - 1] = np.nan
+    return rsi
+
+
+def get_ema_array(close: np.ndarray, window=50, data_len: Optional[int] = None) -> np.ndarray:
+    """Calculate EMA for every candle, same as StreamingEma, or get_latest_ema when data_len is given"""
+    close = np.asarray(close, dtype=np.float64)
+    ema = _ewm_array(close, 2 / (window + 1), data_len)
+    ema[:window - 1] = np.nan
+    return ema
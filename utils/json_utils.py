@@ -1,4 +1,6 @@
 from collections import namedtuple
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional, Tuple
 
 
 def pretty(d, indent=0):
@@ -10,26 +12,63 @@ def pretty(d, indent=0):
             print('\t' * (indent + 1) + str(value))
 
 
-def parse_obj_to_dict(obj):
-    _dict = {}
-    members = [attr for attr in dir(obj) if not callable(attr) and not attr.startswith("__")]
-    for member in members:
-        val = getattr(obj, member)
+# Class: getter of the values of its slots and their names, None for a class keeping its fields in __dict__
+CLASS_FIELDS: Dict[type, Optional[Tuple[Callable[[Any], tuple], Tuple[str, ...]]]] = {}
+# Values of these classes are taken as they are
+SCALAR_CLASSES = frozenset((int, float, str, bool, type(None)))
+# Class of a value: whether it is a binance model, converted to a dict too
+IS_MODEL_CLASS: Dict[type, bool] = {}
+
+
+def get_class_fields(cls: type) -> Optional[Tuple[Callable[[Any], tuple], Tuple[str, ...]]]:
+    """Slots of the class and its bases, looked up once per class"""
+    if cls not in CLASS_FIELDS:
+        names = []
+        for klass in reversed(cls.__mro__):
+            slots = klass.__dict__.get('__slots__', ())
+            names += [slots] if isinstance(slots, str) else list(slots)
+        names = tuple(name for name in dict.fromkeys(names) if not name.startswith('_'))
+        if not names:
+            CLASS_FIELDS[cls] = None
+        elif len(names) == 1:
+            getter = attrgetter(names[0])
+            CLASS_FIELDS[cls] = (lambda obj: (getter(obj),)), names
+        else:
+            CLASS_FIELDS[cls] = attrgetter(*names), names
+    return CLASS_FIELDS[cls]
+
+
+def is_model_class(cls: type) -> bool:
+    if cls not in IS_MODEL_CLASS:
+        IS_MODEL_CLASS[cls] = 'binance' in cls.__module__
+    return IS_MODEL_CLASS[cls]
+
+
+def parse_obj_to_dict(obj) -> dict:
+    """
+    Public fields of a model (binance models nested in it included) as a dict, from its slots or its __dict__
+    without walking dir(obj)
+    """
+    fields = get_class_fields(obj.__class__)
+    if fields is None:
+        items = [(name, val) for name, val in obj.__dict__.items() if not name.startswith('_')]
+    else:
+        getter, names = fields
+        items = zip(names, getter(obj))
+    _dict = dict(items)
+    for member, val in _dict.items():
+        if val.__class__ in SCALAR_CLASSES:
+            continue
         if isinstance(val, list):
             _dict[member] = parse_obj_list_to_dict_list(val)
-        elif 'binance' in val.__class__.__module__:
+        elif is_model_class(val.__class__):
             _dict[member] = parse_obj_to_dict(val)
-        else:
-            _dict[member] = val
     return _dict
 
 
-def parse_obj_list_to_dict_list(obj_list):
-    _list = []
-    for obj in obj_list:
-        _dict = parse_obj_to_dict(obj)
-        _list.append(_dict)
-    return _list
+def parse_obj_list_to_dict_list(obj_list) -> list:
+    """Models of the list as dicts, other items (e.g. strings) as they are"""
+    return [parse_obj_to_dict(obj) if is_model_class(obj.__class__) else obj for obj in obj_list]
 
 
 def parse_dict_to_obj(dictionary):
@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+
+from custom_types.trade_type import IBacktestMetrics
+
+DAY_IN_MS = 24 * 60 * 60 * 1000
+
+
+def get_max_streak(flags: np.ndarray) -> int:
+    """Longest run of True"""
+    if not flags.any():
+        return 0
+    padded = np.concatenate(([False], flags, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[::2]).max())
+
+
+def get_exposure_ms(entry_time: np.ndarray, exit_time: np.ndarray) -> int:
+    """Time with at least one open trade, overlapping trades are counted once"""
+    if len(entry_time) == 0:
+        return 0
+    order = np.argsort(entry_time, kind='stable')
+    entry_time, exit_time = entry_time[order], exit_time[order]
+    covered_until = np.maximum.accumulate(exit_time)
+    previous_covered = np.concatenate(([entry_time[0]], covered_until[:-1]))
+    return int(np.maximum(exit_time - np.maximum(entry_time, previous_covered), 0).sum())
+
+
+def get_performance_metrics(pnl: np.ndarray, entry_time: np.ndarray, exit_time: np.ndarray, starting_fund: float,
+                            start_time: int = None, end_time: int = None) -> IBacktestMetrics:
+    """
+    Metrics of completed trades in the order they were closed, times in epoch ms.
+    Sharpe and Sortino are annualized from daily returns of the equity curve.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    entry_time, exit_time = np.asarray(entry_time, dtype=np.int64), np.asarray(exit_time, dtype=np.int64)
+    total_trade = len(pnl)
+    equity = starting_fund + np.concatenate(([0.0], np.cumsum(pnl)))
+    peak = np.maximum.accumulate(equity)
+    winning = pnl >= 0
+    winning_trade = int(np.count_nonzero(winning))
+
+    if start_time is None:
+        start_time = int(entry_time.min()) if total_trade else 0
+    if end_time is None:
+        end_time = int(exit_time.max()) if total_trade else start_time
+    sharpe_ratio = sortino_ratio = 0.0
+    if total_trade:
+        day = (exit_time - start_time) // DAY_IN_MS
+        day_count = max(int((end_time - start_time) // DAY_IN_MS) + 1, int(day.max()) + 1)
+        daily_pnl = np.bincount(day, weights=pnl, minlength=day_count)
+        daily_start_equity = starting_fund + np.concatenate(([0.0], np.cumsum(daily_pnl)[:-1]))
+        daily_return = daily_pnl / daily_start_equity
+        std = daily_return.std()
+        downside_std = math.sqrt(np.mean(np.minimum(daily_return, 0) ** 2))
+        if std > 0:
+            sharpe_ratio = float(daily_return.mean() / std * math.sqrt(365))
+        if downside_std > 0:
+            sortino_ratio = float(daily_return.mean() / downside_std * math.sqrt(365))
+
+    span = end_time - start_time
+    return {'total_trade': total_trade,
+            'winning_trade': winning_trade,
+            'win_rate': winning_trade / total_trade * 100 if total_trade else 0.0,
+            'cumulative_pnl': float(pnl.sum()),
+            'pnl_percentage': float(pnl.sum() / starting_fund * 100),
+            'max_drawdown_pct': float(((peak - equity) / peak).max() * 100),
+            'sharpe_ratio': sharpe_ratio,
+            'sortino_ratio': sortino_ratio,
+            'exposure_pct': get_exposure_ms(entry_time, exit_time) / span * 100 if span > 0 else 0.0,
+            'max_winning_streak': get_max_streak(winning),
+            'max_losing_streak': get_max_streak(~winning)}
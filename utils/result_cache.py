@@ -0,0 +1,67 @@
+"""Backtest results on disk, keyed by a hash of the data, the parameters and the strategy code"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from settings import BASE_DIR
+from utils.path_utils import build_path
+
+# Source files the batch backtest results depend on
+STRATEGY_CODE_FILES = ('service/batch_signal_bot.py', 'service/batch_dca_bot.py', 'utils/indicator_utils.py',
+                       'utils/metrics_utils.py', 'utils/safety_order_utils.py', 'service/parameter_sweep.py',
+                       'service/walk_forward.py')
+
+
+@lru_cache(maxsize=None)
+def get_code_version() -> str:
+    digest = hashlib.sha256()
+    for filename in STRATEGY_CODE_FILES:
+        with open(os.path.join(BASE_DIR, filename), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_array_checksum(*arrays: np.ndarray) -> str:
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory: str = None):
+        self.directory = directory or build_path([BASE_DIR, 'assets', 'result_cache'], with_filename=False)
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """
+        e.g. make_key(kind='sweep', dataset=checksum, params=params), the strategy code version is always added.
+        params must be resolved in full, a value left to its settings default is not part of the key.
+        """
+        parts['code_version'] = get_code_version()
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with open(self.get_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, value: dict):
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
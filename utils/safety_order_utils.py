@@ -0,0 +1,14 @@
+"""Safety order ladder shared by DcaBot and BatchDcaBot"""
+import numpy as np
+
+
+def get_order_size(tradeable_amount: float, base_order_size: float, max_safety_order_count: int) -> float:
+    """USDT of the base order and of every safety order"""
+    return base_order_size or tradeable_amount / (max_safety_order_count + 1)
+
+
+def get_safety_order_prices(entry_price: float, divergence: str, max_safety_order_count: int,
+                            price_deviation_trigger_so: float) -> np.ndarray:
+    """Level k is k * price_deviation_trigger_so below the entry of a long, above the entry of a short"""
+    direction = 1 if divergence == 'bullish' else -1
+    return entry_price * (1 - direction * price_deviation_trigger_so * np.arange(1, max_safety_order_count + 1))
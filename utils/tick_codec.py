@@ -0,0 +1,149 @@
+"""
+Compact price column encoding: integer ticks, delta and zigzag encoded, zlib compressed in blocks that can be
+decoded on their own
+"""
+import math
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 4096
+MAX_DECIMALS = 8
+# Smallest unsigned type that holds every zigzag delta of a block
+BLOCK_WIDTHS = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+
+def get_tick_grid(values: np.ndarray) -> Optional[Tuple[int, int]]:
+    """
+    Coarsest grid tick_multiple / 10 ** decimals every value is on, e.g. (4, 1) for a 0.0001 tick size
+    :returns: decimals, tick_multiple; None if a value has more than MAX_DECIMALS decimals
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        scaled, decimals = values.astype(np.int64), 0
+    else:
+        for decimals in range(MAX_DECIMALS + 1):
+            scaled = values * 10 ** decimals
+            if np.all(np.abs(scaled - np.rint(scaled)) < 1e-6):
+                scaled = np.rint(scaled).astype(np.int64)
+                break
+        else:
+            return None
+    tick_multiple = int(np.gcd.reduce(scaled)) if len(scaled) else 1
+    return decimals, max(tick_multiple, 1)
+
+
+def tick_size_to_grid(tick_size: float) -> Tuple[int, int]:
+    """e.g. 0.005 -> (3, 5)"""
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = tick_size * 10 ** decimals
+        if abs(scaled - round(scaled)) < 1e-9:
+            return decimals, int(round(scaled))
+    raise ValueError(f"Tick size {tick_size} has more than {MAX_DECIMALS} decimals")
+
+
+class EncodedSeries:
+    """
+    Value i is (bases[block] + cumsum of the block deltas up to i) * tick_multiple / 10 ** decimals.
+    offsets index the compressed bytes of every block in data, so any range only decodes its own blocks.
+    """
+
+    def __init__(self, count: int, block_size: int, decimals: int, tick_multiple: int, is_integer: bool,
+                 bases: np.ndarray, widths: np.ndarray, offsets: np.ndarray, data: np.ndarray):
+        self.count = count
+        self.block_size = block_size
+        self.decimals = decimals
+        self.tick_multiple = tick_multiple
+        self.is_integer = is_integer
+        self.bases = bases
+        self.widths = widths
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def tick_size(self) -> float:
+        return self.tick_multiple / 10 ** self.decimals
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.bases.nbytes + self.widths.nbytes + self.offsets.nbytes
+
+    def save(self, filepath):
+        np.savez(filepath, bases=self.bases, widths=self.widths, offsets=self.offsets, data=self.data,
+                 meta=np.array([self.count, self.block_size, self.decimals, self.tick_multiple, int(self.is_integer)],
+                               dtype=np.int64))
+
+    @classmethod
+    def load(cls, filepath) -> 'EncodedSeries':
+        with np.load(filepath) as npz:
+            count, block_size, decimals, tick_multiple, is_integer = (int(value) for value in npz['meta'])
+            return cls(count, block_size, decimals, tick_multiple, bool(is_integer), npz['bases'], npz['widths'],
+                       npz['offsets'], npz['data'])
+
+
+def encode(values: np.ndarray, tick_size: float = None, block_size: int = DEFAULT_BLOCK_SIZE) -> EncodedSeries:
+    """
+    Encode prices (or integer columns like open_time) on the tick_size grid, found from the values when not given.
+    Raise ValueError when a value is not on the grid.
+    """
+    values = np.asarray(values)
+    is_integer = values.dtype.kind in 'iu'
+    grid = get_tick_grid(values) if tick_size is None else tick_size_to_grid(tick_size)
+    if grid is None:
+        raise ValueError(f"Values have more than {MAX_DECIMALS} decimals")
+    decimals, tick_multiple = grid
+    if is_integer:
+        scaled = values.astype(np.int64)
+        ticks = scaled // tick_multiple
+    else:
+        scaled = values * 10 ** decimals
+        ticks = np.rint(scaled / tick_multiple).astype(np.int64)
+    if len(ticks) and np.abs(ticks * tick_multiple - scaled).max() > 1e-6:
+        raise ValueError(f"Values are not on the {tick_multiple / 10 ** decimals} tick grid")
+
+    block_starts = np.arange(0, len(ticks), block_size)
+    bases = ticks[block_starts] if len(ticks) else np.empty(0, dtype=np.int64)
+    deltas = np.diff(ticks, prepend=ticks[:1])
+    deltas[block_starts] = 0
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).view(np.uint64)
+
+    widths = np.empty(len(block_starts), dtype=np.uint8)
+    blocks = []
+    for block, start in enumerate(block_starts):
+        block_zigzag = zigzag[start:start + block_size]
+        peak = int(block_zigzag.max())
+        width = next(idx for idx, dtype in enumerate(BLOCK_WIDTHS) if peak <= np.iinfo(dtype).max)
+        widths[block] = width
+        blocks.append(zlib.compress(block_zigzag.astype(BLOCK_WIDTHS[width]).tobytes()))
+    offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(block) for block in blocks])
+    data = np.frombuffer(b''.join(blocks), dtype=np.uint8)
+    return EncodedSeries(len(ticks), block_size, decimals, tick_multiple, is_integer, bases, widths, offsets, data)
+
+
+def decode(encoded: EncodedSeries, start: int = 0, end: int = None) -> np.ndarray:
+    """Values start to end - 1 as float64 (int64 for integer columns), decoding only the blocks they are in"""
+    end = encoded.count if end is None else min(end, encoded.count)
+    start = min(max(start, 0), end)
+    if start == end:
+        return np.empty(0, dtype=np.int64 if encoded.is_integer else np.float64)
+    first_block, last_block = start // encoded.block_size, (end - 1) // encoded.block_size
+    ticks = np.empty((last_block - first_block + 1) * encoded.block_size, dtype=np.int64)
+    position = 0
+    for block in range(first_block, last_block + 1):
+        raw = zlib.decompress(encoded.data[encoded.offsets[block]:encoded.offsets[block + 1]].tobytes())
+        zigzag = np.frombuffer(raw, dtype=BLOCK_WIDTHS[encoded.widths[block]]).astype(np.uint64)
+        deltas = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+        np.cumsum(deltas, out=ticks[position:position + len(deltas)])
+        ticks[position:position + len(deltas)] += encoded.bases[block]
+        position += len(deltas)
+    offset = first_block * encoded.block_size
+    ticks = ticks[start - offset:end - offset]
+    if encoded.is_integer:
+        return ticks * encoded.tick_multiple
+    # Dividing the exact integer by a power of ten gives the same float as parsing the decimal text
+    return (ticks * encoded.tick_multiple) / math.pow(10, encoded.decimals)
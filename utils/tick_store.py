@@ -0,0 +1,82 @@
+"""Aggregate trade store, one compressed .npz file per UTC day under assets/tick_store/<symbol>"""
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from settings import BASE_DIR
+from utils.path_utils import build_path
+
+# Column: dtype, time is the trade time in epoch ms
+TICK_STORE_COLUMNS = {
+    'id': np.int64,
+    'time': np.int64,
+    'price': np.float64,
+    'qty': np.float64,
+    'is_buyer_maker': np.bool_,
+}
+DAY_IN_MS = 24 * 60 * 60 * 1000
+
+
+def get_day_start(timestamp_in_ms: int) -> int:
+    return timestamp_in_ms - timestamp_in_ms % DAY_IN_MS
+
+
+class TickStore:
+    """
+    Days are written once complete and read back one at a time, so replaying any number of trades only holds a
+    single day in memory
+    """
+
+    def __init__(self, symbol: str, directory: str = None):
+        self.symbol = symbol
+        self.directory = directory or build_path([BASE_DIR, 'assets', 'tick_store', symbol], with_filename=False)
+        # Latest loaded day, the exits of consecutive trades are mostly on the same day
+        self._day_start: Optional[int] = None
+        self._day_columns: Dict[str, np.ndarray] = {}
+
+    def day_path(self, day_start: int) -> str:
+        return os.path.join(self.directory, f'{datetime.utcfromtimestamp(day_start / 1000):%Y-%m-%d}.npz')
+
+    def has_day(self, day_start: int) -> bool:
+        return os.path.exists(self.day_path(day_start))
+
+    def get_days(self, start_time: int, end_time: int) -> List[int]:
+        """Start of every day with trades in start_time <= time < end_time"""
+        return list(range(get_day_start(start_time), end_time, DAY_IN_MS))
+
+    def get_missing_days(self, start_time: int, end_time: int) -> List[int]:
+        return [day_start for day_start in self.get_days(start_time, end_time) if not self.has_day(day_start)]
+
+    def write_day(self, day_start: int, columns: Dict[str, np.ndarray]):
+        """Store every trade of one day, sorted by aggregate trade id"""
+        order = np.argsort(np.asarray(columns['id'], dtype=np.int64), kind='stable')
+        values = {name: np.asarray(columns[name], dtype=dtype)[order] for name, dtype in TICK_STORE_COLUMNS.items()}
+        if len(values['time']) and (values['time'][0] < day_start or values['time'][-1] >= day_start + DAY_IN_MS):
+            raise ValueError(f"Trades outside of {datetime.utcfromtimestamp(day_start / 1000):%Y-%m-%d}")
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.day_path(day_start)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **values)
+        os.replace(tmp_path, path)
+        if self._day_start == day_start:
+            self._day_start = None
+
+    def load_day(self, day_start: int) -> Dict[str, np.ndarray]:
+        if self._day_start != day_start:
+            with np.load(self.day_path(day_start)) as npz:
+                self._day_columns = {name: npz[name] for name in TICK_STORE_COLUMNS}
+            self._day_start = day_start
+        return self._day_columns
+
+    def iter_chunks(self, start_time: int, end_time: int) -> Iterator[Dict[str, np.ndarray]]:
+        """Trades with start_time <= time < end_time, one day per chunk, days not stored are skipped"""
+        for day_start in self.get_days(start_time, end_time):
+            if not self.has_day(day_start):
+                continue
+            columns = self.load_day(day_start)
+            start, end = np.searchsorted(columns['time'], [start_time, end_time], side='left')
+            if start < end:
+                yield {name: values[start:end] for name, values in columns.items()}